@@ -0,0 +1,49 @@
+import argparse
+import asyncio
+import logging
+
+from .harness import format_table, run_offline, run_scenarios, write_json
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the chat API latency and throughput")
+    parser.add_argument("--url", help="Benchmark a running server instead of the offline stand-ins")
+    parser.add_argument("--endpoints", nargs="+", choices=["chat", "stream"], default=["chat", "stream"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="Sequential requests before each endpoint")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--seed", type=int, default=0)
+    
+    fakes = parser.add_argument_group("offline stand-ins")
+    fakes.add_argument("--entities", type=int, default=1000)
+    fakes.add_argument("--relationships", type=int, default=5000)
+    fakes.add_argument("--documents", type=int, default=2000)
+    fakes.add_argument("--dimension", type=int, default=64)
+    fakes.add_argument("--graph-latency", type=float, default=0.005, help="Seconds per graph query")
+    fakes.add_argument("--embedding-latency", type=float, default=0.05, help="Seconds per embedding call")
+    fakes.add_argument("--extraction-latency", type=float, default=0.2, help="Seconds per entity extraction")
+    fakes.add_argument("--first-token-latency", type=float, default=0.3)
+    fakes.add_argument("--tokens-per-second", type=float, default=50.0)
+    fakes.add_argument("--answer-tokens", type=int, default=40)
+    fakes.add_argument("--answer-cache", action="store_true", help="Keep the semantic answer cache enabled")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    
+    if args.url:
+        from .harness import QUESTION_TEMPLATES
+        questions = [template.format(name="Alice", other="Bob") for template in QUESTION_TEMPLATES]
+        questions = (questions * (args.requests // len(questions) + 1))[:args.requests]
+        results = asyncio.run(run_scenarios(args.url, args.endpoints, args.concurrency, questions, args.warmup))
+    else:
+        results = run_offline(args)
+    
+    print(format_table(results))
+    if args.output:
+        write_json(args.output, results, vars(args))
+
+if __name__ == "__main__":
+    main()
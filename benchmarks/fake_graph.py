@@ -0,0 +1,159 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+import asyncio
+import random
+import re
+import time
+
+from src.services.graph_rag import (
+    BACKFILL_FETCH_QUERY,
+    BATCH_NEIGHBORHOOD_QUERY,
+    ENTITY_IDS_QUERY,
+    GRAPH_VERSION_QUERY,
+    NEIGHBORHOOD_QUERY,
+    TOP_ENTITIES_QUERY,
+)
+from src.services.local_vector import SNAPSHOT_QUERY
+
+from .fakes import FakeEmbeddings
+
+_TOKEN = re.compile(r"\w+")
+
+_FIRST = ["Alma", "Bruno", "Carla", "Dario", "Elena", "Fabio", "Giulia", "Hugo", "Ines", "Jonas",
+          "Katia", "Luca", "Marta", "Nico", "Olga", "Paolo", "Rosa", "Sergio", "Tina", "Ugo"]
+_LAST = ["Amato", "Bianchi", "Conti", "Donati", "Esposito", "Ferri", "Galli", "Greco", "Leone",
+         "Lombardi", "Marino", "Moretti", "Neri", "Orlando", "Pellegrini", "Ricci", "Romano", "Russo",
+         "Santoro", "Vitale"]
+_RELATIONS = ["MARRIED_TO", "WORKS_AT", "FOUNDED", "PARENT_OF", "FRIEND_OF", "MENTORED", "OWNS"]
+
+def _tokens(text: str) -> Set[str]:
+    return set(_TOKEN.findall(text.lower()))
+
+class SyntheticGraph:
+    """In-memory stand-in for Neo4jGraph loaded with a random knowledge graph
+
+    It answers the Cypher queries GraphRAGService and LocalVectorIndex issue,
+    recognised by their text, and emulates the fulltext entity index with a
+    token-overlap score. ``query_latency`` adds a fixed delay per query to
+    model the Bolt round-trip.
+    """
+    
+    def __init__(
+        self,
+        entities: int = 1000,
+        relationships: int = 5000,
+        documents: int = 2000,
+        embeddings: Optional[FakeEmbeddings] = None,
+        query_latency: float = 0.005,
+        seed: int = 0
+    ):
+        rng = random.Random(seed)
+        self.query_latency = query_latency
+        self.version = 1
+        
+        names = [f"{first} {last}" for last in _LAST for first in _FIRST]
+        rng.shuffle(names)
+        while len(names) < entities:
+            names.append(f"{rng.choice(_FIRST)} {rng.choice(_LAST)} {len(names)}")
+        self.entities: List[str] = names[:entities]
+        
+        self.outgoing: Dict[str, List[Tuple[str, str]]] = {name: [] for name in self.entities}
+        self.incoming: Dict[str, List[Tuple[str, str]]] = {name: [] for name in self.entities}
+        triples = []
+        for _ in range(relationships):
+            source, target = rng.sample(self.entities, 2)
+            relation = rng.choice(_RELATIONS)
+            self.outgoing[source].append((relation, target))
+            self.incoming[target].append((relation, source))
+            triples.append((source, relation, target))
+        
+        embeddings = embeddings or FakeEmbeddings()
+        self.documents: List[Dict[str, Any]] = []
+        for i in range(documents):
+            source, relation, target = triples[i % len(triples)] if triples else (self.entities[0], "KNOWS", self.entities[0])
+            text = f"{source} {relation.lower().replace('_', ' ')} {target}. Document {i} tells more about them."
+            self.documents.append({
+                "id": f"doc-{i:08d}", "text": text, "embedding": embeddings.vector(text),
+                "source": f"synthetic/{source}.txt", "sources": [f"synthetic/{source}.txt"]
+            })
+        
+        self._entity_tokens = {name: _tokens(name) for name in self.entities}
+        self._token_index: Dict[str, Set[str]] = {}
+        for name, tokens in self._entity_tokens.items():
+            for token in tokens:
+                self._token_index.setdefault(token, set()).add(name)
+    
+    def _fulltext(self, query: str, limit: int) -> List[Tuple[str, float]]:
+        tokens = _tokens(query)
+        candidates = set().union(*(self._token_index.get(token, set()) for token in tokens)) if tokens else set()
+        scored = [(name, float(len(tokens & self._entity_tokens[name]))) for name in candidates]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+    
+    def _neighborhood(self, query: str, params: Dict[str, Any]) -> List[Tuple[str, float, str]]:
+        outputs = []
+        for node, score in self._fulltext(query, params["fulltext_limit"]):
+            outputs += [(f"{node} - {relation} -> {neighbor}", score, node) for relation, neighbor in self.outgoing[node]]
+            outputs += [(f"{neighbor} - {relation} -> {node}", score, node) for relation, neighbor in self.incoming[node]]
+        return outputs[:params["entity_limit"]]
+    
+    def _batch_neighborhoods(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [{"query": query, "output": output, "score": score, "entity": entity}
+                for query in params["queries"] for output, score, entity in self._neighborhood(query, params)]
+    
+    def _top_entities(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        degrees = [{"id": name, "degree": len(self.outgoing[name]) + len(self.incoming[name])} for name in self.entities]
+        degrees.sort(key=lambda row: row["degree"], reverse=True)
+        return degrees[:params["limit"]]
+    
+    def _neighborhoods(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        best: Dict[str, float] = {}
+        for query in params["queries"]:
+            for output, score, _ in self._neighborhood(query, params):
+                best[output] = max(best.get(output, 0.0), score)
+        rows = sorted(({"output": output, "score": score} for output, score in best.items()),
+                      key=lambda row: row["score"], reverse=True)
+        return rows[:params["limit"]]
+    
+    def _snapshot(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        rows = [doc for doc in self.documents if doc["id"] > params["after"]]
+        return rows[:params["limit"]]
+    
+    def _execute(self, query: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if query == NEIGHBORHOOD_QUERY:
+            return self._neighborhoods(params)
+        if query == BATCH_NEIGHBORHOOD_QUERY:
+            return self._batch_neighborhoods(params)
+        if query == GRAPH_VERSION_QUERY:
+            return [{"version": self.version, "previous_version": self.version - 1, "changed_entities": None}]
+        if query == TOP_ENTITIES_QUERY:
+            return self._top_entities(params)
+        if query == ENTITY_IDS_QUERY:
+            return [{"id": name} for name in self.entities]
+        if query == BACKFILL_FETCH_QUERY:
+            return []
+        if query == SNAPSHOT_QUERY:
+            return self._snapshot(params)
+        if query.strip() == "RETURN 1":
+            return [{"1": 1}]
+        raise NotImplementedError(f"SyntheticGraph does not support this query: {query[:80]}")
+    
+    def query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        time.sleep(self.query_latency)
+        return self._execute(query, params or {})
+    
+    read_query = query
+
+class AsyncSyntheticGraph:
+    """Async view of a SyntheticGraph, standing in for AsyncNeo4jGraph"""
+    
+    def __init__(self, graph: SyntheticGraph):
+        self.graph = graph
+    
+    async def query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        await asyncio.sleep(self.graph.query_latency)
+        return self.graph._execute(query, params or {})
+    
+    read_query = query
+    
+    async def close(self):
+        pass
@@ -0,0 +1,112 @@
+from typing import Any, AsyncIterator, Iterator, List, Optional
+import asyncio
+import hashlib
+import re
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+_NAME = re.compile(r"\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*")
+
+class FakeChatModel(BaseChatModel):
+    """Chat model stand-in with configurable latency and token rate
+
+    Answers are a fixed number of filler tokens produced at
+    ``tokens_per_second`` after ``first_token_latency``. Structured output
+    (used for entity extraction) returns the capitalized names found in the
+    prompt after ``extraction_latency``.
+    """
+    
+    first_token_latency: float = 0.3
+    tokens_per_second: float = 50.0
+    answer_tokens: int = 40
+    extraction_latency: float = 0.2
+    
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+    
+    def _tokens(self) -> List[str]:
+        return [f"token{i} " for i in range(self.answer_tokens)]
+    
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        text = "".join(self._tokens())
+        prompt_tokens = sum(len(str(message.content).split()) for message in messages)
+        message = AIMessage(content=text, usage_metadata={
+            "input_tokens": prompt_tokens,
+            "output_tokens": self.answer_tokens,
+            "total_tokens": prompt_tokens + self.answer_tokens,
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+    
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.first_token_latency + self.answer_tokens / self.tokens_per_second)
+        return self._result(messages)
+    
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.first_token_latency + self.answer_tokens / self.tokens_per_second)
+        return self._result(messages)
+    
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_latency)
+        for token in self._tokens():
+            time.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+    
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_latency)
+        for token in self._tokens():
+            await asyncio.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+    
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> RunnableLambda:
+        def names(prompt: Any) -> List[str]:
+            text = str(prompt.to_messages()[-1].content).split(":", 1)[-1]
+            return _NAME.findall(text)
+        
+        def extract(prompt: Any) -> Any:
+            time.sleep(self.extraction_latency)
+            return schema(names=names(prompt))
+        
+        async def aextract(prompt: Any) -> Any:
+            await asyncio.sleep(self.extraction_latency)
+            return schema(names=names(prompt))
+        
+        return RunnableLambda(extract, afunc=aextract)
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic hash-seeded embeddings with a configurable latency"""
+    
+    def __init__(self, dimension: int = 64, latency: float = 0.05):
+        self.dimension = dimension
+        self.latency = latency
+    
+    def vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).normal(size=self.dimension)
+        return (vector / np.linalg.norm(vector)).tolist()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return [self.vector(text) for text in texts]
+    
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return self.vector(text)
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency)
+        return [self.vector(text) for text in texts]
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return self.vector(text)
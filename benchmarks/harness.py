@@ -0,0 +1,218 @@
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+
+import httpx
+import numpy as np
+import uvicorn
+
+from src.config import settings
+from src.services.cache_backend import MemoryCacheBackend
+from src.services.graph_rag import GraphRAGService
+from src.services.local_vector import LocalVectorIndex, LocalVectorRetriever
+
+from .fake_graph import AsyncSyntheticGraph, SyntheticGraph
+from .fakes import FakeChatModel, FakeEmbeddings
+
+QUESTION_TEMPLATES = [
+    "Who is {name} married to?",
+    "Where does {name} work?",
+    "Tell me about {name}.",
+    "What is the relationship between {name} and {other}?",
+]
+
+@dataclass
+class ScenarioResult:
+    """Latency summary of one endpoint at one concurrency level"""
+    
+    endpoint: str
+    concurrency: int
+    requests: int
+    errors: int
+    elapsed: float
+    rps: float
+    latency: Dict[str, float] = field(default_factory=dict)
+    ttft: Optional[Dict[str, float]] = None
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 and mean of a list of durations, in milliseconds"""
+    if not samples:
+        return {}
+    values = np.asarray(samples) * 1000
+    return {
+        "p50": round(float(np.percentile(values, 50)), 1),
+        "p95": round(float(np.percentile(values, 95)), 1),
+        "p99": round(float(np.percentile(values, 99)), 1),
+        "mean": round(float(values.mean()), 1),
+    }
+
+def make_questions(graph: SyntheticGraph, count: int, seed: int = 0) -> List[str]:
+    """Questions about random entities of the synthetic graph"""
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(count):
+        name, other = rng.sample(graph.entities, 2)
+        questions.append(rng.choice(QUESTION_TEMPLATES).format(name=name, other=other))
+    return questions
+
+def build_service(graph: SyntheticGraph, embeddings: FakeEmbeddings, llm: FakeChatModel, workdir: str) -> GraphRAGService:
+    """GraphRAGService wired to the stand-ins, a local vector snapshot and in-process caches"""
+    index_path = os.path.join(workdir, "vectors")
+    LocalVectorIndex.build(graph, index_path)
+    index = LocalVectorIndex(index_path, nprobe=settings.local_vector_nprobe)
+    service = GraphRAGService.from_components(
+        graph=graph,
+        async_graph=AsyncSyntheticGraph(graph),
+        llm=llm,
+        embeddings=embeddings,
+        vector_retriever=LocalVectorRetriever(index=index, embeddings=embeddings),
+        vector_index=index,
+        cache_backend=MemoryCacheBackend(max_entries=settings.memo_cache_size)
+    )
+    return service
+
+class BackgroundServer:
+    """Runs the FastAPI app with uvicorn in a background thread"""
+    
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        if not port:
+            with socket.socket() as sock:
+                sock.bind((host, 0))
+                port = sock.getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        config = uvicorn.Config("src.main:app", host=host, port=port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+    
+    def __enter__(self) -> "BackgroundServer":
+        self.thread.start()
+        deadline = time.monotonic() + 30
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.thread.is_alive():
+                raise RuntimeError("Benchmark server did not start")
+            time.sleep(0.05)
+        return self
+    
+    def __exit__(self, *exc: Any):
+        self.server.should_exit = True
+        self.thread.join(timeout=30)
+
+async def _chat(client: httpx.AsyncClient, question: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    response = await client.post("/api/v1/chat", json={"message": question})
+    response.raise_for_status()
+    return {"latency": time.perf_counter() - start}
+
+async def _chat_stream(client: httpx.AsyncClient, question: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    ttft = None
+    async with client.stream("POST", "/api/v1/chat/stream", json={"message": question}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: "):])
+            if event["type"] == "token" and ttft is None:
+                ttft = time.perf_counter() - start
+            elif event["type"] == "error":
+                raise RuntimeError(event["content"])
+    return {"latency": time.perf_counter() - start, "ttft": ttft}
+
+ENDPOINTS = {"chat": _chat, "stream": _chat_stream}
+
+async def run_scenario(url: str, endpoint: str, concurrency: int, questions: List[str], timeout: float = 120) -> ScenarioResult:
+    """Send every question with ``concurrency`` requests in flight at a time"""
+    send = ENDPOINTS[endpoint]
+    pending = iter(questions)
+    samples: List[Dict[str, Any]] = []
+    errors = 0
+    
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        for question in pending:
+            try:
+                samples.append(await send(client, question))
+            except Exception:
+                errors += 1
+    
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    
+    ttfts = [sample["ttft"] for sample in samples if sample.get("ttft") is not None]
+    return ScenarioResult(
+        endpoint=endpoint,
+        concurrency=concurrency,
+        requests=len(samples),
+        errors=errors,
+        elapsed=round(elapsed, 3),
+        rps=round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        latency=percentiles([sample["latency"] for sample in samples]),
+        ttft=percentiles(ttfts) if endpoint == "stream" else None
+    )
+
+async def run_scenarios(url: str, endpoints: List[str], concurrency: List[int], questions: List[str],
+                        warmup: int = 0) -> List[ScenarioResult]:
+    """Run every endpoint at every concurrency level against a live server"""
+    results = []
+    for endpoint in endpoints:
+        if warmup:
+            await run_scenario(url, endpoint, 1, questions[:warmup])
+        for level in concurrency:
+            results.append(await run_scenario(url, endpoint, level, questions))
+    return results
+
+def format_table(results: List[ScenarioResult]) -> str:
+    """Human-readable summary, one row per scenario"""
+    header = f"{'endpoint':<8} {'conc':>5} {'reqs':>6} {'err':>4} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'ttft50':>8} {'ttft95':>8}"
+    rows = [header, "-" * len(header)]
+    for result in results:
+        ttft = result.ttft or {}
+        rows.append(
+            f"{result.endpoint:<8} {result.concurrency:>5} {result.requests:>6} {result.errors:>4} {result.rps:>8.2f} "
+            f"{result.latency.get('p50', 0):>8.1f} {result.latency.get('p95', 0):>8.1f} {result.latency.get('p99', 0):>8.1f} "
+            f"{ttft.get('p50', 0):>8.1f} {ttft.get('p95', 0):>8.1f}"
+        )
+    return "\n".join(rows)
+
+def run_offline(args: Any) -> List[ScenarioResult]:
+    """Benchmark the in-process app against the stand-ins"""
+    from src.api import chat as chat_api
+    
+    # Caches would turn repeated questions into lookups, so measure the cold path
+    settings.answer_cache_enabled = args.answer_cache
+    
+    embeddings = FakeEmbeddings(dimension=args.dimension, latency=args.embedding_latency)
+    llm = FakeChatModel(
+        first_token_latency=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens,
+        extraction_latency=args.extraction_latency
+    )
+    graph = SyntheticGraph(
+        entities=args.entities,
+        relationships=args.relationships,
+        documents=args.documents,
+        embeddings=embeddings,
+        query_latency=args.graph_latency,
+        seed=args.seed
+    )
+    questions = make_questions(graph, args.requests, seed=args.seed)
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        chat_api.start_graph_rag_service(build_service(graph, embeddings, llm, workdir))
+        with BackgroundServer() as server:
+            return asyncio.run(run_scenarios(server.url, args.endpoints, args.concurrency, questions, args.warmup))
+
+def write_json(path: str, results: List[ScenarioResult], config: Dict[str, Any]):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"config": config, "results": [asdict(result) for result in results]}, f, indent=2)
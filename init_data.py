@@ -1,7 +1,13 @@
 #!/usr/bin/env python3
 """
 Script to initialize the graph database with data from dummytext.txt
+
+Run with --pipeline for the batched, resumable ingestion pipeline that also
+embeds the chunks during ingestion. The pipeline is incremental: re-running
+it only processes chunks that changed since the last run.
 """
+import argparse
+import logging
 import os
 import sys
 from pathlib import Path
@@ -9,18 +15,46 @@ from pathlib import Path
 # Add src to path
 sys.path.append(str(Path(__file__).parent / "src"))
 
-from langchain_community.document_loaders import TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_experimental.graph_transformers import LLMGraphTransformer
-from langchain_openai import AzureChatOpenAI
-from langchain_neo4j import Neo4jGraph
-from neo4j import GraphDatabase
+from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
 from dotenv import load_dotenv
 
+from src.ingestion import IngestionPipeline, iter_documents, load_documents
+from src.ingestion.pipeline import CHANGED_ENTITIES_LIMIT
+from src.services.local_vector import LocalVectorIndex
+from src.services.neo4j_driver import PooledNeo4jGraph, close_driver
+from src.services.schema import ensure_schema
+
 load_dotenv()
 
-def main():
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Initialize the graph database")
+    parser.add_argument("--input", default="dummytext.txt",
+                        help="Text file, or directory of .txt/.md files, to ingest")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Use the batched, resumable ingestion pipeline")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Concurrent LLM extraction calls in pipeline mode")
+    parser.add_argument("--batch-size", type=int, default=64,
+                        help="Chunks per extraction/embedding/write batch in pipeline mode")
+    parser.add_argument("--window-size", type=int, default=1 << 20,
+                        help="Bytes read per window by the streaming loader in pipeline mode")
+    parser.add_argument("--mmap", action="store_true",
+                        help="Memory-map input files instead of reading them in pipeline mode")
+    parser.add_argument("--checkpoint", default=".cache/ingest_checkpoint.sqlite",
+                        help="Checkpoint file used to resume an interrupted pipeline run")
+    parser.add_argument("--vector-snapshot", default=None,
+                        help="Export Document embeddings to a local vector index snapshot at this path")
+    parser.add_argument("--ivf-lists", type=int, default=0,
+                        help="Number of IVF lists in the vector snapshot (0 for exact search)")
+    parser.add_argument("--prune-missing", action="store_true",
+                        help="Remove sources from the graph that are not part of the input")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Initialize the graph database"""
+    args = parse_args(argv)
     print("Initializing graph database...")
     
     # Check if all required environment variables are set
@@ -32,6 +66,8 @@ def main():
         "NEO4J_USERNAME",
         "NEO4J_PASSWORD"
     ]
+    if args.pipeline:
+        required_vars.append("AZURE_OPENAI_EMBEDDINGS_DEPLOYMENT")
     
     missing_vars = [var for var in required_vars if not os.getenv(var)]
     if missing_vars:
@@ -40,14 +76,17 @@ def main():
         return 1
     
     try:
-        # Initialize Neo4j Graph
-        graph = Neo4jGraph(
-            url=os.getenv("NEO4J_URI"),
-            username=os.getenv("NEO4J_USERNAME"),
-            password=os.getenv("NEO4J_PASSWORD")
-        )
+        # Initialize Neo4j Graph on the pooled driver (NEO4J_* settings)
+        graph = PooledNeo4jGraph(refresh_schema=True)
         print("✓ Connected to Neo4j")
         
+        # Create the indexes and constraints before writing; see manage_db.py
+        for status in ensure_schema(graph):
+            if status.created:
+                print(f"✓ Created {status.item.kind} {status.item.name}")
+            elif status.state not in ("ONLINE", "MISSING"):
+                print(f"Warning: {status.item.kind} {status.item.name} is {status.state}")
+        
         # Initialize LLM
         llm = AzureChatOpenAI(
             azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
@@ -59,51 +98,69 @@ def main():
         print("✓ Connected to Azure OpenAI")
         
         # Load and split documents
-        if not os.path.exists("dummytext.txt"):
-            print("Error: dummytext.txt not found")
+        if not os.path.exists(args.input):
+            print(f"Error: {args.input} not found")
             return 1
-            
-        loader = TextLoader(file_path="dummytext.txt")
-        docs = loader.load()
-        
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=250, chunk_overlap=24)
-        documents = text_splitter.split_documents(documents=docs)
-        print(f"✓ Loaded and split {len(documents)} document chunks")
-        
-        # Transform to graph documents
-        llm_transformer = LLMGraphTransformer(llm=llm)
-        graph_documents = llm_transformer.convert_to_graph_documents(documents)
-        print(f"✓ Created {len(graph_documents)} graph documents")
         
-        # Add to graph
-        graph.add_graph_documents(
-            graph_documents,
-            baseEntityLabel=True,
-            include_source=True
-        )
-        print("✓ Added documents to graph")
-        
-        # Create fulltext index
-        try:
-            driver = GraphDatabase.driver(
-                uri=os.getenv("NEO4J_URI"),
-                auth=(os.getenv("NEO4J_USERNAME"), os.getenv("NEO4J_PASSWORD"))
+        if args.pipeline:
+            # Chunks are produced lazily so memory stays flat for any input size
+            documents = iter_documents(args.input, window_size=args.window_size, use_mmap=args.mmap)
+            
+            logging.basicConfig(level=logging.INFO)
+            embeddings = AzureOpenAIEmbeddings(
+                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                azure_deployment=os.getenv("AZURE_OPENAI_EMBEDDINGS_DEPLOYMENT"),
+                api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01")
+            )
+            pipeline = IngestionPipeline(
+                graph=graph,
+                llm=llm,
+                embeddings=embeddings,
+                concurrency=args.concurrency,
+                batch_size=args.batch_size,
+                checkpoint_path=args.checkpoint
             )
+            stats = pipeline.run(documents, prune_missing=args.prune_missing)
+            print(f"✓ Ingested {stats.chunks} chunks ({stats.skipped} unchanged, {stats.removed} removed), "
+                  f"{stats.nodes} nodes and {stats.relationships} relationships "
+                  f"in {stats.elapsed:.1f}s ({stats.throughput:.2f} chunks/s)")
+            changed_entities = stats.changed_entities
+        else:
+            documents = load_documents(args.input)
+            print(f"✓ Loaded and split {len(documents)} document chunks")
             
-            with driver.session() as session:
-                session.run("""
-                    CREATE FULLTEXT INDEX `fulltext_entity_id` 
-                    FOR (n:__Entity__) 
-                    ON EACH [n.id]
-                """)
-            print("✓ Created fulltext index")
-            driver.close()
+            # Transform to graph documents
+            llm_transformer = LLMGraphTransformer(llm=llm)
+            graph_documents = llm_transformer.convert_to_graph_documents(documents)
+            print(f"✓ Created {len(graph_documents)} graph documents")
             
-        except Exception as e:
-            if "already exists" in str(e).lower():
-                print("✓ Fulltext index already exists")
-            else:
-                print(f"Warning: Could not create fulltext index: {e}")
+            # Add to graph
+            graph.add_graph_documents(
+                graph_documents,
+                baseEntityLabel=True,
+                include_source=True
+            )
+            print("✓ Added documents to graph")
+            changed_entities = {node.id for graph_document in graph_documents for node in graph_document.nodes}
+            if len(changed_entities) > CHANGED_ENTITIES_LIMIT:
+                changed_entities = None
+        
+        # Rebuild the local vector snapshot before announcing the new version
+        if args.vector_snapshot:
+            count = LocalVectorIndex.build(graph, args.vector_snapshot, ivf_lists=args.ivf_lists)
+            print(f"✓ Exported {count} document embeddings to {args.vector_snapshot}")
+        
+        # Bump the graph version so running services drop cached answers. The
+        # changed entities let them keep the unaffected cached neighborhoods.
+        graph.query("""
+            MERGE (m:__Meta__ {id: 'graph'})
+            SET m.previous_version = coalesce(m.version, 0),
+                m.version = coalesce(m.version, 0) + 1,
+                m.changed_entities = $changed_entities,
+                m.updated_at = datetime()
+        """, {"changed_entities": sorted(changed_entities) if changed_entities is not None else None})
+        print("✓ Bumped graph version")
         
         print("\n🎉 Database initialization completed successfully!")
         print("You can now start the chatbot application.")
@@ -113,6 +170,9 @@ def main():
     except Exception as e:
         print(f"❌ Error during initialization: {e}")
         return 1
+    
+    finally:
+        close_driver()
 
 if __name__ == "__main__":
     exit(main())
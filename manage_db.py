@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Database maintenance for the graph the chatbot runs on
+
+  schema   create and verify the indexes and constraints the service needs
+  profile  PROFILE the retrieval queries and compare them with a baseline
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent / "src"))
+
+from dotenv import load_dotenv
+
+from src.services.neo4j_driver import PooledNeo4jGraph, close_driver, get_driver
+from src.services.profiling import QueryProfiler, compare_profiles, load_baseline, save_baseline
+from src.services.schema import ensure_schema, inspect_schema
+
+load_dotenv()
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Manage the graph database schema and profile retrieval queries")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    schema = commands.add_parser("schema", help="Create and verify indexes and constraints")
+    schema.add_argument("--check", action="store_true",
+                        help="Only verify the schema, do not create anything")
+    schema.add_argument("--vector-dimensions", type=int, default=None,
+                        help="Embedding dimension to create the vector index with (otherwise the service creates it)")
+    schema.add_argument("--wait", type=float, default=300,
+                        help="Seconds to wait for new indexes to come online")
+    
+    profile = commands.add_parser("profile", help="PROFILE the retrieval queries on a sample of entities")
+    profile.add_argument("--sample", type=int, default=50,
+                         help="Number of entities to profile the queries for")
+    profile.add_argument("--repeat", type=int, default=3,
+                         help="Runs per query and entity; timings are the median over all runs")
+    profile.add_argument("--baseline", default=".cache/query_profile_baseline.json",
+                         help="Baseline file to compare against and to save with --save-baseline")
+    profile.add_argument("--save-baseline", action="store_true",
+                         help="Store this run as the new baseline")
+    profile.add_argument("--tolerance", type=float, default=0.1,
+                         help="Allowed relative increase of db hits and rows")
+    profile.add_argument("--time-tolerance", type=float, default=0.5,
+                         help="Allowed relative increase of the median time")
+    return parser.parse_args(argv)
+
+def run_schema(args) -> int:
+    """Create and verify the schema, failing if an item is not online"""
+    graph = PooledNeo4jGraph()
+    if args.check:
+        statuses = inspect_schema(graph)
+    else:
+        statuses = ensure_schema(graph, vector_dimensions=args.vector_dimensions, wait=args.wait)
+    
+    for status in statuses:
+        item = status.item
+        mark = "✓" if status.ok else "✗"
+        note = " (created)" if status.created else ""
+        print(f"{mark} {item.kind:<10} {item.name:<22} {status.state:<10} "
+              f"{item.label}({', '.join(item.properties)}) - {item.purpose}{note}")
+    
+    missing = [status for status in statuses if not status.ok]
+    if missing:
+        print(f"\n{len(missing)} schema items are not online")
+        if any(status.item.type == "VECTOR" and status.state == "MISSING" for status in missing):
+            print("The vector index is created by the service at startup, or pass --vector-dimensions")
+        return 1
+    print("\nSchema is complete")
+    return 0
+
+def run_profile(args) -> int:
+    """Profile the retrieval queries, failing on regressions against the baseline"""
+    profiler = QueryProfiler(get_driver())
+    baseline = load_baseline(args.baseline)
+    
+    # Reuse the baseline's entities so the numbers are comparable
+    if baseline is not None and not args.save_baseline:
+        entities = baseline["entities"]
+        print(f"Profiling with the {len(entities)} entities of the baseline from {baseline['created_at']}")
+    else:
+        entities = profiler.sample_entities(args.sample)
+        print(f"Profiling with {len(entities)} sampled entities")
+    if not entities:
+        print("Error: the graph has no entities")
+        return 1
+    
+    profiles = profiler.run(entities, repeat=args.repeat)
+    summaries = {name: profile.summary() for name, profile in profiles.items()}
+    
+    print(f"\n{'query':<20} {'runs':>5} {'db hits':>12} {'rows':>10} {'p50 ms':>9} {'p95 ms':>9}  top operators")
+    for name, summary in summaries.items():
+        operators = ", ".join(f"{operator} {hits}" for operator, hits in summary["top_operators"].items())
+        print(f"{name:<20} {summary['runs']:>5} {summary['db_hits']:>12.1f} {summary['rows']:>10.1f} "
+              f"{summary['time_ms_p50']:>9.1f} {summary['time_ms_p95']:>9.1f}  {operators}")
+    
+    if args.save_baseline:
+        save_baseline(args.baseline, entities, profiles)
+        print(f"\n✓ Saved baseline to {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    
+    findings = compare_profiles(summaries, baseline["queries"], args.tolerance, args.time_tolerance)
+    for finding in findings:
+        mark = "✗ regression" if finding.regression else "! changed"
+        print(f"{mark}: {finding.query} {finding.metric}: {finding.baseline} -> {finding.current}")
+    regressions = [finding for finding in findings if finding.regression]
+    if regressions:
+        print(f"\n{len(regressions)} regressions against the baseline")
+        return 1
+    print("\n✓ No regressions against the baseline")
+    return 0
+
+def main(argv=None):
+    """Run a database maintenance command"""
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    try:
+        if args.command == "schema":
+            return run_schema(args)
+        return run_profile(args)
+    
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return 1
+    
+    finally:
+        close_driver()
+
+if __name__ == "__main__":
+    exit(main())
@@ -1,3 +1,4 @@
 from .chat import router as chat_router
+from .websocket import router as websocket_router
 
-__all__ = ["chat_router"]
+__all__ = ["chat_router", "websocket_router"]
@@ -1,45 +1,110 @@
 from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import StreamingResponse
-from typing import List, Generator
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, AsyncGenerator, Optional
 import uuid
 import logging
 import json
+import time
 import asyncio
 
-from ..models.schemas import ChatRequest, ChatResponse, HealthResponse
+from ..config import settings
+from ..models.schemas import (
+    ChatRequest,
+    ChatResponse,
+    BatchChatRequest,
+    BatchChatResult,
+    BatchChatResponse,
+    HealthResponse,
+    ReadinessResponse,
+    CacheStatsResponse,
+)
+from ..services.admission import Overloaded, deadline_var, priority_var
 from ..services.graph_rag import GraphRAGService
+from ..services.metrics import REQUEST_SECONDS, REQUESTS_IN_FLIGHT
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# Global service instance
+# Global service instance, created and warmed up by the application lifespan
 graph_rag_service = None
+_warmup_task = None
 
-def get_graph_rag_service() -> GraphRAGService:
-    global graph_rag_service
+def start_graph_rag_service(service: Optional[GraphRAGService] = None) -> GraphRAGService:
+    """Create the service and warm it up in the background"""
+    global graph_rag_service, _warmup_task
+    if graph_rag_service is None:
+        graph_rag_service = service or GraphRAGService(initialize=False)
+    if not graph_rag_service.ready:
+        _warmup_task = asyncio.create_task(graph_rag_service.warmup())
+    return graph_rag_service
+
+async def stop_graph_rag_service():
+    """Cancel a pending warmup and release the service"""
+    global graph_rag_service, _warmup_task
+    if _warmup_task is not None and not _warmup_task.done():
+        _warmup_task.cancel()
+    _warmup_task = None
+    if graph_rag_service is not None:
+        await graph_rag_service.aclose()
+        graph_rag_service = None
+
+def get_service_instance() -> GraphRAGService:
+    """The service instance, whether or not it has finished warming up"""
     if graph_rag_service is None:
-        graph_rag_service = GraphRAGService()
+        raise HTTPException(status_code=503, detail="Service is starting", headers={"Retry-After": "5"})
     return graph_rag_service
 
+def get_graph_rag_service() -> GraphRAGService:
+    """The service instance, once it is ready to answer questions"""
+    service = get_service_instance()
+    if not service.ready:
+        raise HTTPException(status_code=503, detail="Service is warming up", headers={"Retry-After": "5"})
+    return service
+
+def overloaded_error(error: Overloaded) -> HTTPException:
+    """429 or 503 response for a request whose model calls were shed"""
+    return HTTPException(
+        status_code=error.status_code,
+        detail="Service is overloaded, please retry later",
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+def admit(service: GraphRAGService, priority: str, deadline: bool = True):
+    """Tag the request with its admission priority and deadline
+
+    Requests are shed right away when the LLM queue is already full.
+    Without a deadline each model call may wait up to ADMISSION_MAX_WAIT.
+    """
+    priority_var.set(priority)
+    deadline_var.set(time.monotonic() + settings.admission_max_wait if deadline else None)
+    try:
+        service.check_admission()
+    except Overloaded as e:
+        raise overloaded_error(e)
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
     service: GraphRAGService = Depends(get_graph_rag_service)
 ):
     """Chat endpoint for interacting with the RAG system"""
+    admit(service, request.priority)
     try:
         # Generate conversation ID if not provided
         conversation_id = request.conversation_id or str(uuid.uuid4())
         
         # Get response from the service
-        response = service.chat(request.message)
+        with REQUESTS_IN_FLIGHT.track_inprogress(endpoint="chat"), REQUEST_SECONDS.time(endpoint="chat"):
+            result = await service.achat_with_sources(request.message)
         
         return ChatResponse(
-            response=response,
+            response=result.answer,
             conversation_id=conversation_id,
-            sources=None  # You can enhance this to return actual sources
+            sources=result.sources or None
         )
     
+    except Overloaded as e:
+        raise overloaded_error(e)
     except Exception as e:
         logger.error(f"Chat error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -50,46 +115,46 @@ async def chat_stream(
     service: GraphRAGService = Depends(get_graph_rag_service)
 ):
     """Streaming chat endpoint for real-time responses"""
+    admit(service, request.priority)
     try:
         # Generate conversation ID if not provided
         conversation_id = request.conversation_id or str(uuid.uuid4())
         
-        def generate_response() -> Generator[str, None, None]:
+        async def generate_response() -> AsyncGenerator[str, None]:
+            with REQUESTS_IN_FLIGHT.track_inprogress(endpoint="chat_stream"), REQUEST_SECONDS.time(endpoint="chat_stream"):
+                async for event in stream_events():
+                    yield event
+        
+        async def stream_events() -> AsyncGenerator[str, None]:
             try:
-                # Get full response
-                full_response = service.chat(request.message)
-                
-                # Stream the response word by word with delay
-                words = full_response.split()
-                
-                # Send initial message to show bot is typing
-                initial_data = {
-                    "type": "start",
-                    "content": "",
-                    "conversation_id": conversation_id,
-                    "is_final": False
-                }
-                yield f"data: {json.dumps(initial_data)}\n\n"
+                full_response = ""
+                started = False
                 
-                # Stream words with appropriate delay
-                for i, word in enumerate(words):
+                async for chunk in service.achat_stream(request.message):
+                    # The service yields once retrieval is done, so the client
+                    # can show the bot as typing before the first token arrives
+                    if not started:
+                        initial_data = {
+                            "type": "start",
+                            "content": "",
+                            "conversation_id": conversation_id,
+                            "is_final": False
+                        }
+                        yield f"data: {json.dumps(initial_data)}\n\n"
+                        started = True
+                    
+                    if not chunk:
+                        continue
+                    
+                    full_response += chunk
                     chunk_data = {
                         "type": "token",
-                        "content": word + " ",
+                        "content": chunk,
                         "conversation_id": conversation_id,
                         "is_final": False
                     }
                     yield f"data: {json.dumps(chunk_data)}\n\n"
                     
-                    # Variable delay based on word length and position
-                    import time
-                    base_delay = 0.03  # 30ms base delay
-                    word_delay = len(word) * 0.01  # Additional delay for longer words
-                    punctuation_delay = 0.15 if word.rstrip()[-1:] in '.!?' else 0
-                    
-                    total_delay = base_delay + word_delay + punctuation_delay
-                    time.sleep(min(total_delay, 0.2))  # Max 200ms delay
-                    
                 # Send final message
                 final_data = {
                     "type": "final",
@@ -99,7 +164,18 @@ async def chat_stream(
                 }
                 yield f"data: {json.dumps(final_data)}\n\n"
                 
+            except Overloaded as e:
+                logger.warning(f"Streaming chat shed: {e}")
+                error_data = {
+                    "type": "error",
+                    "content": "Sorry, the service is busy. Please try again shortly.",
+                    "conversation_id": conversation_id,
+                    "is_final": True,
+                    "retry_after": e.retry_after
+                }
+                yield f"data: {json.dumps(error_data)}\n\n"
             except Exception as e:
+                logger.error(f"Streaming chat error: {e}")
                 error_data = {
                     "type": "error",
                     "content": "Sorry, I encountered an error while processing your request.",
@@ -123,14 +199,74 @@ async def chat_stream(
         logger.error(f"Streaming chat error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch(
+    request: BatchChatRequest,
+    service: GraphRAGService = Depends(get_graph_rag_service)
+):
+    """Answer a batch of questions with shared, batched model calls
+
+    Answers come back in order, or as NDJSON lines in the order they finish
+    when ``stream`` is set.
+    """
+    if len(request.messages) > settings.batch_max_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"A batch may contain at most {settings.batch_max_size} questions"
+        )
+    # Batches make many model calls in turn, so they get no overall deadline
+    admit(service, request.priority, deadline=False)
+    
+    if request.stream:
+        async def generate_results() -> AsyncGenerator[str, None]:
+            with REQUESTS_IN_FLIGHT.track_inprogress(endpoint="chat_batch"), REQUEST_SECONDS.time(endpoint="chat_batch"):
+                async for index, result in service.aiter_chat_batch(request.messages):
+                    item = BatchChatResult(index=index, response=result.answer, sources=result.sources or None)
+                    yield item.model_dump_json() + "\n"
+        
+        return StreamingResponse(generate_results(), media_type="application/x-ndjson")
+    
+    try:
+        with REQUESTS_IN_FLIGHT.track_inprogress(endpoint="chat_batch"), REQUEST_SECONDS.time(endpoint="chat_batch"):
+            results = await service.achat_batch(request.messages)
+        return BatchChatResponse(results=[
+            BatchChatResult(index=index, response=result.answer, sources=result.sources or None)
+            for index, result in enumerate(results)
+        ])
+    except Exception as e:
+        logger.error(f"Batch chat error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check(
-    service: GraphRAGService = Depends(get_graph_rag_service)
+    service: GraphRAGService = Depends(get_service_instance)
 ):
     """Health check endpoint"""
     try:
-        health_data = service.health_check()
+        health_data = await service.ahealth_check()
         return HealthResponse(**health_data)
     except Exception as e:
         logger.error(f"Health check error: {e}")
         raise HTTPException(status_code=500, detail="Health check failed")
+
+@router.get("/cache/stats", response_model=CacheStatsResponse)
+async def cache_stats(
+    service: GraphRAGService = Depends(get_graph_rag_service)
+):
+    """Cache hit/miss statistics endpoint"""
+    return CacheStatsResponse(**service.cache_stats())
+
+@router.get("/live")
+async def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@router.get("/ready", response_model=ReadinessResponse)
+async def readiness():
+    """Readiness probe: only succeeds once the service has warmed up"""
+    if graph_rag_service is None:
+        return JSONResponse(status_code=503, content={"ready": False, "phases": {}, "error": None})
+    state = graph_rag_service.readiness()
+    if not state["ready"]:
+        return JSONResponse(status_code=503, content=state)
+    return ReadinessResponse(**state)
@@ -0,0 +1,224 @@
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from typing import AsyncIterator, Dict, List, Optional
+import itertools
+import logging
+import json
+import time
+import uuid
+import asyncio
+
+from . import chat as chat_api
+from ..config import settings
+from ..services.admission import PRIORITIES, Overloaded, deadline_var, priority_var
+from ..services.metrics import REQUEST_SECONDS, REQUESTS_IN_FLIGHT, WEBSOCKET_CONNECTIONS, WEBSOCKET_FRAMES, trace_id_var
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+# Marks the end of the chunks of a generation
+_DONE = object()
+
+class ChatConnection:
+    """One client's WebSocket, multiplexing any number of conversations
+
+    The client sends ``{"t": "ask", "id": 1, "m": "question"}`` frames,
+    optionally with a conversation id ``c`` and a priority ``p``, and
+    ``{"t": "cancel", "id": 1}`` to stop a generation. Each generation
+    answers with a ``start`` frame carrying the conversation id, ``delta``
+    frames with the text produced in each flush interval, and a final
+    ``end`` or ``error`` frame. Frames carry the generation ``id`` and a
+    sequence number ``q`` that counts up from 0 per generation.
+    """
+    
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.streams: Dict[int, asyncio.Task] = {}
+        self.closed = False
+        self._send_lock = asyncio.Lock()
+    
+    async def send(self, frame: dict):
+        """Send a frame unless the client has gone away"""
+        if self.closed:
+            return
+        WEBSOCKET_FRAMES.inc(type=frame["t"])
+        async with self._send_lock:
+            try:
+                await self.websocket.send_text(json.dumps(frame, separators=(",", ":"), ensure_ascii=False))
+            except Exception as e:
+                # The receive loop notices the disconnect and stops the generations
+                logger.warning(f"WebSocket send failed: {e}")
+                self.closed = True
+    
+    async def serve(self):
+        """Handle client frames until the socket closes
+
+        Malformed frames are answered with an error frame; they never close
+        the connection, so other generations keep running.
+        """
+        while True:
+            text = await self.websocket.receive_text()
+            try:
+                frame = json.loads(text)
+            except ValueError:
+                frame = None
+            if not isinstance(frame, dict) or not isinstance(frame.get("t"), str):
+                await self.send({"t": "error", "id": None, "q": 0, "x": "Invalid frame"})
+                continue
+            
+            kind = frame["t"]
+            stream_id = frame.get("id")
+            # Generation ids are client-chosen integers; bool is an int subclass
+            if not isinstance(stream_id, int) or isinstance(stream_id, bool):
+                await self.send({"t": "error", "id": None, "q": 0, "x": "Missing or invalid generation id"})
+                continue
+            
+            try:
+                if kind == "ask":
+                    await self.ask(stream_id, frame)
+                elif kind == "cancel":
+                    task = self.streams.get(stream_id)
+                    if task is not None:
+                        task.cancel()
+                else:
+                    await self.send({"t": "error", "id": stream_id, "q": 0, "x": "Unknown frame type"})
+            except Exception as e:
+                logger.error(f"WebSocket frame error: {e}")
+                await self.send({"t": "error", "id": stream_id, "q": 0, "x": "Invalid frame"})
+    
+    async def ask(self, stream_id: int, frame: dict):
+        """Start a generation for an ask frame"""
+        message = frame.get("m")
+        priority = frame.get("p") or "normal"
+        conversation_id = frame.get("c") or str(uuid.uuid4())
+        if stream_id in self.streams:
+            await self.send({"t": "error", "id": stream_id, "q": 0, "x": "Duplicate generation id"})
+            return
+        if (not isinstance(message, str) or not message.strip() or not isinstance(priority, str)
+                or priority not in PRIORITIES or not isinstance(conversation_id, str)):
+            await self.send({"t": "error", "id": stream_id, "q": 0, "x": "Invalid question"})
+            return
+        if len(self.streams) >= settings.ws_max_streams:
+            await self.send({
+                "t": "error", "id": stream_id, "q": 0,
+                "x": f"At most {settings.ws_max_streams} generations may run at a time"
+            })
+            return
+        
+        task = asyncio.create_task(self.generate(stream_id, message, conversation_id, priority))
+        self.streams[stream_id] = task
+        task.add_done_callback(lambda done: self._forget(stream_id, done))
+    
+    def _forget(self, stream_id: int, task: asyncio.Task):
+        if self.streams.get(stream_id) is task:
+            del self.streams[stream_id]
+    
+    async def generate(self, stream_id: int, message: str, conversation_id: str, priority: str):
+        """Stream the answer to one question as coalesced delta frames"""
+        sequence = itertools.count()
+        
+        def frame(kind: str, **fields) -> dict:
+            return {"t": kind, "id": stream_id, "q": next(sequence), **fields}
+        
+        with REQUESTS_IN_FLIGHT.track_inprogress(endpoint="ws"), REQUEST_SECONDS.time(endpoint="ws"):
+            try:
+                service = chat_api.get_graph_rag_service()
+                priority_var.set(priority)
+                deadline_var.set(time.monotonic() + settings.admission_max_wait)
+                service.check_admission()
+                
+                started = False
+                async for text in self._coalesce(service.achat_stream(message)):
+                    if not started:
+                        await self.send(frame("start", c=conversation_id))
+                        started = True
+                    if text:
+                        await self.send(frame("delta", x=text))
+                if not started:
+                    await self.send(frame("start", c=conversation_id))
+                await self.send(frame("end"))
+            
+            except asyncio.CancelledError:
+                await self.send(frame("end", cancelled=True))
+            except HTTPException as e:
+                await self.send(frame("error", x=e.detail, r=int((e.headers or {}).get("Retry-After", 5))))
+            except Overloaded as e:
+                logger.warning(f"WebSocket chat shed: {e}")
+                await self.send(frame("error", x="Sorry, the service is busy. Please try again shortly.", r=e.retry_after))
+            except Exception as e:
+                logger.error(f"WebSocket chat error: {e}")
+                await self.send(frame("error", x="Sorry, I encountered an error while processing your request."))
+    
+    async def _coalesce(self, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+        """Join the chunks that arrive within one flush interval
+
+        The first chunk, the empty one the service yields once retrieval is
+        done, passes through at once. Cancelling the caller stops the chunk
+        source, and with it the completion.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        async def pump():
+            try:
+                async for chunk in chunks:
+                    queue.put_nowait(chunk)
+            finally:
+                queue.put_nowait(_DONE)
+        
+        loop = asyncio.get_running_loop()
+        producer = asyncio.ensure_future(pump())
+        buffer: List[str] = []
+        size = 0
+        last_flush = float("-inf")
+        try:
+            while True:
+                flush_at: Optional[float] = last_flush + settings.ws_flush_interval if buffer else None
+                try:
+                    if flush_at is None:
+                        chunk = await queue.get()
+                    else:
+                        chunk = await asyncio.wait_for(queue.get(), max(flush_at - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    chunk = None
+                
+                if chunk is _DONE:
+                    break
+                if chunk is not None:
+                    buffer.append(chunk)
+                    size += len(chunk)
+                if buffer and (size >= settings.ws_max_frame_chars or loop.time() - last_flush >= settings.ws_flush_interval):
+                    last_flush = loop.time()
+                    yield "".join(buffer)
+                    buffer, size = [], 0
+            
+            # Raise the error of the source, if any
+            await producer
+            if buffer:
+                yield "".join(buffer)
+        finally:
+            producer.cancel()
+    
+    async def close(self):
+        """Stop the generations of a client that went away"""
+        self.closed = True
+        tasks = list(self.streams.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+@router.websocket("/ws")
+async def chat_socket(websocket: WebSocket):
+    """Chat over one WebSocket per client, see ChatConnection"""
+    await websocket.accept()
+    # HTTP middleware does not see WebSockets; the generations inherit the id
+    if settings.trace_header:
+        trace_id_var.set(websocket.headers.get(settings.trace_header) or uuid.uuid4().hex)
+    connection = ChatConnection(websocket)
+    with WEBSOCKET_CONNECTIONS.track_inprogress():
+        try:
+            await connection.serve()
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            logger.error(f"WebSocket error: {e}")
+        finally:
+            await connection.close()
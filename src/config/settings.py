@@ -17,6 +17,98 @@ class Settings(BaseSettings):
     neo4j_uri: str = os.getenv("NEO4J_URI", "bolt://localhost:7687")
     neo4j_username: str = os.getenv("NEO4J_USERNAME", "neo4j")
     neo4j_password: str = os.getenv("NEO4J_PASSWORD", "test1234")
+    neo4j_database: str = os.getenv("NEO4J_DATABASE", "neo4j")
+    
+    # Neo4j Driver Configuration (one pooled driver per process)
+    neo4j_max_pool_size: int = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+    neo4j_max_connection_lifetime: float = float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600"))
+    neo4j_connection_acquisition_timeout: float = float(os.getenv("NEO4J_CONNECTION_ACQUISITION_TIMEOUT", "30"))
+    neo4j_liveness_check_timeout: float = float(os.getenv("NEO4J_LIVENESS_CHECK_TIMEOUT", "60"))
+    neo4j_fetch_size: int = int(os.getenv("NEO4J_FETCH_SIZE", "1000"))
+    neo4j_max_transaction_retry_time: float = float(os.getenv("NEO4J_MAX_TRANSACTION_RETRY_TIME", "5"))
+    neo4j_read_routing: bool = os.getenv("NEO4J_READ_ROUTING", "True").lower() == "true"
+    health_check_ttl: float = float(os.getenv("HEALTH_CHECK_TTL", "5"))
+    
+    # Retrieval Configuration
+    graph_retrieval_timeout: float = float(os.getenv("GRAPH_RETRIEVAL_TIMEOUT", "10"))
+    vector_retrieval_timeout: float = float(os.getenv("VECTOR_RETRIEVAL_TIMEOUT", "10"))
+    retrieval_workers: int = int(os.getenv("RETRIEVAL_WORKERS", "8"))
+    graph_fulltext_limit: int = int(os.getenv("GRAPH_FULLTEXT_LIMIT", "2"))
+    graph_entity_limit: int = int(os.getenv("GRAPH_ENTITY_LIMIT", "50"))
+    graph_context_limit: int = int(os.getenv("GRAPH_CONTEXT_LIMIT", "100"))
+    vector_top_k: int = int(os.getenv("VECTOR_TOP_K", "4"))
+    
+    # Context Configuration
+    context_max_tokens: int = int(os.getenv("CONTEXT_MAX_TOKENS", "3000"))
+    context_entity_weight: float = float(os.getenv("CONTEXT_ENTITY_WEIGHT", "0.3"))
+    context_duplicate_threshold: float = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.8"))
+    context_token_encoding: str = os.getenv("CONTEXT_TOKEN_ENCODING", "cl100k_base")
+    
+    # Vector Backend Configuration ("neo4j" or "local")
+    vector_backend: str = os.getenv("VECTOR_BACKEND", "neo4j")
+    local_vector_index_path: str = os.getenv("LOCAL_VECTOR_INDEX_PATH", ".cache/vector_index")
+    local_vector_nprobe: int = int(os.getenv("LOCAL_VECTOR_NPROBE", "8"))
+    
+    # Answer Cache Configuration
+    answer_cache_enabled: bool = os.getenv("ANSWER_CACHE_ENABLED", "True").lower() == "true"
+    answer_cache_max_size: int = int(os.getenv("ANSWER_CACHE_MAX_SIZE", "1000"))
+    answer_cache_ttl: float = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+    answer_cache_similarity_threshold: float = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+    graph_version_check_interval: float = float(os.getenv("GRAPH_VERSION_CHECK_INTERVAL", "30"))
+    
+    # Batch Configuration
+    batch_max_size: int = int(os.getenv("BATCH_MAX_SIZE", "1000"))
+    batch_max_concurrency: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+    
+    # Coalesce identical in-flight questions into one computation
+    request_coalescing_enabled: bool = os.getenv("REQUEST_COALESCING_ENABLED", "True").lower() == "true"
+    
+    # WebSocket Configuration (tokens are coalesced into one frame per flush
+    # interval in seconds; concurrent generations per connection)
+    ws_flush_interval: float = float(os.getenv("WS_FLUSH_INTERVAL", "0.05"))
+    ws_max_frame_chars: int = int(os.getenv("WS_MAX_FRAME_CHARS", "4096"))
+    ws_max_streams: int = int(os.getenv("WS_MAX_STREAMS", "8"))
+    
+    # Admission Control (concurrent model calls per worker, queue depth and
+    # the longest a request may wait for a slot)
+    admission_enabled: bool = os.getenv("ADMISSION_ENABLED", "True").lower() == "true"
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    embedding_max_concurrency: int = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "32"))
+    admission_max_queue: int = int(os.getenv("ADMISSION_MAX_QUEUE", "100"))
+    admission_max_wait: float = float(os.getenv("ADMISSION_MAX_WAIT", "10"))
+    
+    # Cache Backend Configuration ("memory", or "sqlite"/"redis" to share the
+    # answer, neighborhood and memo caches between workers)
+    cache_backend: str = os.getenv("CACHE_BACKEND", "memory")
+    cache_max_entries: int = int(os.getenv("CACHE_MAX_ENTRIES", "100000"))
+    cache_ttl: float = float(os.getenv("CACHE_TTL", "86400"))
+    cache_sqlite_path: str = os.getenv("CACHE_SQLITE_PATH", ".cache/shared_cache.sqlite")
+    cache_redis_url: str = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    cache_key_prefix: str = os.getenv("CACHE_KEY_PREFIX", "graphrag:")
+    
+    # Memo Cache Configuration (query embeddings and extracted entities)
+    memo_cache_size: int = int(os.getenv("MEMO_CACHE_SIZE", "10000"))
+    memo_cache_path: str = os.getenv("MEMO_CACHE_PATH", ".cache/memo.sqlite")
+    
+    # Entity Matcher Configuration
+    entity_matcher_enabled: bool = os.getenv("ENTITY_MATCHER_ENABLED", "True").lower() == "true"
+    entity_matcher_fuzzy_cutoff: float = float(os.getenv("ENTITY_MATCHER_FUZZY_CUTOFF", "0.88"))
+    entity_matcher_max_fuzzy_tokens: int = int(os.getenv("ENTITY_MATCHER_MAX_FUZZY_TOKENS", "8"))
+    
+    # Neighborhood Cache Configuration (formatted entity neighborhoods)
+    neighborhood_cache_enabled: bool = os.getenv("NEIGHBORHOOD_CACHE_ENABLED", "True").lower() == "true"
+    neighborhood_cache_max_bytes: int = int(os.getenv("NEIGHBORHOOD_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    neighborhood_precompute_top_n: int = int(os.getenv("NEIGHBORHOOD_PRECOMPUTE_TOP_N", "0"))
+    
+    # Startup Configuration
+    startup_retry_interval: float = float(os.getenv("STARTUP_RETRY_INTERVAL", "5"))
+    embedding_backfill_enabled: bool = os.getenv("EMBEDDING_BACKFILL_ENABLED", "True").lower() == "true"
+    embedding_backfill_batch_size: int = int(os.getenv("EMBEDDING_BACKFILL_BATCH_SIZE", "256"))
+    
+    # Observability Configuration
+    metrics_enabled: bool = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    trace_header: str = os.getenv("TRACE_HEADER", "X-Request-ID")
+    llm_stream_usage: bool = os.getenv("LLM_STREAM_USAGE", "False").lower() == "true"
     
     # FastAPI Configuration
     app_host: str = os.getenv("APP_HOST", "0.0.0.0")
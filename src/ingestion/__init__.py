@@ -0,0 +1,13 @@
+from .pipeline import IngestionPipeline, IngestionStats
+from .state import Checkpoint, SeenChunks
+from .loader import iter_documents, iter_input_files, load_documents
+
+__all__ = [
+    "IngestionPipeline",
+    "IngestionStats",
+    "Checkpoint",
+    "SeenChunks",
+    "iter_documents",
+    "iter_input_files",
+    "load_documents",
+]
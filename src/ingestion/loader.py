@@ -0,0 +1,90 @@
+from pathlib import Path
+from typing import Iterator, List
+import codecs
+import mmap
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+TEXT_SUFFIXES = {".txt", ".md"}
+
+DEFAULT_WINDOW_SIZE = 1 << 20
+
+def iter_input_files(path: str) -> List[Path]:
+    """Text files to ingest: the file itself or the text files below a directory"""
+    root = Path(path)
+    if root.is_dir():
+        return sorted(
+            file for file in root.rglob("*")
+            if file.is_file() and file.suffix.lower() in TEXT_SUFFIXES
+        )
+    return [root]
+
+def source_name(path: str, file: Path) -> str:
+    """Stable source name of a file, relative to the ingested directory"""
+    root = Path(path)
+    if root.is_dir():
+        return file.relative_to(root).as_posix()
+    return file.name
+
+def iter_windows(file: Path, window_size: int = DEFAULT_WINDOW_SIZE, use_mmap: bool = False) -> Iterator[str]:
+    """Decode a UTF-8 file in bounded windows
+
+    An incremental decoder carries multi-byte characters that straddle a
+    window boundary over to the next window.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    with open(file, "rb") as f:
+        if use_mmap:
+            if file.stat().st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    for offset in range(0, len(mapped), window_size):
+                        yield decoder.decode(mapped[offset:offset + window_size])
+        else:
+            while True:
+                block = f.read(window_size)
+                if not block:
+                    break
+                yield decoder.decode(block)
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+def iter_chunks(windows: Iterator[str], text_splitter: RecursiveCharacterTextSplitter) -> Iterator[str]:
+    """Split a stream of text windows into chunks
+
+    The last chunk of every window may continue in the next one, so it is
+    carried over and split again together with the following window. At most
+    one window plus one chunk is held in memory.
+    """
+    carry = ""
+    for window in windows:
+        text = carry + window
+        chunks = text_splitter.split_text(text)
+        if not chunks:
+            carry = ""
+            continue
+        *complete, last = chunks
+        yield from complete
+        carry = text[text.rfind(last):]
+    
+    if carry:
+        yield from text_splitter.split_text(carry)
+
+def iter_documents(
+    path: str,
+    chunk_size: int = 250,
+    chunk_overlap: int = 24,
+    window_size: int = DEFAULT_WINDOW_SIZE,
+    use_mmap: bool = False
+) -> Iterator[Document]:
+    """Lazily load and split every input file, tagging chunks with their source"""
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    for file in iter_input_files(path):
+        source = source_name(path, file)
+        for chunk in iter_chunks(iter_windows(file, window_size, use_mmap), text_splitter):
+            yield Document(page_content=chunk, metadata={"source": source})
+
+def load_documents(path: str, chunk_size: int = 250, chunk_overlap: int = 24) -> List[Document]:
+    """Load and split every input file into memory"""
+    return list(iter_documents(path, chunk_size=chunk_size, chunk_overlap=chunk_overlap))
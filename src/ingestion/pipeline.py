@@ -0,0 +1,379 @@
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Set
+import asyncio
+import hashlib
+import logging
+import time
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_experimental.graph_transformers import LLMGraphTransformer
+from langchain_community.graphs.graph_document import GraphDocument
+
+from ..services.neo4j_driver import PooledNeo4jGraph
+from ..services.schema import ensure_schema
+from .state import Checkpoint, SeenChunks
+
+logger = logging.getLogger(__name__)
+
+# Chunks are content addressed, so a chunk already in the graph only needs
+# its source registered
+EXISTING_CHUNKS_QUERY = """UNWIND $rows AS row
+MATCH (d:Document {id: row.id})
+SET d.content_hash = row.id,
+    d.sources = CASE WHEN row.source IN coalesce(d.sources, []) THEN d.sources
+                     ELSE coalesce(d.sources, []) + row.source END
+RETURN d.id AS id
+"""
+
+# Writes the chunks of one batch with their embeddings and mentioned entities
+DOCUMENT_WRITE_QUERY = """UNWIND $rows AS row
+MERGE (d:Document {id: row.id})
+SET d.text = row.text, d += row.metadata, d.content_hash = row.id,
+    d.sources = CASE WHEN row.source IN coalesce(d.sources, []) THEN d.sources
+                     ELSE coalesce(d.sources, []) + row.source END
+WITH d, row
+CALL db.create.setNodeVectorProperty(d, 'embedding', row.embedding)
+WITH d, row
+UNWIND row.nodes AS node
+MERGE (e:__Entity__ {id: node.id})
+SET e += node.properties
+WITH d, e, node
+CALL apoc.create.addLabels(e, node.labels) YIELD node AS labeled
+MERGE (d)-[:MENTIONS]->(e)
+RETURN count(*) AS mentions
+"""
+
+# Writes the relationships extracted from the chunks of one batch. Each
+# relationship records the chunks it was extracted from so it can be removed
+# once none of them remain.
+RELATIONSHIP_WRITE_QUERY = """UNWIND $rows AS row
+UNWIND row.relationships AS rel
+MERGE (s:__Entity__ {id: rel.source})
+MERGE (t:__Entity__ {id: rel.target})
+WITH s, t, rel, row
+CALL apoc.create.addLabels(s, rel.source_labels) YIELD node AS source
+CALL apoc.create.addLabels(t, rel.target_labels) YIELD node AS target
+CALL apoc.merge.relationship(source, rel.type, {}, rel.properties, target, {}) YIELD rel AS r
+SET r.chunks = CASE WHEN row.id IN coalesce(r.chunks, []) THEN r.chunks
+                    ELSE coalesce(r.chunks, []) + row.id END
+RETURN count(r) AS relationships
+"""
+
+# Pages through the chunks of a source in id order
+SOURCE_CHUNKS_QUERY = """MATCH (d:Document)
+WHERE $source IN d.sources AND d.id > $after
+RETURN d.id AS id
+ORDER BY id
+LIMIT $limit
+"""
+
+# Sources in the graph that are not part of the current input
+KNOWN_SOURCES_QUERY = """MATCH (d:Document)
+UNWIND coalesce(d.sources, []) AS source
+RETURN DISTINCT source
+"""
+
+# Unregisters a source from chunks and returns the chunks left without any
+UNREGISTER_SOURCE_QUERY = """UNWIND $ids AS id
+MATCH (d:Document {id: id})
+SET d.sources = [source IN coalesce(d.sources, []) WHERE source <> $source]
+WITH d WHERE size(d.sources) = 0
+RETURN d.id AS id
+"""
+
+# Drops removed chunks from the provenance of relationships and deletes the
+# relationships that were only extracted from them
+RELEASE_RELATIONSHIPS_QUERY = """UNWIND $ids AS id
+MATCH (:Document {id: id})-[:MENTIONS]->(:__Entity__)-[r]->(:__Entity__)
+WHERE id IN coalesce(r.chunks, [])
+WITH r, collect(DISTINCT id) AS removed
+SET r.chunks = [chunk IN r.chunks WHERE NOT chunk IN removed]
+WITH r WHERE size(r.chunks) = 0
+WITH r, startNode(r).id AS source, endNode(r).id AS target
+DELETE r
+RETURN source, target
+"""
+
+# Deletes removed chunks and the entities no other chunk mentions, returning
+# the deleted entities and the neighbors they were connected to
+DELETE_CHUNKS_QUERY = """MATCH (d:Document) WHERE d.id IN $ids
+OPTIONAL MATCH (d)-[:MENTIONS]->(e:__Entity__)
+WITH collect(DISTINCT d) AS documents, collect(DISTINCT e) AS entities
+FOREACH (d IN documents | DETACH DELETE d)
+WITH entities
+UNWIND entities AS e
+WITH e WHERE NOT (e)<-[:MENTIONS]-(:Document)
+OPTIONAL MATCH (e)-[:!MENTIONS]-(neighbor:__Entity__)
+WITH e, e.id AS id, collect(DISTINCT neighbor.id) AS neighbors
+DETACH DELETE e
+RETURN id, neighbors
+"""
+
+# Above this many changed entities a run reports a full change instead
+CHANGED_ENTITIES_LIMIT = 10000
+
+def chunk_id(document: Document) -> str:
+    """Stable id of a chunk, derived from its content"""
+    return hashlib.md5(document.page_content.encode("utf-8")).hexdigest()
+
+def _labels(node_type: str) -> List[str]:
+    return [node_type] if node_type else []
+
+def _primitive(properties: dict) -> dict:
+    return {
+        key: value for key, value in properties.items()
+        if isinstance(value, (str, int, float, bool))
+    }
+
+def _batched(items: Iterable[Document], size: int) -> Iterator[List[Document]]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+@dataclass
+class IngestionStats:
+    """Progress counters of an ingestion run"""
+    chunks: int = 0
+    skipped: int = 0
+    removed: int = 0
+    nodes: int = 0
+    relationships: int = 0
+    changed_entities: Optional[Set[str]] = field(default_factory=set)
+    started_at: float = field(default_factory=time.monotonic)
+    
+    def touch(self, ids: Iterable[str]):
+        """Record entities whose neighborhood changed
+
+        changed_entities becomes None once there are too many to track.
+        """
+        if self.changed_entities is None:
+            return
+        self.changed_entities.update(entity for entity in ids if entity is not None)
+        if len(self.changed_entities) > CHANGED_ENTITIES_LIMIT:
+            self.changed_entities = None
+    
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+    
+    @property
+    def throughput(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed else 0.0
+
+class IngestionPipeline:
+    """Batched, resumable and incremental graph ingestion
+
+    Chunks are processed in fixed-size batches. Within a batch the LLM graph
+    extraction runs with bounded concurrency alongside one embeddings call
+    for all chunk texts, and the results are written with two UNWIND
+    queries in one transaction. Committed chunk ids are appended to a
+    checkpoint file so an interrupted run resumes where it stopped.
+
+    Chunks are identified by the hash of their content and remember the
+    sources (the ``source`` metadata) they belong to. Unchanged chunks are
+    skipped without any LLM or embedding call, and chunks that disappeared
+    from a source are removed from the graph after the run.
+    """
+    
+    def __init__(
+        self,
+        graph: PooledNeo4jGraph,
+        llm: BaseChatModel,
+        embeddings: Embeddings,
+        concurrency: int = 8,
+        batch_size: int = 64,
+        checkpoint_path: Optional[str] = None,
+        max_retries: int = 3
+    ):
+        self.graph = graph
+        self.embeddings = embeddings
+        self.transformer = LLMGraphTransformer(llm=llm)
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.max_retries = max_retries
+    
+    def ensure_constraints(self):
+        """Create the uniqueness constraints the MERGE statements rely on, see ensure_schema"""
+        ensure_schema(self.graph)
+    
+    async def _extract(self, document: Document, semaphore: asyncio.Semaphore) -> GraphDocument:
+        """Extract a graph document from one chunk, retrying transient failures"""
+        async with semaphore:
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    return await self.transformer.aprocess_response(document)
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        raise
+                    logger.warning(f"Extraction failed (attempt {attempt}/{self.max_retries}): {e}")
+                    await asyncio.sleep(2 ** attempt)
+    
+    def _rows(self, ids: List[str], graph_documents: List[GraphDocument], embeddings: List[List[float]]) -> List[dict]:
+        rows = []
+        for chunk, graph_document, embedding in zip(ids, graph_documents, embeddings):
+            source = graph_document.source
+            metadata = _primitive(source.metadata)
+            rows.append({
+                "id": chunk,
+                "source": metadata.pop("source", ""),
+                "text": source.page_content,
+                "metadata": metadata,
+                "embedding": embedding,
+                "nodes": [
+                    {"id": node.id, "labels": _labels(node.type), "properties": _primitive(node.properties)}
+                    for node in graph_document.nodes
+                ],
+                "relationships": [
+                    {
+                        "source": rel.source.id,
+                        "source_labels": _labels(rel.source.type),
+                        "target": rel.target.id,
+                        "target_labels": _labels(rel.target.type),
+                        "type": rel.type,
+                        "properties": _primitive(rel.properties),
+                    }
+                    for rel in graph_document.relationships
+                ],
+            })
+        return rows
+    
+    def _write(self, rows: List[dict]):
+        """Write the chunks and their relationships in one transaction
+
+        A chunk whose Document exists is skipped by later runs, so it must
+        never be committed without its relationships.
+        """
+        def work(tx):
+            tx.run(DOCUMENT_WRITE_QUERY, {"rows": rows}).consume()
+            tx.run(RELATIONSHIP_WRITE_QUERY, {"rows": rows}).consume()
+        
+        self.graph.write_transaction(work)
+    
+    def _register_existing(self, pending: List[tuple]) -> Set[str]:
+        """Register the sources of chunks already in the graph and return their ids"""
+        rows = [{"id": chunk, "source": doc.metadata.get("source", "")} for chunk, doc in pending]
+        return {row["id"] for row in self.graph.query(EXISTING_CHUNKS_QUERY, {"rows": rows})}
+    
+    def _remove(self, source: str, ids: List[str]) -> Set[str]:
+        """Unregister the source from chunks and delete chunks left without one
+
+        Returns the entities whose neighborhood changed. The steps run in one
+        transaction, a chunk left without sources would not be found again.
+        """
+        def work(tx) -> Set[str]:
+            changed = set()
+            orphans = [row["id"] for row in tx.run(
+                UNREGISTER_SOURCE_QUERY, {"ids": ids, "source": source}
+            ).data()]
+            if orphans:
+                for row in tx.run(RELEASE_RELATIONSHIPS_QUERY, {"ids": orphans}).data():
+                    changed.update((row["source"], row["target"]))
+                for row in tx.run(DELETE_CHUNKS_QUERY, {"ids": orphans}).data():
+                    changed.add(row["id"])
+                    changed.update(row["neighbors"])
+            return changed
+        
+        return self.graph.write_transaction(work)
+    
+    def prune(self, seen: SeenChunks, prune_missing: bool = False, stats: Optional[IngestionStats] = None) -> int:
+        """Remove chunks that are no longer part of their source
+
+        With prune_missing, sources that were not seen at all are removed as
+        well. Chunk ids are paged from the graph, so memory use does not grow
+        with the size of a source. Entities affected by the removal are
+        recorded in stats.
+        """
+        removed = 0
+        sources = seen.sources()
+        if prune_missing:
+            for row in self.graph.query(KNOWN_SOURCES_QUERY):
+                if row["source"] not in sources:
+                    sources.append(row["source"])
+        
+        for source in sources:
+            stale = 0
+            after = ""
+            while True:
+                ids = [row["id"] for row in self.graph.query(
+                    SOURCE_CHUNKS_QUERY, {"source": source, "after": after, "limit": self.batch_size}
+                )]
+                if not ids:
+                    break
+                after = ids[-1]
+                unseen = seen.unseen(source, ids)
+                if unseen:
+                    changed = self._remove(source, unseen)
+                    if stats is not None:
+                        stats.touch(changed)
+                    stale += len(unseen)
+            if stale:
+                logger.info(f"Removed {stale} stale chunks of {source}")
+            removed += stale
+        return removed
+    
+    async def arun(self, documents: Iterable[Document], prune_missing: bool = False) -> IngestionStats:
+        """Ingest the documents, skipping chunks that are already ingested"""
+        stats = IngestionStats()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        seen = SeenChunks()
+        if len(self.checkpoint):
+            logger.info(f"Resuming from checkpoint with {len(self.checkpoint)} chunks already ingested")
+        
+        try:
+            for batch in _batched(documents, self.batch_size):
+                batch_ids = [chunk_id(doc) for doc in batch]
+                pending = list(zip(batch_ids, batch))
+                seen.add((doc.metadata.get("source", ""), chunk) for chunk, doc in pending)
+                
+                # Checkpointed chunks are skipped only after their source is
+                # registered, the same content may come from another source
+                existing = await asyncio.to_thread(self._register_existing, pending)
+                todo = [
+                    (chunk, doc) for chunk, doc in pending
+                    if chunk not in existing and chunk not in self.checkpoint
+                ]
+                stats.skipped += len(pending) - len(todo)
+                if not todo:
+                    continue
+                
+                ids = [chunk for chunk, _ in todo]
+                docs = [doc for _, doc in todo]
+                graph_documents, embeddings = await asyncio.gather(
+                    asyncio.gather(*[self._extract(doc, semaphore) for doc in docs]),
+                    self.embeddings.aembed_documents([doc.page_content for doc in docs]),
+                )
+                
+                rows = self._rows(ids, graph_documents, embeddings)
+                await asyncio.to_thread(self._write, rows)
+                self.checkpoint.add(ids)
+                
+                stats.chunks += len(rows)
+                stats.nodes += sum(len(row["nodes"]) for row in rows)
+                stats.relationships += sum(len(row["relationships"]) for row in rows)
+                for row in rows:
+                    stats.touch(node["id"] for node in row["nodes"])
+                    stats.touch(entity for rel in row["relationships"] for entity in (rel["source"], rel["target"]))
+                logger.info(
+                    f"Ingested {stats.chunks} chunks ({stats.skipped} unchanged), "
+                    f"{stats.nodes} nodes, {stats.relationships} relationships "
+                    f"in {stats.elapsed:.1f}s ({stats.throughput:.2f} chunks/s)"
+                )
+            
+            stats.removed = await asyncio.to_thread(self.prune, seen, prune_missing, stats)
+        finally:
+            seen.close()
+        
+        # The run is complete, so the next one starts from the graph state
+        self.checkpoint.clear()
+        return stats
+    
+    def run(self, documents: Iterable[Document], prune_missing: bool = False) -> IngestionStats:
+        """Synchronous entry point for scripts"""
+        return asyncio.run(self.arun(documents, prune_missing=prune_missing))
@@ -0,0 +1,72 @@
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+import os
+import sqlite3
+import tempfile
+
+class Checkpoint:
+    """Chunk ids stored in the graph by an unfinished run
+
+    Kept in a SQLite file, so resuming a run over a very large corpus does
+    not hold every committed id in memory.
+    """
+    
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:")
+        self._db.execute("CREATE TABLE IF NOT EXISTS done (id TEXT PRIMARY KEY) WITHOUT ROWID")
+        self._db.commit()
+    
+    def __contains__(self, chunk: str) -> bool:
+        return self._db.execute("SELECT 1 FROM done WHERE id = ?", (chunk,)).fetchone() is not None
+    
+    def __len__(self) -> int:
+        return self._db.execute("SELECT count(*) FROM done").fetchone()[0]
+    
+    def add(self, chunks: List[str]):
+        """Record the chunks of a committed batch"""
+        self._db.executemany("INSERT OR IGNORE INTO done (id) VALUES (?)", [(chunk,) for chunk in chunks])
+        self._db.commit()
+    
+    def clear(self):
+        """Forget all progress, e.g. after a completed run"""
+        self._db.close()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self._db = sqlite3.connect(":memory:")
+        self._db.execute("CREATE TABLE done (id TEXT PRIMARY KEY) WITHOUT ROWID")
+
+class SeenChunks:
+    """Disk-backed record of the chunks seen per source during a run"""
+    
+    def __init__(self):
+        handle, self._path = tempfile.mkstemp(prefix="ingest_seen_", suffix=".sqlite")
+        os.close(handle)
+        self._db = sqlite3.connect(self._path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE seen (source TEXT, id TEXT, PRIMARY KEY (source, id)) WITHOUT ROWID"
+        )
+    
+    def add(self, entries: Iterable[Tuple[str, str]]):
+        """Record (source, chunk id) pairs"""
+        self._db.executemany("INSERT OR IGNORE INTO seen (source, id) VALUES (?, ?)", entries)
+        self._db.commit()
+    
+    def sources(self) -> List[str]:
+        return [row[0] for row in self._db.execute("SELECT DISTINCT source FROM seen")]
+    
+    def unseen(self, source: str, ids: List[str]) -> List[str]:
+        """The ids among ``ids`` that were not seen for the source"""
+        return [
+            chunk for chunk in ids
+            if self._db.execute(
+                "SELECT 1 FROM seen WHERE source = ? AND id = ?", (source, chunk)
+            ).fetchone() is None
+        ]
+    
+    def close(self):
+        self._db.close()
+        if os.path.exists(self._path):
+            os.remove(self._path)
@@ -1,23 +1,66 @@
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
+from contextlib import asynccontextmanager
 import logging
+import uuid
 
+from .api import chat as chat_api
 from .api.chat import router as chat_router
+from .api.websocket import router as websocket_router
 from .config import settings
+from .services import metrics
+from .services.neo4j_driver import aclose_async_driver, close_driver
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging, with the trace id of the request in every record
+_log_handler = logging.StreamHandler()
+_log_handler.addFilter(metrics.TraceIdFilter())
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(levelname)s:%(name)s:[%(trace_id)s] %(message)s",
+    handlers=[_log_handler]
+)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown"""
+    logger.info("Starting Graph RAG Chatbot application...")
+    logger.info(f"Neo4j URI: {settings.neo4j_uri}")
+    # Warm up in the background so the process answers /live immediately
+    chat_api.start_graph_rag_service()
+    logger.info("Application started successfully!")
+    
+    yield
+    
+    logger.info("Shutting down Graph RAG Chatbot application...")
+    await chat_api.stop_graph_rag_service()
+    close_driver()
+    await aclose_async_driver()
+
 # Create FastAPI app
 app = FastAPI(
     title="Graph RAG Chatbot",
     description="A chatbot powered by Graph RAG using Neo4j and Azure OpenAI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Tag each request with a trace id and return it in the response headers"""
+    if not settings.trace_header:
+        return await call_next(request)
+    trace_id = request.headers.get(settings.trace_header) or uuid.uuid4().hex
+    token = metrics.trace_id_var.set(trace_id)
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.trace_id_var.reset(token)
+    response.headers[settings.trace_header] = trace_id
+    return response
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -26,24 +69,19 @@ templates = Jinja2Templates(directory="templates")
 
 # Include API routes
 app.include_router(chat_router, prefix="/api/v1", tags=["chat"])
+app.include_router(websocket_router, prefix="/api/v1", tags=["chat"])
+
+if settings.metrics_enabled:
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        """Prometheus scrape endpoint"""
+        return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Serve the main chat interface"""
     return templates.TemplateResponse("index.html", {"request": request})
 
-@app.on_event("startup")
-async def startup_event():
-    """Application startup event"""
-    logger.info("Starting Graph RAG Chatbot application...")
-    logger.info(f"Neo4j URI: {settings.neo4j_uri}")
-    logger.info("Application started successfully!")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Application shutdown event"""
-    logger.info("Shutting down Graph RAG Chatbot application...")
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
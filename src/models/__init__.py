@@ -1,3 +1,25 @@
-from .schemas import ChatRequest, ChatResponse, Entities, HealthResponse
+from .schemas import (
+    ChatRequest,
+    ChatResponse,
+    BatchChatRequest,
+    BatchChatResult,
+    BatchChatResponse,
+    Entities,
+    HealthResponse,
+    ReadinessResponse,
+    CacheStats,
+    CacheStatsResponse,
+)
 
-__all__ = ["ChatRequest", "ChatResponse", "Entities", "HealthResponse"]
+__all__ = [
+    "ChatRequest",
+    "ChatResponse",
+    "BatchChatRequest",
+    "BatchChatResult",
+    "BatchChatResponse",
+    "Entities",
+    "HealthResponse",
+    "ReadinessResponse",
+    "CacheStats",
+    "CacheStatsResponse",
+]
@@ -1,10 +1,13 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
+
+Priority = Literal["high", "normal", "low"]
 
 class ChatRequest(BaseModel):
     """Model for chat request"""
     message: str = Field(..., description="User's message")
     conversation_id: Optional[str] = Field(None, description="Conversation ID for context")
+    priority: Priority = Field("normal", description="Admission priority when the model calls are queued")
 
 class ChatResponse(BaseModel):
     """Model for chat response"""
@@ -12,6 +15,22 @@ class ChatResponse(BaseModel):
     conversation_id: str = Field(..., description="Conversation ID")
     sources: Optional[List[str]] = Field(None, description="Source information used")
 
+class BatchChatRequest(BaseModel):
+    """Model for a batch of questions"""
+    messages: List[str] = Field(..., min_length=1, description="Questions to answer")
+    stream: bool = Field(False, description="Stream the answers back as NDJSON as they finish")
+    priority: Priority = Field("low", description="Admission priority when the model calls are queued")
+
+class BatchChatResult(BaseModel):
+    """Answer to one question of a batch"""
+    index: int = Field(..., description="Position of the question in the request")
+    response: str = Field(..., description="Bot's response")
+    sources: Optional[List[str]] = Field(None, description="Source information used")
+
+class BatchChatResponse(BaseModel):
+    """Model for batch chat response"""
+    results: List[BatchChatResult] = Field(..., description="Answers in the order of the questions")
+
 class Entities(BaseModel):
     """Identifying information about entities."""
     names: List[str] = Field(
@@ -24,3 +43,23 @@ class HealthResponse(BaseModel):
     status: str = Field(..., description="Health status")
     neo4j_connected: bool = Field(..., description="Neo4j connection status")
     azure_openai_configured: bool = Field(..., description="Azure OpenAI configuration status")
+
+class ReadinessResponse(BaseModel):
+    """Readiness probe response"""
+    ready: bool = Field(..., description="Whether the service can answer questions")
+    phases: Dict[str, float] = Field(..., description="Duration of each completed startup phase in seconds")
+    error: Optional[str] = Field(None, description="Last startup error, if any")
+
+class CacheStats(BaseModel):
+    """Hit/miss statistics of a cache"""
+    hits: int = Field(..., description="Number of cache hits")
+    misses: int = Field(..., description="Number of cache misses")
+    size: int = Field(..., description="Number of cached entries")
+    hit_rate: float = Field(..., description="Fraction of lookups served from the cache")
+    memory_bytes: Optional[int] = Field(None, description="Estimated memory held by the entries")
+
+class CacheStatsResponse(BaseModel):
+    """Cache statistics response"""
+    answer_cache: Optional[CacheStats] = Field(None, description="Semantic answer cache statistics")
+    memo_cache: Optional[CacheStats] = Field(None, description="Query embedding and entity memo statistics")
+    neighborhood_cache: Optional[CacheStats] = Field(None, description="Entity neighborhood cache statistics")
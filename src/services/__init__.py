@@ -1,3 +1,4 @@
 from .graph_rag import GraphRAGService
+from .async_graph import AsyncNeo4jGraph
 
-__all__ = ["GraphRAGService"]
+__all__ = ["GraphRAGService", "AsyncNeo4jGraph"]
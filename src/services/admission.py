@@ -0,0 +1,142 @@
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import math
+import time
+import logging
+
+from .metrics import ADMISSION_IN_USE, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Lower ranks are admitted first
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+# Priority and admission deadline (time.monotonic) of the request being
+# handled, set by the API
+priority_var: ContextVar[str] = ContextVar("priority", default="normal")
+deadline_var: ContextVar[Optional[float]] = ContextVar("admission_deadline", default=None)
+
+class Overloaded(Exception):
+    """A call was shed instead of queued
+
+    ``reason`` is ``queue_full`` when too many calls were already waiting,
+    which maps to HTTP 429, or ``deadline`` when no slot freed up in time,
+    which maps to HTTP 503.
+    """
+
+    def __init__(self, limiter: str, reason: str, retry_after: int):
+        super().__init__(f"{limiter} is overloaded ({reason}), retry after {retry_after}s")
+        self.limiter = limiter
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def status_code(self) -> int:
+        return 429 if self.reason == "queue_full" else 503
+
+class Limiter:
+    """Async semaphore with a bounded priority queue and a wait deadline
+
+    Up to ``limit`` calls hold a slot at a time. Further calls wait in
+    priority order, then arrival order, until the request deadline or
+    ``max_wait`` seconds; beyond ``max_queue`` waiting calls they are
+    rejected right away. Only for use on one event loop.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_use = 0
+        self.queued = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        # Moving average of how long a slot is held, for Retry-After
+        self._hold_time = 1.0
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue is expected to drain"""
+        return max(1, math.ceil((self.queued + 1) * self._hold_time / self.limit))
+
+    def _reject(self, reason: str) -> Overloaded:
+        ADMISSION_REJECTED.inc(limiter=self.name, reason=reason)
+        return Overloaded(self.name, reason, self.retry_after())
+
+    def check(self):
+        """Raise Overloaded if a new call would be rejected right away"""
+        if self.queued >= self.max_queue and self.in_use >= self.limit:
+            raise self._reject("queue_full")
+
+    def _set_gauges(self):
+        ADMISSION_IN_USE.set(self.in_use, limiter=self.name)
+        ADMISSION_QUEUE_DEPTH.set(self.queued, limiter=self.name)
+
+    def _abandon(self, future: asyncio.Future):
+        future.cancel()
+        self.queued -= 1
+        self._set_gauges()
+
+    async def acquire(self, priority: Optional[str] = None):
+        """Wait for a slot, raising Overloaded when the call is shed"""
+        priority = priority or priority_var.get()
+        if self.in_use < self.limit and not self.queued:
+            self.in_use += 1
+            self._set_gauges()
+            ADMISSION_WAIT_SECONDS.observe(0.0, limiter=self.name, priority=priority)
+            return
+        if self.queued >= self.max_queue:
+            raise self._reject("queue_full")
+
+        deadline = deadline_var.get()
+        now = time.monotonic()
+        timeout = min(deadline - now, self.max_wait) if deadline is not None else self.max_wait
+        if timeout <= 0:
+            raise self._reject("deadline")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (PRIORITIES.get(priority, PRIORITIES["normal"]), next(self._order), future))
+        self.queued += 1
+        self._set_gauges()
+        try:
+            await asyncio.wait({future}, timeout=timeout)
+        except BaseException:
+            if future.done():
+                # The slot was handed over, but the caller is going away
+                self.release()
+            else:
+                self._abandon(future)
+            raise
+        finally:
+            ADMISSION_WAIT_SECONDS.observe(time.monotonic() - now, limiter=self.name, priority=priority)
+        if not future.done():
+            self._abandon(future)
+            raise self._reject("deadline")
+
+    def release(self):
+        """Hand the slot to the next waiter, or free it"""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.cancelled():
+                continue
+            self.queued -= 1
+            future.set_result(None)
+            self._set_gauges()
+            return
+        self.in_use -= 1
+        self._set_gauges()
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[str] = None) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block"""
+        await self.acquire(priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._hold_time = 0.8 * self._hold_time + 0.2 * (time.monotonic() - started)
+            self.release()
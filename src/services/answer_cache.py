@@ -0,0 +1,216 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+import json
+import struct
+import threading
+import time
+import logging
+
+import numpy as np
+
+from .cache_backend import CacheBackend, decode_vector, encode_vector, hash_key
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class CachedAnswer:
+    """An answer found in the cache and the sources it was generated from"""
+    answer: str
+    sources: List[str]
+
+@dataclass
+class _CacheEntry:
+    answer: str
+    embedding: np.ndarray
+    created_at: float
+    sources: List[str]
+
+# Shared entries: creation time, embedding dimension and answer length, the
+# float32 embedding, the UTF-8 answer, then the sources as JSON
+_HEADER = struct.Struct("<dII")
+
+def _encode_entry(entry: _CacheEntry) -> bytes:
+    answer = entry.answer.encode("utf-8")
+    header = _HEADER.pack(entry.created_at, len(entry.embedding), len(answer))
+    return header + encode_vector(entry.embedding) + answer + json.dumps(entry.sources).encode("utf-8")
+
+def _decode_entry(value: bytes) -> _CacheEntry:
+    created_at, dimension, answer_length = _HEADER.unpack_from(value)
+    start = _HEADER.size
+    end = start + 4 * dimension
+    answer = value[end:end + answer_length].decode("utf-8")
+    sources = json.loads(value[end + answer_length:].decode("utf-8"))
+    return _CacheEntry(answer, decode_vector(value[start:end]), created_at, sources)
+
+class SemanticAnswerCache:
+    """LRU/TTL cache of answers keyed by the embedding of the normalized question
+
+    A lookup first tries the exact normalized question and then the stored
+    question whose embedding has the highest cosine similarity, accepting it
+    when the similarity reaches the configured threshold.
+
+    With a shared backend, stored answers are also written there and exact
+    question misses are looked up in it, so workers reuse each other's
+    answers. Shared entries are scoped to ``generation``, e.g. the graph
+    version, so clearing only has to drop the local entries.
+    """
+    
+    def __init__(self, max_size: int, ttl: float, similarity_threshold: float,
+                 backend: Optional[CacheBackend] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.backend = backend
+        self.generation = ""
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def _is_expired(self, entry: _CacheEntry, now: float) -> bool:
+        return self.ttl > 0 and now - entry.created_at > self.ttl
+    
+    def _evict_expired(self, now: float):
+        expired = [key for key, entry in self._entries.items() if self._is_expired(entry, now)]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+    
+    def _shared_key(self, key: str) -> str:
+        # Versioned so entries in the older format without sources are not read
+        return f"answer:v2:{self.generation}:{hash_key(key)}"
+    
+    def _insert(self, key: str, entry: _CacheEntry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        self._matrix = None
+    
+    def _lookup_shared(self, key: str) -> Optional[CachedAnswer]:
+        """Fetch the answer another worker stored for the exact question"""
+        try:
+            value = self.backend.get(self._shared_key(key))
+        except Exception as e:
+            logger.warning(f"Shared answer cache lookup failed: {e}")
+            return None
+        return self._accept_shared(key, value)
+    
+    async def _alookup_shared(self, key: str) -> Optional[CachedAnswer]:
+        """Async variant of _lookup_shared"""
+        try:
+            value = await self.backend.aget(self._shared_key(key))
+        except Exception as e:
+            logger.warning(f"Shared answer cache lookup failed: {e}")
+            return None
+        return self._accept_shared(key, value)
+    
+    def _accept_shared(self, key: str, value: Optional[bytes]) -> Optional[CachedAnswer]:
+        """Keep an unexpired shared entry locally and return its answer"""
+        if value is None:
+            return None
+        entry = _decode_entry(value)
+        if self._is_expired(entry, time.time()):
+            return None
+        with self._lock:
+            self._insert(key, entry)
+        return CachedAnswer(entry.answer, list(entry.sources))
+    
+    def _similarity_matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            self._matrix_keys = list(self._entries.keys())
+            self._matrix = np.vstack([self._entries[key].embedding for key in self._matrix_keys])
+        return self._matrix
+    
+    def lookup(self, key: str, embedding: List[float]) -> Optional[CachedAnswer]:
+        """Return a cached answer for the question, or None on a miss"""
+        answer = self._lookup_local(key, embedding)
+        if answer is None and self.backend is not None:
+            answer = self._lookup_shared(key)
+        self._count(answer is not None)
+        return answer
+    
+    async def alookup(self, key: str, embedding: List[float]) -> Optional[CachedAnswer]:
+        """Async variant of lookup, the shared backend is read without blocking the loop"""
+        answer = self._lookup_local(key, embedding)
+        if answer is None and self.backend is not None:
+            answer = await self._alookup_shared(key)
+        self._count(answer is not None)
+        return answer
+    
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+    
+    def _lookup_local(self, key: str, embedding: List[float]) -> Optional[CachedAnswer]:
+        """The answer to the same or a similar question cached in this process"""
+        with self._lock:
+            now = time.time()
+            self._evict_expired(now)
+            
+            match = key if key in self._entries else None
+            if match is None and self._entries:
+                similarities = self._similarity_matrix() @ self._normalize(embedding)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    match = self._matrix_keys[best]
+            
+            if match is None:
+                return None
+            self._entries.move_to_end(match)
+            entry = self._entries[match]
+            return CachedAnswer(entry.answer, list(entry.sources))
+    
+    def _store_local(self, key: str, embedding: List[float], answer: str, sources: Optional[List[str]]) -> _CacheEntry:
+        entry = _CacheEntry(answer, self._normalize(embedding), time.time(), list(sources or []))
+        with self._lock:
+            self._insert(key, entry)
+        return entry
+    
+    def store(self, key: str, embedding: List[float], answer: str, sources: Optional[List[str]] = None):
+        """Cache the answer and its sources for a question, evicting the least recently used entry"""
+        entry = self._store_local(key, embedding, answer, sources)
+        if self.backend is not None:
+            try:
+                self.backend.set(self._shared_key(key), _encode_entry(entry))
+            except Exception as e:
+                logger.warning(f"Shared answer cache store failed: {e}")
+    
+    async def astore(self, key: str, embedding: List[float], answer: str, sources: Optional[List[str]] = None):
+        """Async variant of store"""
+        entry = self._store_local(key, embedding, answer, sources)
+        if self.backend is not None:
+            try:
+                await self.backend.aset(self._shared_key(key), _encode_entry(entry))
+            except Exception as e:
+                logger.warning(f"Shared answer cache store failed: {e}")
+    
+    def clear(self):
+        """Drop every locally cached answer"""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+    
+    def stats(self) -> dict:
+        """Hit/miss counters for tuning the similarity threshold"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,47 @@
+from typing import Any, Dict, List, Optional
+from neo4j import AsyncDriver, AsyncGraphDatabase
+import logging
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+class AsyncNeo4jGraph:
+    """Async counterpart of Neo4jGraph.query backed by the async Neo4j driver
+
+    Pass a shared driver to reuse its connection pool; it is then left open
+    by close.
+    """
+    
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        database: Optional[str] = None,
+        driver: Optional[AsyncDriver] = None
+    ):
+        self._owns_driver = driver is None
+        self._driver = driver or AsyncGraphDatabase.driver(url, auth=(username, password))
+        self._database = database
+    
+    async def query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Run a Cypher query and return the records as dictionaries"""
+        async with self._driver.session(database=self._database) as session:
+            result = await session.run(query, params or {})
+            return await result.data()
+    
+    async def read_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Run a read-only query in a managed read transaction, see PooledNeo4jGraph.read_query"""
+        async def work(tx: Any) -> List[Dict[str, Any]]:
+            result = await tx.run(query, params or {})
+            return await result.data()
+        
+        async with self._driver.session(database=self._database) as session:
+            execute = session.execute_read if settings.neo4j_read_routing else session.execute_write
+            return await execute(work)
+    
+    async def close(self):
+        """Close the underlying driver, unless it is shared"""
+        if self._owns_driver:
+            await self._driver.close()
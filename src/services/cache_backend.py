@@ -0,0 +1,344 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Embeddings are stored as little-endian float32, a quarter of their JSON size
+_VECTOR_DTYPE = np.dtype("<f4")
+
+def encode_vector(vector: Iterable[float]) -> bytes:
+    """Serialize an embedding compactly"""
+    return np.asarray(vector, dtype=_VECTOR_DTYPE).tobytes()
+
+def decode_vector(value: bytes) -> np.ndarray:
+    """Inverse of encode_vector"""
+    return np.frombuffer(value, dtype=_VECTOR_DTYPE)
+
+def hash_key(text: str) -> str:
+    """Fixed-length cache key for arbitrary text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class CacheBackend(ABC):
+    """Byte-valued key-value store behind the service caches
+
+    ``shared`` tells whether other processes see the same entries, in which
+    case the answer and neighborhood caches use the backend as a second tier
+    behind their in-process state. The async methods run the blocking calls
+    in a worker thread unless a backend has a native async client.
+    """
+    
+    shared = False
+    
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key])[0]
+    
+    @abstractmethod
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Values of the keys, None for missing or expired entries"""
+    
+    def set(self, key: str, value: bytes):
+        self.set_many({key: value})
+    
+    @abstractmethod
+    def set_many(self, items: Dict[str, bytes]):
+        """Store the entries, replacing existing ones"""
+    
+    @abstractmethod
+    def delete(self, keys: List[str]):
+        """Drop the entries of the keys"""
+    
+    async def aget(self, key: str) -> Optional[bytes]:
+        return (await self.aget_many([key]))[0]
+    
+    async def aget_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return await asyncio.to_thread(self.get_many, keys)
+    
+    async def aset(self, key: str, value: bytes):
+        await self.aset_many({key: value})
+    
+    async def aset_many(self, items: Dict[str, bytes]):
+        await asyncio.to_thread(self.set_many, items)
+    
+    @abstractmethod
+    def clear(self, prefix: str = ""):
+        """Drop the entries whose key starts with prefix"""
+    
+    @abstractmethod
+    def count(self, prefix: str = "") -> int:
+        """Number of entries whose key starts with prefix"""
+    
+    def close(self):
+        pass
+    
+    async def aclose(self):
+        self.close()
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU store with optional expiry; not shared between workers"""
+    
+    def __init__(self, max_entries: int, ttl: float = 0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        now = time.time()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and self.ttl > 0 and now - entry[1] > self.ttl:
+                    del self._entries[key]
+                    entry = None
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                values.append(entry[0] if entry is not None else None)
+        return values
+    
+    def set_many(self, items: Dict[str, bytes]):
+        now = time.time()
+        with self._lock:
+            for key, value in items.items():
+                self._entries[key] = (value, now)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    # Nothing blocks in process, so the async methods skip the thread hop
+    async def aget_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return self.get_many(keys)
+    
+    async def aset_many(self, items: Dict[str, bytes]):
+        self.set_many(items)
+    
+    def delete(self, keys: List[str]):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+    
+    def clear(self, prefix: str = ""):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+    
+    def count(self, prefix: str = "") -> int:
+        with self._lock:
+            return sum(1 for key in self._entries if key.startswith(prefix))
+
+class SQLiteCacheBackend(CacheBackend):
+    """Store in a SQLite file that the workers of one host share
+
+    The file runs in WAL mode with memory-mapped reads, so concurrent
+    readers in different processes do not block each other. Beyond
+    max_entries the least recently used entries are dropped. Reads only
+    note the keys they hit; the next write records their access time, so
+    a hit never takes the write lock.
+    """
+    
+    shared = True
+    
+    # Trim the table after this many writes instead of on every write
+    _TRIM_EVERY = 100
+    # Hits noted for the next write at most; later ones are not recorded
+    _MAX_TOUCHED = 10000
+    
+    def __init__(self, path: str, max_entries: int, ttl: float = 0, mmap_size: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._writes = 0
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key TEXT PRIMARY KEY, value BLOB, expires_at REAL, accessed_at REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        self._db.commit()
+    
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        now = time.time()
+        with self._lock:
+            found = {}
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(self._db.execute(
+                    f"SELECT key, value FROM cache WHERE key IN ({placeholders}) "
+                    "AND (expires_at IS NULL OR expires_at > ?)",
+                    (*chunk, now)
+                ).fetchall())
+            for key in found:
+                if len(self._touched) >= self._MAX_TOUCHED:
+                    break
+                self._touched[key] = now
+        return [found.get(key) for key in keys]
+    
+    def set_many(self, items: Dict[str, bytes]):
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            if self._touched:
+                self._db.executemany(
+                    "UPDATE cache SET accessed_at = ? WHERE key = ?",
+                    [(accessed_at, key) for key, accessed_at in self._touched.items()]
+                )
+                self._touched = {}
+            self._db.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                [(key, value, expires_at, now) for key, value in items.items()]
+            )
+            self._writes += len(items)
+            if self._writes >= self._TRIM_EVERY:
+                self._writes = 0
+                self._db.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+                self._db.execute(
+                    "DELETE FROM cache WHERE key IN "
+                    "(SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+            self._db.commit()
+    
+    def delete(self, keys: List[str]):
+        with self._lock:
+            self._db.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in keys])
+            self._db.commit()
+    
+    def clear(self, prefix: str = ""):
+        with self._lock:
+            self._db.execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+            self._db.commit()
+    
+    def count(self, prefix: str = "") -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT count(*) FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            ).fetchone()[0]
+    
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+class RedisCacheBackend(CacheBackend):
+    """Store in Redis, shared by all workers and hosts
+
+    Takes any client with the redis-py interface, e.g. a local stand-in,
+    and optionally one with the redis.asyncio interface for the async
+    methods; without a client both are created from the URL. Without an
+    async client the async methods run the blocking client in a thread.
+    Keys are prefixed so several deployments can share a Redis database,
+    and expire after ttl seconds when it is set.
+    """
+    
+    shared = True
+    
+    def __init__(self, client: Any = None, url: Optional[str] = None, prefix: str = "graphrag:", ttl: float = 0,
+                 async_client: Any = None):
+        if client is None:
+            import redis
+            import redis.asyncio
+            client = redis.Redis.from_url(url or "redis://localhost:6379/0")
+            async_client = redis.asyncio.Redis.from_url(url or "redis://localhost:6379/0")
+        self.client = client
+        self.async_client = async_client
+        self.prefix = prefix
+        self.ttl = ttl
+    
+    def _expiry(self) -> Optional[int]:
+        return int(self.ttl) if self.ttl > 0 else None
+    
+    def _scan(self, prefix: str) -> Iterable[Any]:
+        return self.client.scan_iter(match=self.prefix + prefix + "*", count=1000)
+    
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        return self.client.mget([self.prefix + key for key in keys])
+    
+    def set_many(self, items: Dict[str, bytes]):
+        pipeline = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipeline.set(self.prefix + key, value, ex=self._expiry())
+        pipeline.execute()
+    
+    async def aget_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        if self.async_client is None:
+            return await super().aget_many(keys)
+        if not keys:
+            return []
+        return await self.async_client.mget([self.prefix + key for key in keys])
+    
+    async def aset_many(self, items: Dict[str, bytes]):
+        if self.async_client is None:
+            return await super().aset_many(items)
+        async with self.async_client.pipeline(transaction=False) as pipeline:
+            for key, value in items.items():
+                pipeline.set(self.prefix + key, value, ex=self._expiry())
+            await pipeline.execute()
+    
+    def delete(self, keys: List[str]):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+    
+    def clear(self, prefix: str = ""):
+        batch = []
+        for key in self._scan(prefix):
+            batch.append(key)
+            if len(batch) >= 1000:
+                self.client.delete(*batch)
+                batch = []
+        if batch:
+            self.client.delete(*batch)
+    
+    def count(self, prefix: str = "") -> int:
+        return sum(1 for _ in self._scan(prefix))
+    
+    def close(self):
+        self.client.close()
+    
+    async def aclose(self):
+        self.close()
+        if self.async_client is not None:
+            # redis-py 5 renamed the coroutine to aclose
+            close = getattr(self.async_client, "aclose", None) or self.async_client.close
+            await close()
+
+def create_cache_backend(
+    backend: str,
+    max_entries: int,
+    ttl: float = 0,
+    sqlite_path: Optional[str] = None,
+    redis_url: Optional[str] = None,
+    redis_client: Any = None,
+    prefix: str = "graphrag:",
+    redis_async_client: Any = None
+) -> CacheBackend:
+    """Create the cache backend selected by name: memory, sqlite or redis"""
+    if backend == "memory":
+        return MemoryCacheBackend(max_entries=max_entries, ttl=ttl)
+    if backend == "sqlite":
+        return SQLiteCacheBackend(sqlite_path or ".cache/shared_cache.sqlite", max_entries=max_entries, ttl=ttl)
+    if backend == "redis":
+        return RedisCacheBackend(
+            client=redis_client, url=redis_url, prefix=prefix, ttl=ttl, async_client=redis_async_client
+        )
+    raise ValueError(f"Unknown cache backend '{backend}', expected memory, sqlite or redis")
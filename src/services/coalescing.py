@@ -0,0 +1,117 @@
+from typing import AsyncIterator, Awaitable, Callable, Dict, Generic, List, Optional, TypeVar
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class SingleFlight(Generic[T]):
+    """Share one in-flight computation among concurrent callers with the same key
+
+    The first caller starts the computation; callers arriving while it runs
+    await the same result. A caller that is cancelled does not cancel the
+    computation for the others.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+    
+    def __len__(self) -> int:
+        return len(self._calls)
+    
+    async def do(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """Return the result of the in-flight call for key, starting it if needed"""
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self._calls[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(future)
+    
+    def joining(self, key: str) -> bool:
+        """Whether a call for key is in flight"""
+        return key in self._calls
+    
+    def _forget(self, key: str, future: asyncio.Future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+
+class _StreamFlight:
+    """Buffers the chunks of one stream and replays them to every subscriber"""
+    
+    def __init__(self, source: AsyncIterator[str]):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(source))
+    
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+    
+    async def _pump(self, source: AsyncIterator[str]):
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+    
+    async def subscribe(self) -> AsyncIterator[str]:
+        """Chunks produced so far, then the live ones"""
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+class StreamFlights:
+    """Single-flight for streams: concurrent subscribers share one source stream
+
+    Late joiners first receive the chunks that were already produced. The
+    source is cancelled when its last subscriber goes away.
+    """
+    
+    def __init__(self):
+        self._flights: Dict[str, _StreamFlight] = {}
+    
+    def __len__(self) -> int:
+        return len(self._flights)
+    
+    def joining(self, key: str) -> bool:
+        """Whether a stream for key is in flight"""
+        return key in self._flights
+    
+    async def subscribe(self, key: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """Stream the chunks of the in-flight stream for key, starting it if needed"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _StreamFlight(factory())
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        
+        flight.subscribers += 1
+        try:
+            async for chunk in flight.subscribe():
+                yield chunk
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                self._forget(key, flight)
+                flight.task.cancel()
+    
+    def _forget(self, key: str, flight: _StreamFlight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
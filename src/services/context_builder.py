@@ -0,0 +1,151 @@
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Set
+import logging
+import re
+
+from langchain_core.documents import Document
+
+from .text_utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+
+def token_counter(encoding: str) -> Callable[[str], int]:
+    """Count tokens with tiktoken, or estimate them when it is unavailable
+
+    tiktoken downloads its encodings on first use, so offline deployments
+    fall back to the usual four characters per token.
+    """
+    try:
+        import tiktoken
+        encoder = tiktoken.get_encoding(encoding)
+        return lambda text: len(encoder.encode(text, disallowed_special=()))
+    except Exception as e:
+        logger.warning(f"Could not load tiktoken encoding '{encoding}', estimating token counts: {e}")
+        return lambda text: (len(text) + 3) // 4
+
+@dataclass
+class ContextItem:
+    """A graph triple or document chunk competing for the context budget"""
+    kind: str
+    text: str
+    source: str
+    retrieval_score: float
+    score: float = 0.0
+    tokens: int = 0
+
+@dataclass
+class Context:
+    """Prompt context and the items that made it into the token budget"""
+    text: str
+    items: List[ContextItem] = field(default_factory=list)
+    tokens: int = 0
+    dropped: int = 0
+    
+    @property
+    def sources(self) -> List[str]:
+        """Distinct sources of the included items, best first"""
+        return list(dict.fromkeys(item.source for item in self.items))
+
+def _document_source(document: Document) -> str:
+    metadata = document.metadata or {}
+    sources = metadata.get("sources")
+    if sources:
+        return ", ".join(sources) if isinstance(sources, list) else str(sources)
+    return str(metadata.get("source") or metadata.get("id") or document.page_content.strip()[:80])
+
+def _shingles(text: str, size: int = 3) -> Set[str]:
+    words = _WORD.findall(text)
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+class ContextBuilder:
+    """Dedupe, rank and pack retrieved graph and vector data into a token budget
+
+    Items are ranked by their normalized retrieval score blended with the
+    share of question entities they mention, then added best first until the
+    budget is spent. Chunks that repeat or mostly overlap a better chunk are
+    dropped before packing.
+    """
+    
+    def __init__(
+        self,
+        max_tokens: int,
+        entity_weight: float = 0.3,
+        duplicate_threshold: float = 0.8,
+        encoding: str = "cl100k_base",
+        count_tokens: Optional[Callable[[str], int]] = None
+    ):
+        self.max_tokens = max_tokens
+        self.entity_weight = entity_weight
+        self.duplicate_threshold = duplicate_threshold
+        self.count_tokens = count_tokens or token_counter(encoding)
+    
+    def _graph_items(self, rows: List[dict]) -> List[ContextItem]:
+        seen = set()
+        items = []
+        top = max((row.get("score") or 0.0 for row in rows), default=0.0) or 1.0
+        for row in rows:
+            key = normalize_text(row["output"])
+            if key in seen:
+                continue
+            seen.add(key)
+            items.append(ContextItem("graph", row["output"], row["output"], (row.get("score") or 0.0) / top))
+        return items
+    
+    def _document_items(self, documents: List[Document]) -> List[ContextItem]:
+        scores = [(document.metadata or {}).get("score") for document in documents]
+        if all(score is not None for score in scores) and documents:
+            top = max(scores) or 1.0
+            scores = [score / top for score in scores]
+        else:
+            # Fall back to the retriever's ranking
+            scores = [1.0 - i / len(documents) for i in range(len(documents))]
+        
+        items = []
+        kept: List[Set[str]] = []
+        for document, score in sorted(zip(documents, scores), key=lambda pair: pair[1], reverse=True):
+            text = document.page_content.strip()
+            if not text:
+                continue
+            shingles = _shingles(normalize_text(text))
+            if any(len(shingles & other) / min(len(shingles), len(other)) >= self.duplicate_threshold
+                   for other in kept):
+                continue
+            kept.append(shingles)
+            items.append(ContextItem("document", text, _document_source(document), score))
+        return items
+    
+    def _entity_overlap(self, text: str, entities: List[str]) -> float:
+        if not entities:
+            return 0.0
+        text = normalize_text(text)
+        return sum(1 for entity in entities if entity in text) / len(entities)
+    
+    def build(self, entities: List[str], graph_rows: List[dict], documents: List[Document]) -> Context:
+        """Assemble the prompt context from the retrieval results"""
+        entities = [normalize_text(entity) for entity in entities if entity.strip()]
+        items = self._graph_items(graph_rows) + self._document_items(documents)
+        for item in items:
+            overlap = self._entity_overlap(item.text, entities)
+            item.score = (1 - self.entity_weight) * item.retrieval_score + self.entity_weight * overlap
+        items.sort(key=lambda item: item.score, reverse=True)
+        
+        used = []
+        budget = self.max_tokens
+        for item in items:
+            item.tokens = self.count_tokens(item.text) + 1
+            if item.tokens <= budget:
+                used.append(item)
+                budget -= item.tokens
+        
+        graph_lines = "\n".join(item.text for item in used if item.kind == "graph")
+        documents_text = "#Document ".join(item.text for item in used if item.kind == "document")
+        text = f"""Graph data:
+{graph_lines}
+Vector data:
+{documents_text}
+        """
+        return Context(text=text, items=used, tokens=self.max_tokens - budget, dropped=len(items) - len(used))
@@ -0,0 +1,201 @@
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Set, Tuple
+import heapq
+import math
+import re
+import unicodedata
+import logging
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+
+# Words that on their own never identify an entity worth looking up
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from",
+    "has", "have", "he", "her", "his", "how", "in", "is", "it", "its", "of", "on", "or",
+    "she", "that", "the", "their", "they", "this", "to", "was", "were", "what", "when",
+    "where", "which", "who", "whom", "whose", "why", "with",
+}
+
+def _tokenize(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKC", text).lower()
+    return _TOKEN.findall(text)
+
+def _trigrams(token: str) -> Set[str]:
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class _Index:
+    """Immutable snapshot of the matcher's lookup tables"""
+    
+    def __init__(self, names: Dict[str, List[str]], token_index: Dict[str, Set[str]],
+                 trigram_index: Dict[Tuple[str, int], List[str]], longest: int):
+        self.names = names
+        self.token_index = token_index
+        self.trigram_index = trigram_index
+        self.longest = longest
+
+class EntityMatcher:
+    """In-process matcher for names of __Entity__ nodes mentioned in a question
+
+    Entity ids are indexed by their normalized token sequence. Matching scans
+    the question's n-grams longest-first for exact hits and then resolves
+    misspelled tokens through the token vocabulary with a fuzzy ratio.
+
+    Fuzzy candidates come from a character trigram index bucketed by token
+    length, so only vocabulary tokens that share trigrams with the misspelled
+    token and whose length allows the cutoff are compared. The posting lists
+    visited per token, the candidates compared per token and the tokens
+    resolved per question are all capped, which bounds the fuzzy work
+    independently of the vocabulary size.
+    """
+    
+    def __init__(
+        self,
+        fuzzy_cutoff: float = 0.88,
+        max_ngram: int = 6,
+        max_fuzzy_tokens: int = 8,
+        max_candidates: int = 32,
+        max_postings: int = 4096
+    ):
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.max_ngram = max_ngram
+        self.max_fuzzy_tokens = max_fuzzy_tokens
+        self.max_candidates = max_candidates
+        self.max_postings = max_postings
+        self._index = _Index({}, {}, {}, 0)
+    
+    @property
+    def size(self) -> int:
+        return len(self._index.names)
+    
+    def build(self, entity_ids: Iterable[str]):
+        """(Re)build the index from the ids of all __Entity__ nodes"""
+        names: Dict[str, List[str]] = {}
+        token_index: Dict[str, Set[str]] = {}
+        longest = 0
+        for entity_id in entity_ids:
+            if not entity_id:
+                continue
+            tokens = _tokenize(str(entity_id))
+            if not tokens:
+                continue
+            name = " ".join(tokens)
+            names.setdefault(name, []).append(str(entity_id))
+            for token in tokens:
+                token_index.setdefault(token, set()).add(name)
+            longest = max(longest, len(tokens))
+        
+        trigram_index: Dict[Tuple[str, int], List[str]] = {}
+        for token in token_index:
+            if len(token) < 4:
+                continue
+            for trigram in _trigrams(token):
+                trigram_index.setdefault((trigram, len(token)), []).append(token)
+        
+        # Swap in one assignment so concurrent lookups never see a partial index
+        self._index = _Index(names, token_index, trigram_index, min(longest, self.max_ngram))
+        logger.info(f"Entity matcher indexed {len(names)} entity names")
+    
+    def _is_candidate(self, tokens: List[str]) -> bool:
+        return not (len(tokens) == 1 and (tokens[0] in _STOPWORDS or len(tokens[0]) < 2))
+    
+    def _close_tokens(self, index: _Index, token: str, n: int = 3) -> List[str]:
+        """Vocabulary tokens within the fuzzy cutoff of the token, best first"""
+        # A ratio of at least c needs the shorter length to be at least
+        # c / (2 - c) of the longer one
+        cutoff = self.fuzzy_cutoff
+        shortest = math.ceil(len(token) * cutoff / (2 - cutoff))
+        longest = math.floor(len(token) * (2 - cutoff) / cutoff)
+        postings = [
+            index.trigram_index[key]
+            for key in ((trigram, length) for trigram in _trigrams(token) for length in range(shortest, longest + 1))
+            if key in index.trigram_index
+        ]
+        
+        # Rare trigrams first, they are the most selective
+        shared: Dict[str, int] = {}
+        visited = 0
+        for posting in sorted(postings, key=len):
+            if visited + len(posting) > self.max_postings:
+                break
+            visited += len(posting)
+            for candidate in posting:
+                shared[candidate] = shared.get(candidate, 0) + 1
+        
+        scored = []
+        for candidate in heapq.nlargest(self.max_candidates, shared, key=shared.__getitem__):
+            ratio = SequenceMatcher(None, token, candidate).ratio()
+            if ratio >= cutoff:
+                scored.append((ratio, candidate))
+        return [candidate for _, candidate in sorted(scored, reverse=True)[:n]]
+    
+    def _candidate_names(self, index: _Index, token: str, tokens: List[str]) -> List[str]:
+        """At most max_candidates names containing the token that fit the question
+
+        Names whose other tokens all occur in the question come first, longer
+        ones before shorter, so a common token does not crowd out the name
+        that is actually meant.
+        """
+        present = set(tokens)
+        fitting = []
+        for name in index.token_index[token]:
+            parts = name.split(" ")
+            if len(parts) > len(tokens):
+                continue
+            missing = sum(1 for part in parts if part != token and part not in present)
+            fitting.append((missing, -len(parts), name))
+        return [name for _, _, name in heapq.nsmallest(self.max_candidates, fitting)]
+    
+    def match(self, question: str) -> List[str]:
+        """Return the ids of entities mentioned in the question"""
+        index = self._index
+        names = index.names
+        if not names:
+            return []
+        
+        tokens = _tokenize(question)
+        used = [False] * len(tokens)
+        matches: List[str] = []
+        
+        def take(name: str, start: int, length: int):
+            for i in range(start, start + length):
+                used[i] = True
+            for entity_id in names[name]:
+                if entity_id not in matches:
+                    matches.append(entity_id)
+        
+        # Exact matches, longest n-grams first
+        for length in range(min(index.longest, len(tokens)), 0, -1):
+            for start in range(len(tokens) - length + 1):
+                if any(used[start:start + length]):
+                    continue
+                gram = tokens[start:start + length]
+                name = " ".join(gram)
+                if name in names and self._is_candidate(gram):
+                    take(name, start, length)
+        
+        # Fuzzy matches for the remaining tokens, longest tokens first
+        if self.fuzzy_cutoff < 1:
+            remaining = [
+                start for start, token in enumerate(tokens)
+                if not used[start] and len(token) >= 4 and token not in _STOPWORDS
+            ]
+            remaining.sort(key=lambda start: -len(tokens[start]))
+            for start in remaining[:self.max_fuzzy_tokens]:
+                if used[start]:
+                    continue
+                for close in self._close_tokens(index, tokens[start]):
+                    for name in self._candidate_names(index, close, tokens):
+                        length = name.count(" ") + 1
+                        for offset in range(length):
+                            begin = start - offset
+                            if begin < 0 or begin + length > len(tokens) or any(used[begin:begin + length]):
+                                continue
+                            gram = " ".join(tokens[begin:begin + length])
+                            if SequenceMatcher(None, gram, name).ratio() >= self.fuzzy_cutoff:
+                                take(name, begin, length)
+                                break
+        
+        return matches
@@ -1,78 +1,487 @@
-from typing import List, Optional
-from langchain_neo4j import Neo4jGraph
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
 from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
 from langchain_community.vectorstores import Neo4jVector
-from langchain_community.vectorstores.neo4j_vector import remove_lucene_chars
+from langchain_community.vectorstores.neo4j_vector import SearchType, remove_lucene_chars
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.retrievers import BaseRetriever
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
-from neo4j import GraphDatabase
+import asyncio
+import contextvars
+import json
 import logging
+import threading
+import time
 
 from ..config import settings
 from ..models.schemas import Entities
+from .admission import Limiter, Overloaded, priority_var
+from .answer_cache import CachedAnswer, SemanticAnswerCache
+from .cache_backend import CacheBackend, SQLiteCacheBackend, create_cache_backend
+from .async_graph import AsyncNeo4jGraph
+from .coalescing import SingleFlight, StreamFlights
+from .context_builder import Context, ContextBuilder
+from .entity_matcher import EntityMatcher
+from .local_vector import LocalVectorIndex, LocalVectorRetriever
+from .memo import MemoizedEmbeddings, MemoStore
+from .neighborhood_cache import NeighborhoodCache
+from .neo4j_driver import PooledNeo4jGraph, get_async_driver
+from .metrics import (
+    CHAT_ERRORS,
+    COALESCED_REQUESTS,
+    CONTEXT_TOKENS,
+    STAGE_SECONDS,
+    TOKEN_USAGE,
+    record_cache,
+    trace_id_var,
+    track_query,
+)
+from .text_utils import normalize_text
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Run config of chat model calls, so token usage ends up in the metrics
+LLM_RUN_CONFIG = {"callbacks": [TOKEN_USAGE]}
+
+def llm_run_config(**options: Any) -> dict:
+    """Run config of model calls, tagged with the trace id of the current request
+
+    The trace id reaches every callback handler through the run metadata
+    and tags, e.g. to find the LLM calls of a request in a tracing backend.
+    """
+    config = {**LLM_RUN_CONFIG, **options}
+    trace_id = trace_id_var.get()
+    if trace_id:
+        config["metadata"] = {"trace_id": trace_id}
+        config["tags"] = [f"trace_id:{trace_id}"]
+    return config
+
+# Fulltext lookup of one entity name and the triples around its matches
+_NEIGHBORHOOD_CALL = """CALL {
+  WITH query
+  CALL db.index.fulltext.queryNodes('fulltext_entity_id', query, {limit: $fulltext_limit})
+  YIELD node, score
+  CALL {
+    WITH node
+    MATCH (node)-[r:!MENTIONS]->(neighbor)
+    RETURN node.id + ' - ' + type(r) + ' -> ' + neighbor.id AS output
+    UNION ALL
+    WITH node
+    MATCH (node)<-[r:!MENTIONS]-(neighbor)
+    RETURN neighbor.id + ' - ' + type(r) + ' -> ' + node.id AS output
+  }
+  RETURN output, score, node.id AS entity
+  LIMIT $entity_limit
+}
+"""
+
+# Looks up the neighborhoods of all entities in one round-trip. Triples are
+# deduplicated on the server and keep the best fulltext score of the entity
+# that produced them.
+NEIGHBORHOOD_QUERY = "UNWIND $queries AS query\n" + _NEIGHBORHOOD_CALL + """WITH output, max(score) AS score
+RETURN output, score
+ORDER BY score DESC
+LIMIT $limit
+"""
+
+# Neighborhoods of several entity names, e.g. of a whole batch of questions.
+# Rows keep the entity name they were found for and the id of the matched
+# entity, so they can be split per question and cached per name.
+BATCH_NEIGHBORHOOD_QUERY = "UNWIND $queries AS query\n" + _NEIGHBORHOOD_CALL + """RETURN query, output, score, entity
+"""
+
+# Highest-degree entities, whose neighborhoods are precomputed
+TOP_ENTITIES_QUERY = """MATCH (e:__Entity__)
+RETURN e.id AS id, COUNT { (e)-[:!MENTIONS]-() } AS degree
+ORDER BY degree DESC
+LIMIT $limit
+"""
+
+# Ingestion bumps this version whenever it writes to the graph and records
+# the entities it changed since the previous version
+GRAPH_VERSION_QUERY = """OPTIONAL MATCH (m:__Meta__ {id: 'graph'})
+RETURN m.version AS version, m.previous_version AS previous_version, m.changed_entities AS changed_entities
+"""
+
+ENTITY_IDS_QUERY = """MATCH (e:__Entity__)
+RETURN e.id AS id
+"""
+
+# Retrieval query used by Neo4jVector.from_existing_graph for the text property
+VECTOR_RETRIEVAL_QUERY = (
+    "RETURN reduce(str='', k IN ['text'] | str + '\\n' + k + ': ' + coalesce(node[k], '')) AS text, "
+    "node {.*, `embedding`: Null, id: Null, `text`: Null} AS metadata, score"
+)
+
+BACKFILL_FETCH_QUERY = """MATCH (n:Document)
+WHERE n.embedding IS NULL AND n.text IS NOT NULL
+RETURN elementId(n) AS id, n.text AS text
+LIMIT $limit
+"""
+
+BACKFILL_WRITE_QUERY = """UNWIND $rows AS row
+MATCH (n:Document) WHERE elementId(n) = row.id
+CALL db.create.setNodeVectorProperty(n, 'embedding', row.embedding)
+RETURN count(*) AS updated
+"""
+
+@dataclass
+class ChatResult:
+    """An answer and the sources its context was built from"""
+    answer: str
+    sources: List[str] = field(default_factory=list)
+    cached: bool = False
+
+@dataclass
+class _BatchItem:
+    """A question of a batch on its way through chat_batch"""
+    message: str
+    key: str
+    embedding: Optional[List[float]] = None
+    cached: Optional[CachedAnswer] = None
+    context: Optional[Context] = None
+    answer: Any = None
+
 class GraphRAGService:
-    def __init__(self):
+    def __init__(
+        self,
+        initialize: bool = True,
+        cache_backend: Optional[CacheBackend] = None,
+        memo_backend: Optional[CacheBackend] = None
+    ):
         self.graph = None
+        self.async_graph = None
         self.llm = None
         self.embeddings = None
         self.vector_index = None
         self.vector_retriever = None
         self.entity_chain = None
+        self.answer_chain = None
         self.chain = None
-        self._initialize()
+        self.context_builder = None
+        # A configured memo file is only used with the default backend, a
+        # backend passed in is used as is
+        persist_memo = cache_backend is None
+        cache_backend = cache_backend or self._create_cache_backend()
+        # Shared backends add a cross-worker tier to the answer and
+        # neighborhood caches and also hold the memo
+        self.shared_cache = cache_backend if cache_backend.shared else None
+        self.answer_cache = None
+        if settings.answer_cache_enabled:
+            self.answer_cache = SemanticAnswerCache(
+                max_size=settings.answer_cache_max_size,
+                ttl=settings.answer_cache_ttl,
+                similarity_threshold=settings.answer_cache_similarity_threshold,
+                backend=self.shared_cache
+            )
+        self.entity_matcher = None
+        if settings.entity_matcher_enabled:
+            self.entity_matcher = EntityMatcher(
+                fuzzy_cutoff=settings.entity_matcher_fuzzy_cutoff,
+                max_fuzzy_tokens=settings.entity_matcher_max_fuzzy_tokens
+            )
+        self.neighborhood_cache = None
+        if settings.neighborhood_cache_enabled:
+            self.neighborhood_cache = NeighborhoodCache(
+                max_bytes=settings.neighborhood_cache_max_bytes,
+                backend=self.shared_cache
+            )
+        if memo_backend is None:
+            memo_backend = cache_backend
+            if persist_memo and self.shared_cache is None and settings.memo_cache_path:
+                memo_backend = SQLiteCacheBackend(settings.memo_cache_path, max_entries=settings.memo_cache_size)
+        self.memo = MemoStore(memo_backend)
+        self.llm_limiter = None
+        self.embedding_limiter = None
+        if settings.admission_enabled:
+            self.llm_limiter = Limiter(
+                "llm",
+                limit=settings.llm_max_concurrency,
+                max_queue=settings.admission_max_queue,
+                max_wait=settings.admission_max_wait
+            )
+            self.embedding_limiter = Limiter(
+                "embeddings",
+                limit=settings.embedding_max_concurrency,
+                max_queue=settings.admission_max_queue,
+                max_wait=settings.admission_max_wait
+            )
+        self._flights: SingleFlight[ChatResult] = SingleFlight()
+        self._stream_flights = StreamFlights()
+        self.ready = False
+        self.startup_error = None
+        self.startup_phases: Dict[str, float] = {}
+        self._graph_version = None
+        self._graph_version_seen = False
+        self._graph_version_checked_at = 0.0
+        self._health: Optional[dict] = None
+        self._health_checked_at = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=settings.retrieval_workers)
+        # Rebuilds after a graph version change run here, one at a time
+        self._rebuild_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="graph-rebuild")
+        self._rebuild_lock = threading.Lock()
+        self._rebuild_running = False
+        self._rebuild_pending = False
+        if initialize:
+            self._initialize()
+    
+    @staticmethod
+    def _create_cache_backend() -> CacheBackend:
+        """The cache backend selected by CACHE_BACKEND"""
+        if settings.cache_backend == "memory":
+            return create_cache_backend("memory", max_entries=settings.memo_cache_size)
+        return create_cache_backend(
+            settings.cache_backend,
+            max_entries=settings.cache_max_entries,
+            ttl=settings.cache_ttl,
+            sqlite_path=settings.cache_sqlite_path,
+            redis_url=settings.cache_redis_url,
+            prefix=settings.cache_key_prefix
+        )
+    
+    @classmethod
+    def from_components(
+        cls,
+        graph: Any,
+        async_graph: Any,
+        llm: BaseChatModel,
+        embeddings: Embeddings,
+        vector_retriever: BaseRetriever,
+        vector_index: Any = None,
+        cache_backend: Optional[CacheBackend] = None,
+        memo_backend: Optional[CacheBackend] = None
+    ) -> "GraphRAGService":
+        """Assemble a ready service from prebuilt components, e.g. local stand-ins
+
+        ``graph`` and ``async_graph`` only need ``query`` and ``read_query``
+        methods (async for the latter) compatible with PooledNeo4jGraph.
+        """
+        service = cls(initialize=False, cache_backend=cache_backend, memo_backend=memo_backend)
+        service.graph = graph
+        service.async_graph = async_graph
+        service.llm = llm
+        service.embeddings = MemoizedEmbeddings(
+            embeddings,
+            memo=service.memo,
+            model=settings.azure_openai_embeddings_deployment,
+            limiter=service.embedding_limiter
+        )
+        service.vector_index = vector_index
+        service.vector_retriever = vector_retriever
+        service._setup_chains()
+        service._refresh_entity_matcher()
+        service.ready = True
+        return service
+    
+    def _startup_steps(self) -> List[Tuple[str, Callable[[], None]]]:
+        """Initialization phases in the order they have to run"""
+        return [
+            ("neo4j", self._setup_graph),
+            ("models", self._setup_models),
+            ("vector_index", self._setup_vector_index),
+            ("chains", self._setup_chains),
+            ("entity_matcher", self._refresh_entity_matcher),
+            ("neighborhood_cache", self._precompute_neighborhoods),
+        ]
     
     def _initialize(self):
-        """Initialize all components"""
+        """Initialize all components, including the embedding backfill"""
         try:
-            # Initialize Neo4j Graph
-            self.graph = Neo4jGraph(
-                url=settings.neo4j_uri,
-                username=settings.neo4j_username,
-                password=settings.neo4j_password
-            )
+            for name, step in self._startup_steps():
+                started = time.perf_counter()
+                step()
+                self.startup_phases[name] = time.perf_counter() - started
+            self.ready = True
             
-            # Initialize Azure OpenAI LLM
-            self.llm = AzureChatOpenAI(
-                azure_endpoint=settings.azure_openai_endpoint,
-                api_key=settings.azure_openai_api_key,
-                azure_deployment=settings.azure_openai_chat_deployment,
-                api_version=settings.azure_openai_api_version,
-                temperature=0
-            )
+            started = time.perf_counter()
+            self.backfill_embeddings()
+            self.startup_phases["embedding_backfill"] = time.perf_counter() - started
             
-            # Initialize Azure OpenAI Embeddings
-            self.embeddings = AzureOpenAIEmbeddings(
+            logger.info("GraphRAGService initialized successfully")
+        
+        except Exception as e:
+            logger.error(f"Error initializing GraphRAGService: {e}")
+            raise
+    
+    async def warmup(self):
+        """Initialize the service without blocking the event loop
+
+        Startup phases run in worker threads and are retried until they
+        succeed, e.g. while Neo4j is still starting. The service is marked
+        ready as soon as it can answer questions; missing document embeddings
+        are then backfilled in batches in the background.
+        """
+        while not self.ready:
+            try:
+                for name, step in self._startup_steps():
+                    started = time.perf_counter()
+                    await asyncio.to_thread(step)
+                    self.startup_phases[name] = time.perf_counter() - started
+                    logger.info(f"Startup phase '{name}' took {self.startup_phases[name]:.2f}s")
+                self.ready = True
+                self.startup_error = None
+            except Exception as e:
+                self.startup_error = str(e)
+                logger.error(f"Error initializing GraphRAGService, retrying in "
+                             f"{settings.startup_retry_interval}s: {e}")
+                if self.async_graph is not None:
+                    await self.async_graph.close()
+                    self.async_graph = None
+                await asyncio.sleep(settings.startup_retry_interval)
+        
+        logger.info("GraphRAGService is ready")
+        
+        if settings.embedding_backfill_enabled:
+            # Backfill embeddings yield to the embedding calls of requests
+            priority_var.set("low")
+            started = time.perf_counter()
+            try:
+                count = await self.abackfill_embeddings()
+                self.startup_phases["embedding_backfill"] = time.perf_counter() - started
+                logger.info(f"Backfilled {count} document embeddings in "
+                            f"{self.startup_phases['embedding_backfill']:.2f}s")
+            except Exception as e:
+                logger.error(f"Error backfilling document embeddings: {e}")
+    
+    def _setup_graph(self):
+        """Connect to Neo4j through the process-wide pooled drivers"""
+        self.graph = PooledNeo4jGraph()
+        self.async_graph = AsyncNeo4jGraph(driver=get_async_driver(), database=settings.neo4j_database)
+    
+    def _setup_models(self):
+        """Create the Azure OpenAI chat model and embeddings"""
+        self.llm = AzureChatOpenAI(
+            azure_endpoint=settings.azure_openai_endpoint,
+            api_key=settings.azure_openai_api_key,
+            azure_deployment=settings.azure_openai_chat_deployment,
+            api_version=settings.azure_openai_api_version,
+            temperature=0,
+            stream_usage=settings.llm_stream_usage
+        )
+        
+        self.embeddings = MemoizedEmbeddings(
+            AzureOpenAIEmbeddings(
                 azure_endpoint=settings.azure_openai_endpoint,
                 api_key=settings.azure_openai_api_key,
                 azure_deployment=settings.azure_openai_embeddings_deployment,
                 api_version=settings.azure_openai_api_version
+            ),
+            memo=self.memo,
+            model=settings.azure_openai_embeddings_deployment,
+            limiter=self.embedding_limiter
+        )
+    
+    def _setup_vector_index(self):
+        """Attach to the Document vector and keyword indexes, creating them if missing
+
+        Unlike Neo4jVector.from_existing_graph this does not embed documents
+        that have no embedding yet; see backfill_embeddings. With the local
+        vector backend the snapshot exported by init_data.py is loaded instead.
+        """
+        if settings.vector_backend == "local":
+            self._load_local_vector_index()
+            return
+        
+        self.vector_index = Neo4jVector(
+            self.embeddings,
+            search_type=SearchType.HYBRID,
+            graph=self.graph,
+            index_name="vector",
+            keyword_index_name="keyword",
+            node_label="Document",
+            embedding_node_property="embedding",
+            retrieval_query=VECTOR_RETRIEVAL_QUERY
+        )
+        
+        embedding_dimension, index_type = self.vector_index.retrieve_existing_index()
+        if not index_type:
+            self.vector_index.create_new_index()
+        elif embedding_dimension != self.vector_index.embedding_dimension:
+            raise ValueError(
+                f"Vector index dimension {embedding_dimension} does not match "
+                f"the embedding dimension {self.vector_index.embedding_dimension}"
             )
-            
-            # Initialize Vector Index
-            self.vector_index = Neo4jVector.from_existing_graph(
-                self.embeddings,
-                search_type="hybrid",
-                node_label="Document",
-                text_node_properties=["text"],
-                embedding_node_property="embedding"
-            )
-            self.vector_retriever = self.vector_index.as_retriever()
-            
-            # Initialize Entity Chain
-            self._setup_entity_chain()
-            
-            # Initialize Main Chain
-            self._setup_main_chain()
-            
-            logger.info("GraphRAGService initialized successfully")
-            
+        if not self.vector_index.retrieve_existing_fts_index(["text"]):
+            self.vector_index.create_new_keyword_index(["text"])
+        
+        self.vector_retriever = self.vector_index.as_retriever(search_kwargs={"k": settings.vector_top_k})
+    
+    def _load_local_vector_index(self):
+        """Load the local vector snapshot and use it as the vector retriever"""
+        vector_index = LocalVectorIndex(
+            settings.local_vector_index_path,
+            nprobe=settings.local_vector_nprobe
+        )
+        vector_retriever = LocalVectorRetriever(
+            index=vector_index,
+            embeddings=self.embeddings,
+            k=settings.vector_top_k
+        )
+        # Requests keep using the previous snapshot until it is fully loaded
+        self.vector_index, self.vector_retriever = vector_index, vector_retriever
+    
+    def _reload_local_vector_index(self):
+        """Pick up a snapshot rebuilt by ingestion"""
+        if not isinstance(self.vector_index, LocalVectorIndex) or self.vector_index.is_current():
+            return
+        try:
+            self._load_local_vector_index()
         except Exception as e:
-            logger.error(f"Error initializing GraphRAGService: {e}")
-            raise
+            logger.warning(f"Could not reload local vector index: {e}")
+    
+    def _setup_chains(self):
+        """Create the entity extraction and answer chains and the context builder"""
+        self.context_builder = ContextBuilder(
+            max_tokens=settings.context_max_tokens,
+            entity_weight=settings.context_entity_weight,
+            duplicate_threshold=settings.context_duplicate_threshold,
+            encoding=settings.context_token_encoding
+        )
+        self._setup_entity_chain()
+        self._setup_main_chain()
+    
+    def backfill_embeddings(self) -> int:
+        """Embed Document nodes that have no embedding yet, in batches"""
+        total = 0
+        batch_size = settings.embedding_backfill_batch_size
+        while True:
+            rows = self.graph.query(BACKFILL_FETCH_QUERY, {"limit": batch_size})
+            if not rows:
+                break
+            vectors = self.embeddings.embed_documents([row["text"] for row in rows])
+            self.graph.query(BACKFILL_WRITE_QUERY, {
+                "rows": [{"id": row["id"], "embedding": vector} for row, vector in zip(rows, vectors)]
+            })
+            total += len(rows)
+            if len(rows) < batch_size:
+                break
+        return total
+    
+    async def abackfill_embeddings(self) -> int:
+        """Async variant of backfill_embeddings"""
+        total = 0
+        batch_size = settings.embedding_backfill_batch_size
+        while True:
+            rows = await self.async_graph.query(BACKFILL_FETCH_QUERY, {"limit": batch_size})
+            if not rows:
+                break
+            vectors = await self.embeddings.aembed_documents([row["text"] for row in rows])
+            await self.async_graph.query(BACKFILL_WRITE_QUERY, {
+                "rows": [{"id": row["id"], "embedding": vector} for row, vector in zip(rows, vectors)]
+            })
+            total += len(rows)
+            logger.info(f"Backfilled {total} document embeddings")
+            if len(rows) < batch_size:
+                break
+        return total
     
     def _setup_entity_chain(self):
         """Setup entity extraction chain"""
@@ -94,108 +503,914 @@ Answer:"""
         
         prompt = ChatPromptTemplate.from_template(template)
         
+        self.answer_chain = prompt | self.llm | StrOutputParser()
+        
         self.chain = (
             {
                 "context": self._full_retriever,
                 "question": RunnablePassthrough(),
             }
-            | prompt
-            | self.llm
-            | StrOutputParser()
+            | self.answer_chain
         )
     
-    def _graph_retriever(self, question: str) -> str:
-        """Collects the neighborhood of entities mentioned in the question"""
-        result = ""
-        try:
-            entities = self.entity_chain.invoke({"question": question})
-            for entity in entities.names:
-                response = self.graph.query(
-                    """CALL db.index.fulltext.queryNodes('fulltext_entity_id', $query, {limit:2})
-                    YIELD node,score
-                    CALL {
-                      WITH node
-                      MATCH (node)-[r:!MENTIONS]->(neighbor)
-                      RETURN node.id + ' - ' + type(r) + ' -> ' + neighbor.id AS output
-                      UNION ALL
-                      WITH node
-                      MATCH (node)<-[r:!MENTIONS]-(neighbor)
-                      RETURN neighbor.id + ' - ' + type(r) + ' -> ' +  node.id AS output
-                    }
-                    RETURN output LIMIT 50
-                    """,
-                    {"query": entity},
-                )
-                result += "\\n".join([el['output'] for el in response])
+    def _refresh_entity_matcher(self):
+        """Rebuild the local entity matcher from the graph"""
+        if self.entity_matcher is None:
+            return
+        try:
+            with track_query("entity_ids"):
+                rows = self.graph.read_query(ENTITY_IDS_QUERY)
+            self.entity_matcher.build(row["id"] for row in rows)
+        except Exception as e:
+            logger.warning(f"Could not build entity matcher: {e}")
+    
+    def _precompute_neighborhoods(self):
+        """Cache the neighborhoods of the NEIGHBORHOOD_PRECOMPUTE_TOP_N highest-degree entities"""
+        if self.neighborhood_cache is None or settings.neighborhood_precompute_top_n <= 0:
+            return
+        try:
+            with track_query("top_entities"):
+                rows = self.graph.read_query(TOP_ENTITIES_QUERY, {"limit": settings.neighborhood_precompute_top_n})
+            queries = self.neighborhood_cache.missing(self._neighborhood_queries([row["id"] for row in rows]))
+            if queries:
+                with track_query("neighborhood_precompute"):
+                    found = self.graph.read_query(BATCH_NEIGHBORHOOD_QUERY, self._neighborhood_params(queries))
+                self._store_neighborhoods(queries, found)
+            logger.info(f"Precomputed {len(queries)} entity neighborhoods")
+        except Exception as e:
+            logger.warning(f"Could not precompute entity neighborhoods: {e}")
+    
+    def _llm_slot(self):
+        """Hold an LLM slot for the duration of the block, if admission control is enabled"""
+        return self.llm_limiter.slot() if self.llm_limiter is not None else nullcontext()
+    
+    def check_admission(self):
+        """Raise Overloaded if new LLM calls would be shed right away"""
+        if self.llm_limiter is not None:
+            self.llm_limiter.check()
+    
+    def _match_entities(self, question: str) -> List[str]:
+        """Fast path: entity ids found in the question by the local matcher"""
+        if self.entity_matcher is None:
+            return []
+        matched = self.entity_matcher.match(question)
+        record_cache("entity_matcher", bool(matched))
+        return matched
+    
+    def _extract_entities(self, question: str) -> List[str]:
+        """Extract entity names from the question
+
+        Uses the local matcher when it finds any entity and falls back to the
+        entity chain, memoized per chat deployment, otherwise.
+        """
+        with STAGE_SECONDS.time(stage="entity_extraction"):
+            matched = self._match_entities(question)
+            if matched:
+                return matched
+            
+            key = MemoStore.make_key("entities", settings.azure_openai_chat_deployment, question)
+            value = self.memo.get(key)
+            if value is not None:
+                return json.loads(value)
+            names = self.entity_chain.invoke({"question": question}, config=llm_run_config()).names
+            self.memo.set(key, json.dumps(names).encode("utf-8"))
+            return names
+    
+    async def _aextract_entities(self, question: str) -> List[str]:
+        """Async variant of _extract_entities"""
+        with STAGE_SECONDS.time(stage="entity_extraction"):
+            matched = await asyncio.to_thread(self._match_entities, question)
+            if matched:
+                return matched
+            
+            key = MemoStore.make_key("entities", settings.azure_openai_chat_deployment, question)
+            value = await self.memo.aget(key)
+            if value is not None:
+                return json.loads(value)
+            async with self._llm_slot():
+                names = (await self.entity_chain.ainvoke({"question": question}, config=llm_run_config())).names
+            await self.memo.aset(key, json.dumps(names).encode("utf-8"))
+            return names
+    
+    def _neighborhood_queries(self, names: Iterable[str]) -> List[str]:
+        """Fulltext queries of the entity names, without duplicates"""
+        queries = []
+        for name in names:
+            query = remove_lucene_chars(name).strip()
+            if query and query not in queries:
+                queries.append(query)
+        return queries
+    
+    def _neighborhood_params(self, queries: List[str]) -> dict:
+        """Build the parameters of the neighborhood queries"""
+        return {
+            "queries": queries,
+            "fulltext_limit": settings.graph_fulltext_limit,
+            "entity_limit": settings.graph_entity_limit,
+            "limit": settings.graph_context_limit,
+        }
+    
+    def _cached_neighborhoods(self, queries: List[str]) -> Tuple[Dict[str, List[dict]], List[str]]:
+        """Neighborhoods found in the cache, and the queries that have to be looked up"""
+        if self.neighborhood_cache is None:
+            return {}, list(queries)
+        found, missing = self.neighborhood_cache.get_many(queries)
+        for query in queries:
+            record_cache("neighborhood", query in found)
+        return found, missing
+    
+    async def _acached_neighborhoods(self, queries: List[str]) -> Tuple[Dict[str, List[dict]], List[str]]:
+        """Async variant of _cached_neighborhoods"""
+        if self.neighborhood_cache is None:
+            return {}, list(queries)
+        found, missing = await self.neighborhood_cache.aget_many(queries)
+        for query in queries:
+            record_cache("neighborhood", query in found)
+        return found, missing
+    
+    @staticmethod
+    def _split_neighborhoods(queries: List[str], rows: List[dict]) -> Dict[str, List[dict]]:
+        by_query: Dict[str, List[dict]] = {query: [] for query in queries}
+        for row in rows:
+            by_query.setdefault(row["query"], []).append(row)
+        return by_query
+    
+    def _store_neighborhoods(self, queries: List[str], rows: List[dict]) -> Dict[str, List[dict]]:
+        """Split the rows of a neighborhood lookup per query and cache them"""
+        by_query = self._split_neighborhoods(queries, rows)
+        if self.neighborhood_cache is not None:
+            self.neighborhood_cache.put_many(by_query)
+        return by_query
+    
+    async def _astore_neighborhoods(self, queries: List[str], rows: List[dict]) -> Dict[str, List[dict]]:
+        """Async variant of _store_neighborhoods"""
+        by_query = self._split_neighborhoods(queries, rows)
+        if self.neighborhood_cache is not None:
+            await self.neighborhood_cache.aput_many(by_query)
+        return by_query
+    
+    def _fetch_neighborhoods(self, queries: List[str], name: str) -> Dict[str, List[dict]]:
+        """Neighborhoods per query, looking up the ones missing from the cache in one round-trip"""
+        found, missing = self._cached_neighborhoods(queries)
+        if missing:
+            with STAGE_SECONDS.time(stage="graph_query"), track_query(name):
+                rows = self.graph.read_query(BATCH_NEIGHBORHOOD_QUERY, self._neighborhood_params(missing))
+            found.update(self._store_neighborhoods(missing, rows))
+        return found
+    
+    async def _afetch_neighborhoods(self, queries: List[str], name: str) -> Dict[str, List[dict]]:
+        """Async variant of _fetch_neighborhoods"""
+        found, missing = await self._acached_neighborhoods(queries)
+        if missing:
+            with STAGE_SECONDS.time(stage="graph_query"), track_query(name):
+                rows = await self.async_graph.read_query(BATCH_NEIGHBORHOOD_QUERY, self._neighborhood_params(missing))
+            found.update(await self._astore_neighborhoods(missing, rows))
+        return found
+    
+    def _rank_neighborhoods(self, queries: List[str], by_query: Dict[str, List[dict]]) -> List[dict]:
+        """Merge the neighborhoods of a question's entities, as NEIGHBORHOOD_QUERY does"""
+        best: Dict[str, float] = {}
+        for query in queries:
+            for row in by_query.get(query, []):
+                best[row["output"]] = max(best.get(row["output"], row["score"]), row["score"])
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)[:settings.graph_context_limit]
+        return [{"output": output, "score": score} for output, score in ranked]
+    
+    def _graph_retriever(self, question: str) -> Tuple[List[str], List[dict]]:
+        """Collects the neighborhood of entities mentioned in the question
+
+        Returns the entity names and the deduplicated triples with their
+        relevance scores, best first.
+        """
+        names = []
+        try:
+            names = self._extract_entities(question)
+            queries = self._neighborhood_queries(names)
+            if not queries:
+                return names, []
+            if self.neighborhood_cache is not None:
+                return names, self._rank_neighborhoods(queries, self._fetch_neighborhoods(queries, "neighborhood"))
+            with STAGE_SECONDS.time(stage="graph_query"), track_query("neighborhood"):
+                return names, self.graph.read_query(NEIGHBORHOOD_QUERY, self._neighborhood_params(queries))
         except Exception as e:
             logger.error(f"Error in graph retrieval: {e}")
         
-        return result
+        return names, []
+    
+    def _vector_retriever(self, question: str) -> List[Document]:
+        """Collects the documents most similar to the question"""
+        with STAGE_SECONDS.time(stage="vector_search"):
+            return self.vector_retriever.invoke(question)
+    
+    def _build_context(self, graph_data: Tuple[List[str], List[dict]], vector_data: List[Document]) -> Context:
+        """Pack the retrieved data into the prompt context"""
+        names, rows = graph_data
+        context = self.context_builder.build(names, rows, vector_data)
+        CONTEXT_TOKENS.observe(context.tokens)
+        return context
+    
+    def _retrieve_context(self, question: str) -> Context:
+        """Combine graph and vector retrieval, running both branches concurrently"""
+        with STAGE_SECONDS.time(stage="retrieval"):
+            # Each branch runs in a copy of the request context, e.g. its trace id
+            graph_future = self._executor.submit(contextvars.copy_context().run, self._graph_retriever, question)
+            vector_future = self._executor.submit(contextvars.copy_context().run, self._vector_retriever, question)
+            
+            graph_data = ([], [])
+            try:
+                graph_data = graph_future.result(timeout=settings.graph_retrieval_timeout)
+            except Exception as e:
+                logger.warning(f"Graph retrieval unavailable, using vector data only: {e!r}")
+            
+            vector_data = []
+            try:
+                vector_data = vector_future.result(timeout=settings.vector_retrieval_timeout)
+            except Exception as e:
+                logger.warning(f"Vector retrieval unavailable: {e!r}")
+        
+        return self._build_context(graph_data, vector_data)
     
     def _full_retriever(self, question: str) -> str:
-        """Combine graph and vector retrieval"""
-        graph_data = self._graph_retriever(question)
-        vector_data = [el.page_content for el in self.vector_retriever.invoke(question)]
+        """Prompt context for the question, as used by the RAG chain"""
+        return self._retrieve_context(question).text
+    
+    async def _agraph_retriever(self, question: str) -> Tuple[List[str], List[dict]]:
+        """Async variant of _graph_retriever"""
+        names = []
+        try:
+            names = await self._aextract_entities(question)
+            queries = self._neighborhood_queries(names)
+            if not queries:
+                return names, []
+            if self.neighborhood_cache is not None:
+                by_query = await self._afetch_neighborhoods(queries, "neighborhood")
+                return names, self._rank_neighborhoods(queries, by_query)
+            with STAGE_SECONDS.time(stage="graph_query"), track_query("neighborhood"):
+                return names, await self.async_graph.read_query(NEIGHBORHOOD_QUERY, self._neighborhood_params(queries))
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.error(f"Error in graph retrieval: {e}")
         
-        final_data = f"""Graph data:
-{graph_data}
-Vector data:
-{"#Document ".join(vector_data)}
+        return names, []
+    
+    async def _avector_retriever(self, question: str) -> List[Document]:
+        """Async variant of _vector_retriever"""
+        with STAGE_SECONDS.time(stage="vector_search"):
+            return await self.vector_retriever.ainvoke(question)
+    
+    async def _run_branch(self, name: str, coro: Awaitable[T], timeout: float, default: T) -> T:
+        """Await a retrieval branch, falling back to a default on timeout or failure
+
+        Shed model calls are not a branch failure and propagate.
+        """
+        try:
+            return await asyncio.wait_for(coro, timeout=timeout)
+        except Overloaded:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"{name} retrieval timed out after {timeout}s")
+        except Exception as e:
+            logger.warning(f"{name} retrieval failed: {e!r}")
+        return default
+    
+    async def _aretrieve_context(self, question: str) -> Context:
+        """Async variant of _retrieve_context
+
+        Graph and vector retrieval run concurrently, so the slower branch sets
+        the latency. A slow or failing graph branch degrades to vector-only
+        context.
+        """
+        with STAGE_SECONDS.time(stage="retrieval"):
+            graph_data, vector_data = await asyncio.gather(
+                self._run_branch("Graph", self._agraph_retriever(question), settings.graph_retrieval_timeout, ([], [])),
+                self._run_branch("Vector", self._avector_retriever(question), settings.vector_retrieval_timeout, []),
+            )
+        return self._build_context(graph_data, vector_data)
+    
+    def _graph_version_due(self) -> bool:
+        """Throttle graph version polling to the configured interval"""
+        now = time.monotonic()
+        if now - self._graph_version_checked_at < settings.graph_version_check_interval:
+            return False
+        self._graph_version_checked_at = now
+        return True
+    
+    def _observe_graph_version(self, rows: List[dict]) -> bool:
+        """Invalidate caches when ingestion has changed the graph
+
+        Cached neighborhoods are only dropped for the entities changed by
+        ingestion when exactly one version was written since the last check;
+        otherwise all of them are. Returns whether the version changed since
+        it was last observed.
+        """
+        row = rows[0] if rows else {}
+        version = row.get("version")
+        self._scope_caches(version)
+        changed = self._graph_version_seen and version != self._graph_version
+        if changed:
+            logger.info(f"Graph version changed from {self._graph_version} to {version}, invalidating caches")
+            entities = row.get("changed_entities")
+            if self._graph_version is None or row.get("previous_version") != self._graph_version:
+                entities = None
+            self.invalidate_caches(entities)
+        self._graph_version = version
+        self._graph_version_seen = True
+        return changed
+    
+    def _scope_caches(self, version: Optional[int]):
+        """Scope shared cache entries to the graph version they were computed for"""
+        generation = str(version) if version is not None else ""
+        for cache in (self.answer_cache, self.neighborhood_cache):
+            if cache is not None:
+                cache.generation = generation
+    
+    def _refresh_graph_version(self):
+        """Poll the graph version written by init_data.py"""
+        if not self._graph_version_due():
+            return
+        try:
+            with track_query("graph_version"):
+                rows = self.graph.read_query(GRAPH_VERSION_QUERY)
+            if self._observe_graph_version(rows):
+                self._schedule_rebuild()
+        except Exception as e:
+            logger.warning(f"Could not read graph version: {e}")
+    
+    async def _arefresh_graph_version(self):
+        """Async variant of _refresh_graph_version"""
+        if not self._graph_version_due():
+            return
+        try:
+            with track_query("graph_version"):
+                rows = await self.async_graph.read_query(GRAPH_VERSION_QUERY)
+            if self._observe_graph_version(rows):
+                self._schedule_rebuild()
+        except Exception as e:
+            logger.warning(f"Could not read graph version: {e}")
+    
+    def _schedule_rebuild(self):
+        """Rebuild the structures derived from the graph in the background
+
+        Requests keep being answered from the current entity matcher, vector
+        snapshot and neighborhoods, each of which is swapped in whole once
+        rebuilt. A version change seen while a rebuild runs queues exactly
+        one more rebuild.
+        """
+        with self._rebuild_lock:
+            if self._rebuild_running:
+                self._rebuild_pending = True
+                return
+            self._rebuild_running = True
+        try:
+            self._rebuild_executor.submit(self._rebuild)
+        except RuntimeError:
+            # The service is shutting down
+            with self._rebuild_lock:
+                self._rebuild_running = False
+    
+    def _rebuild(self):
+        while True:
+            started = time.perf_counter()
+            try:
+                self._refresh_entity_matcher()
+                self._reload_local_vector_index()
+                self._precompute_neighborhoods()
+                logger.info(f"Rebuilt graph-derived structures in {time.perf_counter() - started:.1f}s")
+            except Exception as e:
+                logger.error(f"Error rebuilding graph-derived structures: {e}")
+            with self._rebuild_lock:
+                if not self._rebuild_pending:
+                    self._rebuild_running = False
+                    return
+                self._rebuild_pending = False
+    
+    def _lookup_answer(self, message: str) -> Tuple[str, Optional[List[float]], Optional[CachedAnswer]]:
+        """Return the cache key, question embedding and cached answer, if any"""
+        key = normalize_text(message)
+        if self.answer_cache is None:
+            return key, None, None
+        try:
+            with STAGE_SECONDS.time(stage="answer_cache_lookup"):
+                embedding = self.embeddings.embed_query(message)
+                cached = self.answer_cache.lookup(key, embedding)
+            record_cache("answer", cached is not None)
+            return key, embedding, cached
+        except Exception as e:
+            logger.warning(f"Answer cache lookup failed: {e}")
+            return key, None, None
+    
+    async def _alookup_answer(self, message: str) -> Tuple[str, Optional[List[float]], Optional[CachedAnswer]]:
+        """Async variant of _lookup_answer"""
+        key = normalize_text(message)
+        if self.answer_cache is None:
+            return key, None, None
+        try:
+            with STAGE_SECONDS.time(stage="answer_cache_lookup"):
+                embedding = await self.embeddings.aembed_query(message)
+                cached = await self.answer_cache.alookup(key, embedding)
+            record_cache("answer", cached is not None)
+            return key, embedding, cached
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.warning(f"Answer cache lookup failed: {e}")
+            return key, None, None
+    
+    def _store_answer(self, key: str, embedding: Optional[List[float]], answer: str, sources: List[str]):
+        """Remember a successfully generated answer with its sources"""
+        if self.answer_cache is not None and embedding is not None and answer:
+            self.answer_cache.store(key, embedding, answer, sources)
+    
+    async def _astore_answer(self, key: str, embedding: Optional[List[float]], answer: str, sources: List[str]):
+        """Async variant of _store_answer"""
+        if self.answer_cache is not None and embedding is not None and answer:
+            await self.answer_cache.astore(key, embedding, answer, sources)
+    
+    def invalidate_caches(self, entities: Optional[Iterable[str]] = None):
+        """Drop cached answers, e.g. after the graph has been re-ingested
+
+        Cached neighborhoods are dropped for the given changed entities only,
+        or all of them when no entities are given.
         """
-        return final_data
+        if self.answer_cache is not None:
+            self.answer_cache.clear()
+        if self.neighborhood_cache is not None:
+            if entities is None:
+                self.neighborhood_cache.clear()
+            else:
+                dropped = self.neighborhood_cache.invalidate(entities)
+                logger.info(f"Dropped {dropped} cached neighborhoods")
+    
+    def cache_stats(self) -> dict:
+        """Hit/miss statistics of the service caches"""
+        return {
+            "answer_cache": self.answer_cache.stats() if self.answer_cache is not None else None,
+            "memo_cache": self.memo.stats(),
+            "neighborhood_cache": self.neighborhood_cache.stats() if self.neighborhood_cache is not None else None
+        }
     
     def chat(self, message: str) -> str:
         """Main chat method"""
+        return self.chat_with_sources(message).answer
+    
+    def chat_with_sources(self, message: str) -> ChatResult:
+        """Answer a question and report the sources that made it into the context"""
         try:
-            response = self.chain.invoke(message)
-            return response
+            self._refresh_graph_version()
+            key, embedding, cached = self._lookup_answer(message)
+            if cached is not None:
+                return ChatResult(answer=cached.answer, sources=cached.sources, cached=True)
+            
+            context = self._retrieve_context(message)
+            with STAGE_SECONDS.time(stage="llm_completion"):
+                response = self.answer_chain.invoke({"context": context.text, "question": message}, config=llm_run_config())
+            self._store_answer(key, embedding, response, context.sources)
+            return ChatResult(answer=response, sources=context.sources)
         except Exception as e:
+            CHAT_ERRORS.inc(method="chat")
             logger.error(f"Error in chat: {e}")
-            return "I'm sorry, I encountered an error while processing your request."
+            return ChatResult(answer="I'm sorry, I encountered an error while processing your request.")
     
-    def chat_stream(self, message: str):
-        """Streaming chat method"""
+    def chat_stream(self, message: str) -> Iterator[str]:
+        """Streaming chat method
+
+        Yields an empty chunk as soon as retrieval has finished (or the answer
+        was found in the cache), followed by the answer tokens as the LLM
+        produces them.
+        """
         try:
-            # For now, simulate streaming by yielding the full response
-            # In the future, this can be replaced with actual LLM streaming
-            response = self.chain.invoke(message)
+            self._refresh_graph_version()
+            key, embedding, cached = self._lookup_answer(message)
+            if cached is not None:
+                yield ""
+                yield cached.answer
+                return
+            
+            context = self._retrieve_context(message)
+            yield ""
             
-            # Simulate word-by-word streaming
-            words = response.split()
-            for word in words:
-                yield word + " "
+            response = ""
+            started = time.perf_counter()
+            for chunk in self.answer_chain.stream({"context": context.text, "question": message}, config=llm_run_config()):
+                if not response and chunk:
+                    STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm_first_token")
+                response += chunk
+                yield chunk
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm_completion")
+            self._store_answer(key, embedding, response, context.sources)
+        
+        except Exception as e:
+            CHAT_ERRORS.inc(method="chat_stream")
+            logger.error(f"Error in streaming chat: {e}")
+            yield "I'm sorry, I encountered an error while processing your request."
+    
+    async def achat(self, message: str) -> str:
+        """Async chat method that keeps the event loop free during I/O"""
+        return (await self.achat_with_sources(message)).answer
+    
+    async def achat_with_sources(self, message: str) -> ChatResult:
+        """Async variant of chat_with_sources
+
+        Concurrent requests for the same normalized question share a single
+        computation.
+        """
+        if not settings.request_coalescing_enabled:
+            return await self._achat_with_sources(message)
+        key = normalize_text(message)
+        if self._flights.joining(key):
+            COALESCED_REQUESTS.inc(method="achat")
+        return await self._flights.do(key, lambda: self._achat_with_sources(message))
+    
+    async def _achat_with_sources(self, message: str) -> ChatResult:
+        try:
+            await self._arefresh_graph_version()
+            key, embedding, cached = await self._alookup_answer(message)
+            if cached is not None:
+                return ChatResult(answer=cached.answer, sources=cached.sources, cached=True)
+            
+            context = await self._aretrieve_context(message)
+            async with self._llm_slot():
+                with STAGE_SECONDS.time(stage="llm_completion"):
+                    response = await self.answer_chain.ainvoke({"context": context.text, "question": message}, config=llm_run_config())
+            await self._astore_answer(key, embedding, response, context.sources)
+            return ChatResult(answer=response, sources=context.sources)
+        except Overloaded:
+            raise
+        except Exception as e:
+            CHAT_ERRORS.inc(method="achat")
+            logger.error(f"Error in chat: {e}")
+            return ChatResult(answer="I'm sorry, I encountered an error while processing your request.")
+    
+    async def achat_stream(self, message: str) -> AsyncIterator[str]:
+        """Async streaming chat method, see chat_stream
+
+        Concurrent streams for the same normalized question share a single
+        computation; late joiners first receive the chunks produced so far.
+        """
+        if not settings.request_coalescing_enabled:
+            async for chunk in self._achat_stream(message):
+                yield chunk
+            return
+        key = normalize_text(message)
+        if self._stream_flights.joining(key):
+            COALESCED_REQUESTS.inc(method="achat_stream")
+        async for chunk in self._stream_flights.subscribe(key, lambda: self._achat_stream(message)):
+            yield chunk
+    
+    async def _achat_stream(self, message: str) -> AsyncIterator[str]:
+        try:
+            await self._arefresh_graph_version()
+            key, embedding, cached = await self._alookup_answer(message)
+            if cached is not None:
+                yield ""
+                yield cached.answer
+                return
+            
+            context = await self._aretrieve_context(message)
+            # The start signal is only sent once the completion is admitted
+            async with self._llm_slot():
+                yield ""
                 
+                response = ""
+                started = time.perf_counter()
+                async for chunk in self.answer_chain.astream({"context": context.text, "question": message}, config=llm_run_config()):
+                    if not response and chunk:
+                        STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm_first_token")
+                    response += chunk
+                    yield chunk
+                STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm_completion")
+            await self._astore_answer(key, embedding, response, context.sources)
+        
+        except Overloaded:
+            raise
         except Exception as e:
+            CHAT_ERRORS.inc(method="achat_stream")
             logger.error(f"Error in streaming chat: {e}")
             yield "I'm sorry, I encountered an error while processing your request."
     
-    def health_check(self) -> dict:
-        """Check the health of the service"""
+    def _batch_answers(self, messages: List[str], embeddings: List[Optional[List[float]]]) -> List[_BatchItem]:
+        """Look up every question of a batch in the answer cache"""
+        items = []
+        for message, embedding in zip(messages, embeddings):
+            item = _BatchItem(message=message, key=normalize_text(message), embedding=embedding)
+            if self.answer_cache is not None and embedding is not None:
+                item.cached = self.answer_cache.lookup(item.key, embedding)
+                record_cache("answer", item.cached is not None)
+            items.append(item)
+        return items
+    
+    async def _abatch_answers(self, messages: List[str], embeddings: List[Optional[List[float]]]) -> List[_BatchItem]:
+        """Async variant of _batch_answers"""
+        items = []
+        for message, embedding in zip(messages, embeddings):
+            item = _BatchItem(message=message, key=normalize_text(message), embedding=embedding)
+            if self.answer_cache is not None and embedding is not None:
+                item.cached = await self.answer_cache.alookup(item.key, embedding)
+                record_cache("answer", item.cached is not None)
+            items.append(item)
+        return items
+    
+    def _batch_known_entities(self, questions: List[str]) -> Tuple[List[Optional[List[str]]], List[int]]:
+        """Entities found by the local matcher or in the memo, and the questions that need the LLM"""
+        names: List[Optional[List[str]]] = []
+        for question in questions:
+            matched = self._match_entities(question)
+            if matched:
+                names.append(matched)
+                continue
+            value = self.memo.get(MemoStore.make_key("entities", settings.azure_openai_chat_deployment, question))
+            names.append(json.loads(value) if value is not None else None)
+        return names, [i for i, found in enumerate(names) if found is None]
+    
+    def _remember_entities(self, questions: List[str], names: List[Optional[List[str]]],
+                           pending: List[int], extracted: List[Any]):
+        """Fill in and memoize the entities extracted by the LLM"""
+        for i, entities in zip(pending, extracted):
+            if isinstance(entities, Exception):
+                logger.error(f"Error extracting entities: {entities}")
+                names[i] = []
+                continue
+            names[i] = entities.names
+            key = MemoStore.make_key("entities", settings.azure_openai_chat_deployment, questions[i])
+            self.memo.set(key, json.dumps(entities.names).encode("utf-8"))
+    
+    def _batch_neighborhood_queries(self, names: List[List[str]]) -> Tuple[List[str], List[List[str]]]:
+        """Fulltext queries across all entities of a batch, and each question's queries"""
+        per_question = [self._neighborhood_queries(entities) for entities in names]
+        return self._neighborhood_queries(query for queries in per_question for query in queries), per_question
+    
+    def _batch_config(self) -> dict:
+        """Run config of the batched model and retriever calls"""
+        return llm_run_config(max_concurrency=settings.batch_max_concurrency)
+    
+    async def _abatch_admitted(self, chain: Any, inputs: List[dict]) -> List[Any]:
+        """Like chain.abatch with return_exceptions, holding one LLM slot per call
+
+        At most BATCH_MAX_CONCURRENCY calls run at a time, and each of them
+        is admitted like a single request.
+        """
+        semaphore = asyncio.Semaphore(settings.batch_max_concurrency)
+        
+        async def invoke(payload: dict) -> Any:
+            async with semaphore:
+                try:
+                    async with self._llm_slot():
+                        return await chain.ainvoke(payload, config=llm_run_config())
+                except Exception as e:
+                    return e
+        
+        return await asyncio.gather(*(invoke(payload) for payload in inputs))
+    
+    def _prepare_batch(self, messages: List[str]) -> List[_BatchItem]:
+        """Embed, cache-check and retrieve context for a batch with shared calls"""
+        self._refresh_graph_version()
+        embeddings: List[Optional[List[float]]] = [None] * len(messages)
         try:
-            # Test Neo4j connection
-            neo4j_status = False
+            with STAGE_SECONDS.time(stage="embedding"):
+                embeddings = self.embeddings.embed_queries(messages)
+        except Exception as e:
+            logger.warning(f"Batch embedding failed: {e}")
+        items = self._batch_answers(messages, embeddings)
+        pending = [item for item in items if item.cached is None]
+        questions = [item.message for item in pending]
+        if not questions:
+            return items
+        
+        with STAGE_SECONDS.time(stage="entity_extraction"):
+            names, unknown = self._batch_known_entities(questions)
+            if unknown:
+                extracted = self.entity_chain.batch(
+                    [{"question": questions[i]} for i in unknown],
+                    config=self._batch_config(),
+                    return_exceptions=True
+                )
+                self._remember_entities(questions, names, unknown, extracted)
+        
+        graph_rows: List[List[dict]] = [[] for _ in questions]
+        queries, per_question = self._batch_neighborhood_queries(names)
+        if queries:
             try:
-                self.graph.query("RETURN 1")
-                neo4j_status = True
-            except:
-                pass
+                by_query = self._fetch_neighborhoods(queries, "batch_neighborhood")
+                graph_rows = [self._rank_neighborhoods(question_queries, by_query) for question_queries in per_question]
+            except Exception as e:
+                logger.error(f"Error in batch graph retrieval: {e}")
+        
+        with STAGE_SECONDS.time(stage="vector_search"):
+            documents = self.vector_retriever.batch(questions, config=self._batch_config(), return_exceptions=True)
+        
+        for item, entities, rows, docs in zip(pending, names, graph_rows, documents):
+            if isinstance(docs, Exception):
+                logger.warning(f"Vector retrieval unavailable: {docs!r}")
+                docs = []
+            item.context = self._build_context((entities, rows), docs)
+        return items
+    
+    async def _aprepare_batch(self, messages: List[str]) -> List[_BatchItem]:
+        """Async variant of _prepare_batch; graph and vector retrieval run concurrently"""
+        await self._arefresh_graph_version()
+        embeddings: List[Optional[List[float]]] = [None] * len(messages)
+        try:
+            with STAGE_SECONDS.time(stage="embedding"):
+                embeddings = await self.embeddings.aembed_queries(messages)
+        except Exception as e:
+            logger.warning(f"Batch embedding failed: {e}")
+        items = await self._abatch_answers(messages, embeddings)
+        pending = [item for item in items if item.cached is None]
+        questions = [item.message for item in pending]
+        if not questions:
+            return items
+        
+        async def graph_branch() -> Tuple[List[List[str]], List[List[dict]]]:
+            with STAGE_SECONDS.time(stage="entity_extraction"):
+                names, unknown = await asyncio.to_thread(self._batch_known_entities, questions)
+                if unknown:
+                    extracted = await self._abatch_admitted(
+                        self.entity_chain, [{"question": questions[i]} for i in unknown]
+                    )
+                    await asyncio.to_thread(self._remember_entities, questions, names, unknown, extracted)
             
-            # Test Azure OpenAI connection
-            azure_status = bool(
-                settings.azure_openai_endpoint and 
-                settings.azure_openai_api_key and 
-                settings.azure_openai_chat_deployment
+            queries, per_question = self._batch_neighborhood_queries(names)
+            if not queries:
+                return names, [[] for _ in questions]
+            try:
+                by_query = await self._afetch_neighborhoods(queries, "batch_neighborhood")
+                return names, [self._rank_neighborhoods(question_queries, by_query) for question_queries in per_question]
+            except Exception as e:
+                logger.error(f"Error in batch graph retrieval: {e}")
+                return names, [[] for _ in questions]
+        
+        async def vector_branch() -> List[Any]:
+            with STAGE_SECONDS.time(stage="vector_search"):
+                return await self.vector_retriever.abatch(questions, config=self._batch_config(), return_exceptions=True)
+        
+        (names, graph_rows), documents = await asyncio.gather(graph_branch(), vector_branch())
+        for item, entities, rows, docs in zip(pending, names, graph_rows, documents):
+            if isinstance(docs, Exception):
+                logger.warning(f"Vector retrieval unavailable: {docs!r}")
+                docs = []
+            item.context = self._build_context((entities, rows), docs)
+        return items
+    
+    def chat_batch(self, messages: List[str]) -> List[ChatResult]:
+        """Answer many questions, sharing embedding, extraction and graph calls
+
+        Answers are generated with at most BATCH_MAX_CONCURRENCY completions
+        in flight and returned in the order of the questions.
+        """
+        try:
+            items = self._prepare_batch(messages)
+        except Exception as e:
+            CHAT_ERRORS.inc(amount=len(messages), method="chat_batch")
+            logger.error(f"Error in batch chat: {e}")
+            return [ChatResult(answer="I'm sorry, I encountered an error while processing your request.")
+                    for _ in messages]
+        
+        pending = [item for item in items if item.cached is None]
+        with STAGE_SECONDS.time(stage="llm_completion"):
+            responses = self.answer_chain.batch(
+                [{"context": item.context.text, "question": item.message} for item in pending],
+                config=self._batch_config(),
+                return_exceptions=True
             )
-            
-            return {
-                "status": "healthy" if neo4j_status and azure_status else "unhealthy",
-                "neo4j_connected": neo4j_status,
-                "azure_openai_configured": azure_status
-            }
+        for item, response in zip(pending, responses):
+            item.answer = response
+        return [self._batch_result(item) for item in items]
+    
+    def _batch_result(self, item: _BatchItem, store: bool = True) -> ChatResult:
+        """Turn a prepared and answered batch item into its result"""
+        if item.cached is not None:
+            return ChatResult(answer=item.cached.answer, sources=item.cached.sources, cached=True)
+        if isinstance(item.answer, Exception) or item.answer is None:
+            CHAT_ERRORS.inc(method="chat_batch")
+            logger.error(f"Error in batch chat: {item.answer}")
+            return ChatResult(answer="I'm sorry, I encountered an error while processing your request.")
+        if store:
+            self._store_answer(item.key, item.embedding, item.answer, item.context.sources)
+        return ChatResult(answer=item.answer, sources=item.context.sources)
+    
+    async def _abatch_result(self, item: _BatchItem) -> ChatResult:
+        """Async variant of _batch_result"""
+        result = self._batch_result(item, store=False)
+        if item.cached is None and result.answer is item.answer:
+            await self._astore_answer(item.key, item.embedding, item.answer, item.context.sources)
+        return result
+    
+    async def aiter_chat_batch(self, messages: List[str]) -> AsyncIterator[Tuple[int, ChatResult]]:
+        """Answer many questions, yielding (index, result) pairs as they finish
+
+        Retrieval for the whole batch is shared as in chat_batch; at most
+        BATCH_MAX_CONCURRENCY completions run at a time.
+        """
+        try:
+            items = await self._aprepare_batch(messages)
         except Exception as e:
-            logger.error(f"Health check error: {e}")
-            return {
-                "status": "unhealthy",
-                "neo4j_connected": False,
-                "azure_openai_configured": False
-            }
+            CHAT_ERRORS.inc(amount=len(messages), method="chat_batch")
+            logger.error(f"Error in batch chat: {e}")
+            for index in range(len(messages)):
+                yield index, ChatResult(answer="I'm sorry, I encountered an error while processing your request.")
+            return
+        
+        semaphore = asyncio.Semaphore(settings.batch_max_concurrency)
+        
+        async def answer(index: int) -> Tuple[int, ChatResult]:
+            item = items[index]
+            if item.cached is None:
+                async with semaphore:
+                    try:
+                        async with self._llm_slot():
+                            with STAGE_SECONDS.time(stage="llm_completion"):
+                                item.answer = await self.answer_chain.ainvoke(
+                                    {"context": item.context.text, "question": item.message},
+                                    config=llm_run_config()
+                                )
+                    except Exception as e:
+                        item.answer = e
+            return index, await self._abatch_result(item)
+        
+        tasks = [asyncio.ensure_future(answer(index)) for index in range(len(items))]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def achat_batch(self, messages: List[str]) -> List[ChatResult]:
+        """Async variant of chat_batch"""
+        results: List[Optional[ChatResult]] = [None] * len(messages)
+        async for index, result in self.aiter_chat_batch(messages):
+            results[index] = result
+        return results
+    
+    def _cached_health(self) -> Optional[dict]:
+        """The last health result while it is younger than HEALTH_CHECK_TTL"""
+        if self._health is not None and time.monotonic() - self._health_checked_at < settings.health_check_ttl:
+            return dict(self._health)
+        return None
+    
+    def _remember_health(self, neo4j_status: bool) -> dict:
+        """Build and cache the health result"""
+        azure_status = bool(
+            settings.azure_openai_endpoint and 
+            settings.azure_openai_api_key and 
+            settings.azure_openai_chat_deployment
+        )
+        self._health = {
+            "status": "healthy" if neo4j_status and azure_status else "unhealthy",
+            "neo4j_connected": neo4j_status,
+            "azure_openai_configured": azure_status
+        }
+        self._health_checked_at = time.monotonic()
+        return dict(self._health)
+    
+    def health_check(self) -> dict:
+        """Check the health of the service
+
+        Results are cached for HEALTH_CHECK_TTL seconds so frequent probes do
+        not each send a query to Neo4j. The probe query runs outside a managed
+        transaction so it fails fast instead of being retried.
+        """
+        cached = self._cached_health()
+        if cached is not None:
+            return cached
+        
+        neo4j_status = False
+        try:
+            with track_query("health"):
+                self.graph.query("RETURN 1")
+            neo4j_status = True
+        except Exception:
+            pass
+        return self._remember_health(neo4j_status)
+    
+    async def ahealth_check(self) -> dict:
+        """Async health check that does not block the event loop, see health_check"""
+        cached = self._cached_health()
+        if cached is not None:
+            return cached
+        
+        neo4j_status = False
+        try:
+            with track_query("health"):
+                await self.async_graph.query("RETURN 1")
+            neo4j_status = True
+        except Exception:
+            pass
+        return self._remember_health(neo4j_status)
+    
+    def readiness(self) -> dict:
+        """Readiness state and the duration of each startup phase in seconds"""
+        return {
+            "ready": self.ready,
+            "phases": dict(self.startup_phases),
+            "error": self.startup_error
+        }
+    
+    async def aclose(self):
+        """Release the async Neo4j driver and the cache backend"""
+        if self.async_graph is not None:
+            await self.async_graph.close()
+        self._executor.shutdown(wait=False)
+        self._rebuild_executor.shutdown(wait=False, cancel_futures=True)
+        await self.memo.aclose()
@@ -0,0 +1,395 @@
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import asyncio
+import json
+import logging
+import os
+import re
+import shutil
+import time
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+
+SNAPSHOT_QUERY = """MATCH (d:Document)
+WHERE d.embedding IS NOT NULL AND d.id > $after
+RETURN d.id AS id, d.text AS text, d.embedding AS embedding, d.source AS source, d.sources AS sources
+ORDER BY d.id
+LIMIT $limit
+"""
+
+# BM25 parameters of the keyword index
+_K1 = 1.2
+_B = 0.75
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+def _files(path: str) -> Dict[str, Path]:
+    base = Path(path)
+    return {
+        "meta": base.with_name(base.name + ".meta.json"),
+        "vectors": base.with_name(base.name + ".vectors.f32"),
+        "texts": base.with_name(base.name + ".texts.bin"),
+        "offsets": base.with_name(base.name + ".offsets.i64"),
+        "ivf": base.with_name(base.name + ".ivf.npz"),
+        "terms": base.with_name(base.name + ".terms.bin"),
+        "term_offsets": base.with_name(base.name + ".term_offsets.i64"),
+        "postings": base.with_name(base.name + ".postings.i32"),
+        "weights": base.with_name(base.name + ".weights.f32"),
+        "posting_offsets": base.with_name(base.name + ".posting_offsets.i64"),
+        "sources": base.with_name(base.name + ".sources.i32"),
+        "source_offsets": base.with_name(base.name + ".source_offsets.i64"),
+    }
+
+def _pointer(path: str) -> Path:
+    """File naming the current snapshot version"""
+    base = Path(path)
+    return base.with_name(base.name + ".current")
+
+def _version_dir(path: str, version: str) -> Path:
+    base = Path(path)
+    return base.with_name(f"{base.name}.{version}")
+
+def _snapshot_files(path: str) -> Tuple[Optional[str], Dict[str, Path]]:
+    """Version and files of the current snapshot
+
+    Snapshots written before versioning have no pointer file and keep their
+    files next to the path; their version is None.
+    """
+    pointer = _pointer(path)
+    if not pointer.exists():
+        return None, _files(path)
+    version = pointer.read_text(encoding="utf-8").strip()
+    return version, _files(str(_version_dir(path, version) / Path(path).name))
+
+def _map(path: Path, dtype: Any) -> np.ndarray:
+    """Memory-map a flat array file; empty files cannot be mapped"""
+    if not path.stat().st_size:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+class _Strings(Sequence):
+    """Read-only sequence of the strings packed in a byte array"""
+    
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+    
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+    
+    def __getitem__(self, i: int) -> str:
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+def _write_strings(strings: Iterable[str], data_path: Path, offsets_path: Path):
+    offsets = [0]
+    with open(data_path, "wb") as f:
+        for string in strings:
+            encoded = string.encode("utf-8")
+            f.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+    np.asarray(offsets, dtype=np.int64).tofile(offsets_path)
+
+class _KeywordCounts:
+    """Term frequencies per document, collected while texts stream past"""
+    
+    def __init__(self):
+        self.vocabulary: Dict[str, int] = {}
+        # Flat integer arrays, far smaller than lists of Python ints
+        self.terms = array("i")
+        self.docs = array("i")
+        self.counts = array("i")
+        self.lengths = array("i")
+    
+    def add(self, text: str):
+        tokens = _tokenize(text)
+        doc = len(self.lengths)
+        self.lengths.append(len(tokens))
+        for token, count in Counter(tokens).items():
+            self.terms.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+            self.docs.append(doc)
+            self.counts.append(count)
+    
+    def postings(self) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """Sorted terms and their BM25 postings as offsets, documents and weights"""
+        terms = sorted(self.vocabulary)
+        rank = np.empty(len(terms), dtype=np.int64)
+        rank[[self.vocabulary[term] for term in terms]] = np.arange(len(terms))
+        term_ranks = rank[np.asarray(self.terms, dtype=np.int64)]
+        docs = np.asarray(self.docs, dtype=np.int32)
+        order = np.lexsort((docs, term_ranks))
+        term_ranks, docs = term_ranks[order], docs[order]
+        tf = np.asarray(self.counts, dtype=np.float32)[order]
+        
+        frequencies = np.bincount(term_ranks, minlength=len(terms))
+        offsets = np.concatenate([[0], np.cumsum(frequencies)]).astype(np.int64)
+        idf = np.log(1 + (len(self.lengths) - frequencies + 0.5) / (frequencies + 0.5)).astype(np.float32)
+        lengths = np.asarray(self.lengths, dtype=np.float32)
+        average = float(lengths.mean()) if len(lengths) else 0.0
+        norm = tf + _K1 * (1 - _B + _B * lengths[docs] / (average or 1.0))
+        weights = (idf[term_ranks] * tf * (_K1 + 1) / norm).astype(np.float32)
+        return terms, offsets, docs, weights
+
+def _row_sources(row: Dict[str, Any]) -> List[str]:
+    """Sources registered on a chunk by ingestion, or the source it was loaded from"""
+    sources = row.get("sources") or ([row["source"]] if row.get("source") else [])
+    return [str(source) for source in sources]
+
+def _kmeans(vectors: np.ndarray, lists: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means centroids for the IVF index"""
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), size=min(len(vectors), lists * 64), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for i in range(lists):
+            members = sample[assignment == i]
+            if len(members):
+                centroid = members.sum(axis=0)
+                centroids[i] = centroid / (np.linalg.norm(centroid) or 1.0)
+    return centroids
+
+class LocalVectorIndex:
+    """In-process hybrid index over a memory-mapped snapshot of Document embeddings
+
+    The snapshot stores L2-normalized float32 vectors in one flat file and the
+    chunk texts in another, both memory-mapped, so only the pages touched by
+    a search are loaded. Vector search is exact (one matrix-vector product)
+    unless an IVF index was built, in which case only the ``nprobe`` closest
+    lists are scanned. A BM25 keyword index over the texts is fused with the
+    vector scores the same way Neo4jVector's hybrid search does: each score
+    list is normalized by its maximum and the best score per chunk is kept.
+
+    The BM25 postings are part of the snapshot too: a sorted term list, and
+    per term a slice of document numbers and precomputed weights, all
+    memory-mapped, so loading does no per-document work. Snapshots written
+    before the postings were exported get them computed in memory instead.
+    """
+    
+    def __init__(self, path: str, nprobe: int = 8):
+        self.version, files = _snapshot_files(path)
+        with open(files["meta"], encoding="utf-8") as f:
+            meta = json.load(f)
+        self.path = path
+        self.ids: List[str] = meta["ids"]
+        self.dimension: int = meta["dimension"]
+        self.nprobe = nprobe
+        
+        count = len(self.ids)
+        self.vectors = np.memmap(files["vectors"], dtype=np.float32, mode="r", shape=(count, self.dimension)) \
+            if count else np.zeros((0, self.dimension), dtype=np.float32)
+        self.offsets = np.fromfile(files["offsets"], dtype=np.int64)
+        self._texts = np.memmap(files["texts"], dtype=np.uint8, mode="r") \
+            if self.offsets[-1] else np.zeros(0, dtype=np.uint8)
+        
+        self.centroids = None
+        self.assignment = None
+        if files["ivf"].exists():
+            ivf = np.load(files["ivf"])
+            self.centroids = ivf["centroids"]
+            self.assignment = ivf["assignment"]
+        
+        self.source_names: List[str] = meta.get("sources", [])
+        if files["source_offsets"].exists():
+            self.source_offsets = np.fromfile(files["source_offsets"], dtype=np.int64)
+            self.source_ids = _map(files["sources"], np.int32)
+        else:
+            self.source_offsets = np.zeros(count + 1, dtype=np.int64)
+            self.source_ids = np.zeros(0, dtype=np.int32)
+        
+        if files["posting_offsets"].exists():
+            self.terms: Sequence[str] = _Strings(
+                _map(files["terms"], np.uint8), np.fromfile(files["term_offsets"], dtype=np.int64)
+            )
+            self.posting_offsets = _map(files["posting_offsets"], np.int64)
+            self.postings = _map(files["postings"], np.int32)
+            self.weights = _map(files["weights"], np.float32)
+        else:
+            counts = _KeywordCounts()
+            for i in range(count):
+                counts.add(self.text(i))
+            self.terms, self.posting_offsets, self.postings, self.weights = counts.postings()
+        logger.info(f"Loaded local vector index with {count} documents from {path}")
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def is_current(self) -> bool:
+        """Whether this is still the latest snapshot at the path
+
+        Unversioned snapshots cannot tell and always count as outdated.
+        """
+        return self.version is not None and _snapshot_files(self.path)[0] == self.version
+    
+    def text(self, i: int) -> str:
+        return bytes(self._texts[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+    
+    def sources(self, i: int) -> List[str]:
+        return [self.source_names[j] for j in self.source_ids[self.source_offsets[i]:self.source_offsets[i + 1]]]
+    
+    def _term(self, token: str) -> Optional[int]:
+        """Number of the term in the sorted term list"""
+        i = bisect_left(self.terms, token)
+        return i if i < len(self.terms) and self.terms[i] == token else None
+    
+    def _vector_scores(self, embedding: List[float], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        
+        if self.centroids is not None:
+            probes = np.argsort(self.centroids @ query)[::-1][:self.nprobe]
+            candidates = np.flatnonzero(np.isin(self.assignment, probes))
+            scores = self.vectors[candidates] @ query
+        else:
+            candidates = None
+            scores = self.vectors @ query
+        
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        docs = top if candidates is None else candidates[top]
+        # Same [0, 1] similarity as Neo4j's cosine vector index
+        return docs, (scores[top] + 1) / 2
+    
+    def _keyword_scores(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for token in set(_tokenize(query)):
+            term = self._term(token)
+            if term is not None:
+                start, end = self.posting_offsets[term], self.posting_offsets[term + 1]
+                scores[self.postings[start:end]] += self.weights[start:end]
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        return hits, scores[hits]
+    
+    def search(self, embedding: List[float], query: str, k: int = 4) -> List[Tuple[int, float]]:
+        """Hybrid search returning (document index, score) pairs, best first"""
+        if not len(self.ids):
+            return []
+        fused: Dict[int, float] = {}
+        for docs, scores in (self._vector_scores(embedding, k), self._keyword_scores(query, k)):
+            if not len(docs):
+                continue
+            top = float(scores.max()) or 1.0
+            for doc, score in zip(docs.tolist(), (scores / top).tolist()):
+                fused[doc] = max(fused.get(doc, 0.0), score)
+        return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+    
+    def documents(self, embedding: List[float], query: str, k: int = 4) -> List[Document]:
+        """Hybrid search returning LangChain documents with their scores"""
+        documents = []
+        for i, score in self.search(embedding, query, k):
+            # The same source metadata the Neo4j retrieval query returns
+            metadata = {"id": self.ids[i], "score": score}
+            sources = self.sources(i)
+            if sources:
+                metadata["source"] = sources[0]
+                metadata["sources"] = sources
+            documents.append(Document(page_content=self.text(i), metadata=metadata))
+        return documents
+    
+    @classmethod
+    def build(cls, graph: Any, path: str, ivf_lists: int = 0, batch_size: int = 1000) -> int:
+        """Export Document embeddings and texts from Neo4j into a new snapshot
+
+        Every snapshot is written into a new version directory next to the
+        path, and a pointer file naming the version is then replaced in one
+        rename, so loading never mixes files of two snapshots. The previous
+        version is kept for services that are still opening it; older ones
+        are deleted. Term counts are collected as flat lists while the texts
+        stream past and turned into the BM25 postings at the end.
+        """
+        previous = _snapshot_files(path)[0]
+        version = f"v{time.time_ns()}"
+        directory = _version_dir(path, version)
+        directory.mkdir(parents=True)
+        files = _files(str(directory / Path(path).name))
+        
+        ids: List[str] = []
+        offsets = [0]
+        keyword = _KeywordCounts()
+        source_numbers: Dict[str, int] = {}
+        source_ids: List[int] = []
+        source_offsets = [0]
+        dimension = None
+        after = ""
+        with open(files["vectors"], "wb") as vectors, open(files["texts"], "wb") as texts:
+            while True:
+                rows = graph.query(SNAPSHOT_QUERY, {"after": after, "limit": batch_size})
+                if not rows:
+                    break
+                after = rows[-1]["id"]
+                batch = np.asarray([row["embedding"] for row in rows], dtype=np.float32)
+                batch /= np.maximum(np.linalg.norm(batch, axis=1, keepdims=True), 1e-12)
+                dimension = batch.shape[1]
+                vectors.write(batch.tobytes())
+                for row in rows:
+                    text = row["text"] or ""
+                    encoded = text.encode("utf-8")
+                    texts.write(encoded)
+                    offsets.append(offsets[-1] + len(encoded))
+                    ids.append(row["id"])
+                    keyword.add(text)
+                    for source in _row_sources(row):
+                        source_ids.append(source_numbers.setdefault(source, len(source_numbers)))
+                    source_offsets.append(len(source_ids))
+        np.asarray(offsets, dtype=np.int64).tofile(files["offsets"])
+        np.asarray(source_ids, dtype=np.int32).tofile(files["sources"])
+        np.asarray(source_offsets, dtype=np.int64).tofile(files["source_offsets"])
+        
+        terms, posting_offsets, postings, weights = keyword.postings()
+        del keyword
+        _write_strings(terms, files["terms"], files["term_offsets"])
+        posting_offsets.tofile(files["posting_offsets"])
+        postings.tofile(files["postings"])
+        weights.tofile(files["weights"])
+        
+        if ivf_lists and len(ids) > ivf_lists:
+            matrix = np.memmap(files["vectors"], dtype=np.float32, mode="r", shape=(len(ids), dimension))
+            centroids = _kmeans(np.asarray(matrix), ivf_lists)
+            assignment = np.concatenate([
+                np.argmax(matrix[start:start + batch_size] @ centroids.T, axis=1)
+                for start in range(0, len(ids), batch_size)
+            ]).astype(np.int32)
+            del matrix
+            with open(files["ivf"], "wb") as f:
+                np.savez(f, centroids=centroids, assignment=assignment)
+        
+        with open(files["meta"], "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "dimension": dimension or 0, "sources": list(source_numbers)}, f)
+        
+        pointer = _pointer(path)
+        pending = pointer.with_name(pointer.name + ".tmp")
+        pending.write_text(version, encoding="utf-8")
+        os.replace(pending, pointer)
+        
+        base = Path(path)
+        for old in base.parent.glob(f"{base.name}.v*"):
+            if old.is_dir() and old.name not in (directory.name, f"{base.name}.{previous}"):
+                shutil.rmtree(old, ignore_errors=True)
+        return len(ids)
+
+class LocalVectorRetriever(BaseRetriever):
+    """Retriever over a LocalVectorIndex, a drop-in for the Neo4jVector retriever"""
+    
+    index: Any
+    embeddings: Any
+    k: int = 4
+    
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.index.documents(self.embeddings.embed_query(query), query, self.k)
+    
+    async def _aget_relevant_documents(self, query: str, *, run_manager: Any) -> List[Document]:
+        embedding = await self.embeddings.aembed_query(query)
+        return await asyncio.to_thread(self.index.documents, embedding, query, self.k)
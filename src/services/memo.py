@@ -0,0 +1,192 @@
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import threading
+import logging
+
+from langchain_core.embeddings import Embeddings
+
+from .admission import Limiter
+from .cache_backend import CacheBackend, decode_vector, encode_vector
+from .metrics import record_cache
+from .text_utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+class MemoStore:
+    """Memo of deterministic model outputs in a cache backend
+
+    The backend bounds the memo; with a SQLite file it survives process
+    restarts, and with a shared backend all workers use the same entries.
+    The reported size counts the entries this worker memoized, so stats
+    never scan the backend.
+    """
+    
+    PREFIX = "memo:"
+    
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(namespace: str, model: str, text: str) -> str:
+        """Key a memo entry by namespace, model deployment and normalized text"""
+        raw = f"{namespace}\x00{model}\x00{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def _count(self, values: List[Optional[bytes]]):
+        with self._lock:
+            for value in values:
+                if value is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+        for value in values:
+            record_cache("memo", value is not None)
+    
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the memoized value, or None on a miss"""
+        return self.get_many([key])[0]
+    
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Memoized values of several keys in one backend round-trip"""
+        values = self.backend.get_many([self.PREFIX + key for key in keys])
+        self._count(values)
+        return values
+    
+    async def aget(self, key: str) -> Optional[bytes]:
+        """Async variant of get"""
+        return (await self.aget_many([key]))[0]
+    
+    async def aget_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Async variant of get_many"""
+        values = await self.backend.aget_many([self.PREFIX + key for key in keys])
+        self._count(values)
+        return values
+    
+    def set(self, key: str, value: bytes):
+        """Memoize a value"""
+        self.set_many({key: value})
+    
+    def set_many(self, items: Dict[str, bytes]):
+        """Memoize several values in one backend round-trip"""
+        if items:
+            self.backend.set_many({self.PREFIX + key: value for key, value in items.items()})
+            self._stored(len(items))
+    
+    async def aset(self, key: str, value: bytes):
+        """Async variant of set"""
+        await self.aset_many({key: value})
+    
+    async def aset_many(self, items: Dict[str, bytes]):
+        """Async variant of set_many"""
+        if items:
+            await self.backend.aset_many({self.PREFIX + key: value for key, value in items.items()})
+            self._stored(len(items))
+    
+    def _stored(self, count: int):
+        with self._lock:
+            self.stored += count
+    
+    def stats(self) -> dict:
+        """Hit/miss counters of the memo"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": self.stored,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+    
+    def close(self):
+        """Close the backend"""
+        self.backend.close()
+    
+    async def aclose(self):
+        """Async variant of close"""
+        await self.backend.aclose()
+
+class MemoizedEmbeddings(Embeddings):
+    """Embeddings wrapper that memoizes query embeddings in a MemoStore
+
+    Document embeddings are passed through untouched so ingestion does not
+    evict the query entries. With a limiter, async calls that reach the
+    wrapped embeddings hold one of its slots.
+    """
+    
+    def __init__(self, embeddings: Embeddings, memo: MemoStore, model: str, limiter: Optional[Limiter] = None):
+        self.embeddings = embeddings
+        self.memo = memo
+        self.model = model
+        self.limiter = limiter
+    
+    def _slot(self):
+        return self.limiter.slot() if self.limiter is not None else nullcontext()
+    
+    @staticmethod
+    def _encode(vector: List[float]) -> bytes:
+        return encode_vector(vector)
+    
+    @staticmethod
+    def _decode(value: bytes) -> List[float]:
+        return decode_vector(value).tolist()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        async with self._slot():
+            return await self.embeddings.aembed_documents(texts)
+    
+    def embed_query(self, text: str) -> List[float]:
+        key = MemoStore.make_key("embedding", self.model, text)
+        value = self.memo.get(key)
+        if value is not None:
+            return self._decode(value)
+        vector = self.embeddings.embed_query(text)
+        self.memo.set(key, self._encode(vector))
+        return vector
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        key = MemoStore.make_key("embedding", self.model, text)
+        value = await self.memo.aget(key)
+        if value is not None:
+            return self._decode(value)
+        async with self._slot():
+            vector = await self.embeddings.aembed_query(text)
+        await self.memo.aset(key, self._encode(vector))
+        return vector
+    
+    def _keys(self, texts: List[str]) -> List[str]:
+        return [MemoStore.make_key("embedding", self.model, text) for text in texts]
+    
+    def _missing(self, values: List[Optional[bytes]]) -> Tuple[List[Optional[List[float]]], List[int]]:
+        vectors = [self._decode(value) if value is not None else None for value in values]
+        return vectors, [i for i, vector in enumerate(vectors) if vector is None]
+    
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries, sending the memo misses in one batch"""
+        keys = self._keys(texts)
+        vectors, missing = self._missing(self.memo.get_many(keys))
+        if missing:
+            embedded = self.embeddings.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+            self.memo.set_many({keys[i]: self._encode(vectors[i]) for i in missing})
+        return vectors
+    
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Async variant of embed_queries"""
+        keys = self._keys(texts)
+        vectors, missing = self._missing(await self.memo.aget_many(keys))
+        if missing:
+            async with self._slot():
+                embedded = await self.embeddings.aembed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+            await self.memo.aset_many({keys[i]: self._encode(vectors[i]) for i in missing})
+        return vectors
@@ -0,0 +1,281 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import bisect
+import logging
+import math
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Trace id of the request being handled, set by the HTTP middleware
+trace_id_var: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+
+class TraceIdFilter(logging.Filter):
+    """Adds the trace id of the current request to log records as ``trace_id``"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get() or "-"
+        return True
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Metric(ABC):
+    """Base class of the metrics rendered in the Prometheus text format"""
+    
+    kind = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+    
+    def _label_text(self, values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labels, values))
+        if extra is not None:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+    
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Sample lines of the metric in the text format"""
+    
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+    
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+    
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{self._label_text(key)} {_format_value(value)}"
+                    for key, value in sorted(self._values.items())]
+
+class Gauge(Counter):
+    """Value that can go up and down, e.g. requests in flight"""
+    
+    kind = "gauge"
+    
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+    
+    def set(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    @contextmanager
+    def track_inprogress(self, **labels: str) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets"""
+    
+    kind = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+    
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+    
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the block in seconds, even if it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+    
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            return sum(self._counts.get(self._key(labels), []))
+    
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key in sorted(self._counts):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (math.inf,), self._counts[key]):
+                    cumulative += count
+                    label_text = self._label_text(key, ("le", _format_value(bound)))
+                    lines.append(f"{self.name}_bucket{label_text} {cumulative}")
+                lines.append(f"{self.name}_sum{self._label_text(key)} {_format_value(self._sums[key])}")
+                lines.append(f"{self.name}_count{self._label_text(key)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Collection of metrics exposed together on /metrics"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+    
+    def register(self, metric: Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS: Histogram = REGISTRY.register(Histogram(
+    "graphrag_stage_duration_seconds",
+    "Duration of the stages of answering a question",
+    labels=("stage",)
+))
+REQUEST_SECONDS: Histogram = REGISTRY.register(Histogram(
+    "graphrag_request_duration_seconds",
+    "Duration of chat API requests, until the last byte for streams",
+    labels=("endpoint",)
+))
+REQUESTS_IN_FLIGHT: Gauge = REGISTRY.register(Gauge(
+    "graphrag_requests_in_flight",
+    "Chat API requests currently being handled",
+    labels=("endpoint",)
+))
+WEBSOCKET_CONNECTIONS: Gauge = REGISTRY.register(Gauge(
+    "graphrag_websocket_connections",
+    "Open chat WebSocket connections"
+))
+WEBSOCKET_FRAMES: Counter = REGISTRY.register(Counter(
+    "graphrag_websocket_frames_total",
+    "Frames sent on chat WebSockets by type",
+    labels=("type",)
+))
+CONTEXT_TOKENS: Histogram = REGISTRY.register(Histogram(
+    "graphrag_context_tokens",
+    "Tokens of retrieved data packed into the prompt context",
+    buckets=(128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+))
+COALESCED_REQUESTS: Counter = REGISTRY.register(Counter(
+    "graphrag_coalesced_requests_total",
+    "Requests that joined an identical in-flight request",
+    labels=("method",)
+))
+CHAT_ERRORS: Counter = REGISTRY.register(Counter(
+    "graphrag_chat_errors_total",
+    "Questions that could not be answered",
+    labels=("method",)
+))
+LLM_TOKENS: Counter = REGISTRY.register(Counter(
+    "graphrag_llm_tokens_total",
+    "Tokens reported by the chat model",
+    labels=("type",)
+))
+CACHE_REQUESTS: Counter = REGISTRY.register(Counter(
+    "graphrag_cache_requests_total",
+    "Cache lookups by cache and result",
+    labels=("cache", "result")
+))
+NEO4J_QUERIES: Counter = REGISTRY.register(Counter(
+    "graphrag_neo4j_queries_total",
+    "Cypher queries sent by the service",
+    labels=("query", "status")
+))
+ADMISSION_WAIT_SECONDS: Histogram = REGISTRY.register(Histogram(
+    "graphrag_admission_wait_seconds",
+    "Time calls queued for an LLM or embedding slot",
+    labels=("limiter", "priority")
+))
+ADMISSION_QUEUE_DEPTH: Gauge = REGISTRY.register(Gauge(
+    "graphrag_admission_queue_depth",
+    "Calls waiting for an LLM or embedding slot",
+    labels=("limiter",)
+))
+ADMISSION_IN_USE: Gauge = REGISTRY.register(Gauge(
+    "graphrag_admission_slots_in_use",
+    "LLM and embedding slots currently held",
+    labels=("limiter",)
+))
+ADMISSION_REJECTED: Counter = REGISTRY.register(Counter(
+    "graphrag_admission_rejected_total",
+    "Calls shed because the queue was full or the deadline passed",
+    labels=("limiter", "reason")
+))
+
+def record_cache(cache: str, hit: bool):
+    """Count a cache lookup"""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+@contextmanager
+def track_query(query: str) -> Iterator[None]:
+    """Count a Cypher query and whether it succeeded"""
+    try:
+        yield
+    except BaseException:
+        NEO4J_QUERIES.inc(query=query, status="error")
+        raise
+    NEO4J_QUERIES.inc(query=query, status="ok")
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """Callback handler that counts the tokens reported by chat model runs
+
+    Streaming runs only report usage when the model is created with
+    ``stream_usage=True``.
+    """
+    
+    def on_llm_end(self, response: LLMResult, **kwargs: Any):
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    LLM_TOKENS.inc(usage.get("input_tokens", 0), type="prompt")
+                    LLM_TOKENS.inc(usage.get("output_tokens", 0), type="completion")
+
+TOKEN_USAGE = TokenUsageHandler()
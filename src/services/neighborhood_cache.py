@@ -0,0 +1,206 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import json
+import re
+import threading
+import logging
+
+from .cache_backend import CacheBackend, hash_key
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+
+# Rough per-object overhead used to estimate the memory held by an entry
+_ROW_OVERHEAD = 120
+_ENTRY_OVERHEAD = 200
+
+def _tokens(text: str) -> Set[str]:
+    return set(_TOKEN.findall(text.lower()))
+
+@dataclass
+class _Entry:
+    rows: List[dict]
+    entities: Set[str]
+    tokens: Set[str]
+    size: int
+
+class NeighborhoodCache:
+    """LRU cache of formatted entity neighborhoods with a memory bound
+
+    Entries are keyed by the fulltext query of an entity name and hold the
+    triples found for it, together with the ids of the matched entities.
+    invalidate drops the entries that involve changed entities, or whose
+    query could now match a changed entity.
+
+    With a shared backend, local misses are looked up there and new entries
+    are written through, scoped to ``generation`` like the answer cache.
+    """
+    
+    def __init__(self, max_bytes: int, backend: Optional[CacheBackend] = None):
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self.generation = ""
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get_many(self, queries: Iterable[str]) -> Tuple[Dict[str, List[dict]], List[str]]:
+        """Cached rows per query, and the queries that missed"""
+        found, missing = self._get_local(queries)
+        if missing and self.backend is not None:
+            shared = self._get_shared(missing)
+            found.update(shared)
+            missing = [query for query in missing if query not in shared]
+        self._count(found, missing)
+        return found, missing
+    
+    async def aget_many(self, queries: Iterable[str]) -> Tuple[Dict[str, List[dict]], List[str]]:
+        """Async variant of get_many, the shared backend is read without blocking the loop"""
+        found, missing = self._get_local(queries)
+        if missing and self.backend is not None:
+            shared = await self._aget_shared(missing)
+            found.update(shared)
+            missing = [query for query in missing if query not in shared]
+        self._count(found, missing)
+        return found, missing
+    
+    def _get_local(self, queries: Iterable[str]) -> Tuple[Dict[str, List[dict]], List[str]]:
+        found: Dict[str, List[dict]] = {}
+        missing = []
+        with self._lock:
+            for query in queries:
+                entry = self._entries.get(query)
+                if entry is None:
+                    missing.append(query)
+                else:
+                    self._entries.move_to_end(query)
+                    found[query] = entry.rows
+        return found, missing
+    
+    def _count(self, found: Dict[str, List[dict]], missing: List[str]):
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(missing)
+    
+    def _shared_key(self, query: str) -> str:
+        return f"neighborhood:{self.generation}:{hash_key(query)}"
+    
+    def _get_shared(self, queries: List[str]) -> Dict[str, List[dict]]:
+        """Fetch the entries other workers stored and keep them locally"""
+        try:
+            values = self.backend.get_many([self._shared_key(query) for query in queries])
+        except Exception as e:
+            logger.warning(f"Shared neighborhood cache lookup failed: {e}")
+            return {}
+        return self._accept_shared(queries, values)
+    
+    async def _aget_shared(self, queries: List[str]) -> Dict[str, List[dict]]:
+        """Async variant of _get_shared"""
+        try:
+            values = await self.backend.aget_many([self._shared_key(query) for query in queries])
+        except Exception as e:
+            logger.warning(f"Shared neighborhood cache lookup failed: {e}")
+            return {}
+        return self._accept_shared(queries, values)
+    
+    def _accept_shared(self, queries: List[str], values: List[Optional[bytes]]) -> Dict[str, List[dict]]:
+        found = {}
+        for query, value in zip(queries, values):
+            if value is not None:
+                rows = json.loads(value)
+                self._put_local(query, rows)
+                found[query] = [{"output": row["output"], "score": row["score"]} for row in rows]
+        return found
+    
+    def missing(self, queries: Iterable[str]) -> List[str]:
+        """Queries that are not cached, without counting lookups"""
+        with self._lock:
+            return [query for query in queries if query not in self._entries]
+    
+    def put(self, query: str, rows: List[dict]):
+        """Cache the rows of a query, evicting the least recently used entries"""
+        self.put_many({query: rows})
+    
+    def put_many(self, items: Dict[str, List[dict]]):
+        """Cache the rows of several queries, writing them through to the shared backend"""
+        for query, rows in items.items():
+            self._put_local(query, rows)
+        if self.backend is not None and items:
+            try:
+                self.backend.set_many(self._shared_items(items))
+            except Exception as e:
+                logger.warning(f"Shared neighborhood cache store failed: {e}")
+    
+    async def aput_many(self, items: Dict[str, List[dict]]):
+        """Async variant of put_many"""
+        for query, rows in items.items():
+            self._put_local(query, rows)
+        if self.backend is not None and items:
+            try:
+                await self.backend.aset_many(self._shared_items(items))
+            except Exception as e:
+                logger.warning(f"Shared neighborhood cache store failed: {e}")
+    
+    def _shared_items(self, items: Dict[str, List[dict]]) -> Dict[str, bytes]:
+        return {
+            self._shared_key(query): json.dumps([
+                {"output": row["output"], "score": row["score"], "entity": row.get("entity")} for row in rows
+            ]).encode("utf-8")
+            for query, rows in items.items()
+        }
+    
+    def _put_local(self, query: str, rows: List[dict]):
+        entities = {row["entity"] for row in rows if row.get("entity") is not None}
+        rows = [{"output": row["output"], "score": row["score"]} for row in rows]
+        size = _ENTRY_OVERHEAD + 2 * len(query) + sum(_ROW_OVERHEAD + 2 * len(row["output"]) for row in rows)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(query)
+            self._entries[query] = _Entry(rows, entities, _tokens(query), size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+    
+    def _discard(self, query: str):
+        entry = self._entries.pop(query, None)
+        if entry is not None:
+            self.bytes -= entry.size
+    
+    def invalidate(self, entity_ids: Iterable[str]) -> int:
+        """Drop the entries affected by changes to the given entities"""
+        changed = set(entity_ids)
+        changed_tokens = set().union(*(_tokens(entity) for entity in changed)) if changed else set()
+        with self._lock:
+            stale = [
+                query for query, entry in self._entries.items()
+                if entry.entities & changed or entry.tokens & changed_tokens
+            ]
+            for query in stale:
+                self._discard(query)
+        return len(stale)
+    
+    def clear(self):
+        """Drop every local entry"""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+    
+    def stats(self) -> dict:
+        """Hit/miss counters and memory use of the cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "hit_rate": self.hits / total if total else 0.0,
+                "memory_bytes": self.bytes,
+            }
@@ -0,0 +1,117 @@
+from typing import Any, Callable, Dict, List, Optional
+import threading
+import logging
+
+from langchain_neo4j import Neo4jGraph
+from neo4j import AsyncDriver, AsyncGraphDatabase, Driver, GraphDatabase
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_driver: Optional[Driver] = None
+_async_driver: Optional[AsyncDriver] = None
+
+def driver_config() -> Dict[str, Any]:
+    """Connection pool and fetch settings shared by the sync and async drivers"""
+    return {
+        "max_connection_pool_size": settings.neo4j_max_pool_size,
+        "max_connection_lifetime": settings.neo4j_max_connection_lifetime,
+        "connection_acquisition_timeout": settings.neo4j_connection_acquisition_timeout,
+        "liveness_check_timeout": settings.neo4j_liveness_check_timeout,
+        "fetch_size": settings.neo4j_fetch_size,
+        "max_transaction_retry_time": settings.neo4j_max_transaction_retry_time,
+    }
+
+def _auth() -> Optional[tuple]:
+    # Like Neo4jGraph, empty credentials mean authentication is disabled
+    if settings.neo4j_username == "" and settings.neo4j_password == "":
+        return None
+    return (settings.neo4j_username, settings.neo4j_password)
+
+def get_driver() -> Driver:
+    """The process-wide sync Neo4j driver, created on first use"""
+    global _driver
+    with _lock:
+        if _driver is None:
+            _driver = GraphDatabase.driver(settings.neo4j_uri, auth=_auth(), **driver_config())
+        return _driver
+
+def get_async_driver() -> AsyncDriver:
+    """The process-wide async Neo4j driver, created on first use
+
+    Async drivers are bound to the event loop they are first used on.
+    """
+    global _async_driver
+    with _lock:
+        if _async_driver is None:
+            _async_driver = AsyncGraphDatabase.driver(settings.neo4j_uri, auth=_auth(), **driver_config())
+        return _async_driver
+
+def close_driver():
+    """Close the sync driver; the next get_driver call creates a new one"""
+    global _driver
+    with _lock:
+        driver, _driver = _driver, None
+    if driver is not None:
+        driver.close()
+
+async def aclose_async_driver():
+    """Close the async driver; the next get_async_driver call creates a new one"""
+    global _async_driver
+    with _lock:
+        driver, _async_driver = _async_driver, None
+    if driver is not None:
+        await driver.close()
+
+class PooledNeo4jGraph(Neo4jGraph):
+    """Neo4jGraph on the shared driver, with reads in read transactions
+
+    Closing the graph releases the reference but leaves the shared driver
+    open for the other components.
+    """
+    
+    def __init__(
+        self,
+        driver: Optional[Driver] = None,
+        database: Optional[str] = None,
+        timeout: Optional[float] = None,
+        refresh_schema: bool = False
+    ):
+        self._driver = driver or get_driver()
+        self._database = database or settings.neo4j_database
+        self.timeout = timeout
+        self.sanitize = False
+        self._enhanced_schema = False
+        self.schema = ""
+        self.structured_schema: Dict[str, Any] = {}
+        self._driver.verify_connectivity()
+        if refresh_schema:
+            self.refresh_schema()
+    
+    def read_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Run a read-only query in a managed read transaction
+
+        Read transactions are routed to cluster readers; with read routing
+        disabled they run as write transactions on the leader.
+        """
+        self._check_driver_state()
+        with self._driver.session(database=self._database) as session:
+            execute = session.execute_read if settings.neo4j_read_routing else session.execute_write
+            return execute(lambda tx: tx.run(query, params or {}).data())
+    
+    def write_transaction(self, work: Callable[[Any], Any]) -> Any:
+        """Run work(tx) in one managed write transaction and return its result
+
+        Either all of its statements commit or none do. The driver retries
+        the whole function on transient errors, so work must be repeatable.
+        """
+        self._check_driver_state()
+        with self._driver.session(database=self._database) as session:
+            return session.execute_write(work)
+    
+    def close(self):
+        """Drop the reference to the shared driver without closing it"""
+        if hasattr(self, "_driver"):
+            delattr(self, "_driver")
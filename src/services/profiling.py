@@ -0,0 +1,232 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import json
+import logging
+
+import numpy as np
+from langchain_community.vectorstores.neo4j_vector import remove_lucene_chars
+from neo4j import Driver
+
+from ..config import settings
+from .graph_rag import (
+    BATCH_NEIGHBORHOOD_QUERY,
+    GRAPH_VERSION_QUERY,
+    NEIGHBORHOOD_QUERY,
+    TOP_ENTITIES_QUERY,
+    VECTOR_RETRIEVAL_QUERY,
+)
+
+logger = logging.getLogger(__name__)
+
+# The hybrid search Neo4jVector runs for the vector retriever
+HYBRID_SEARCH_QUERY = """CALL {
+  CALL db.index.vector.queryNodes($index, $k, $embedding) YIELD node, score
+  WITH collect({node: node, score: score}) AS nodes, max(score) AS max
+  UNWIND nodes AS n
+  RETURN n.node AS node, (n.score / max) AS score
+  UNION
+  CALL db.index.fulltext.queryNodes($keyword_index, $query, {limit: $k}) YIELD node, score
+  WITH collect({node: node, score: score}) AS nodes, max(score) AS max
+  UNWIND nodes AS n
+  RETURN n.node AS node, (n.score / max) AS score
+}
+WITH node, max(score) AS score ORDER BY score DESC LIMIT $k
+""" + VECTOR_RETRIEVAL_QUERY
+
+RANDOM_ENTITIES_QUERY = """MATCH (e:__Entity__)
+WITH e, rand() AS r
+ORDER BY r
+LIMIT $limit
+RETURN e.id AS id
+"""
+
+# Profiled retrieval queries by name
+PROFILED_QUERIES = {
+    "neighborhood": NEIGHBORHOOD_QUERY,
+    "batch_neighborhood": BATCH_NEIGHBORHOOD_QUERY,
+    "top_entities": TOP_ENTITIES_QUERY,
+    "graph_version": GRAPH_VERSION_QUERY,
+    "vector_search": HYBRID_SEARCH_QUERY,
+}
+
+SAMPLE_EMBEDDINGS_QUERY = """MATCH (d:Document)
+WHERE d.embedding IS NOT NULL
+RETURN d.embedding AS embedding
+LIMIT $limit
+"""
+
+@dataclass
+class QueryProfile:
+    """PROFILE results of one retrieval query over the entity sample"""
+    name: str
+    db_hits: List[int] = field(default_factory=list)
+    rows: List[int] = field(default_factory=list)
+    page_cache_misses: List[int] = field(default_factory=list)
+    time_ms: List[float] = field(default_factory=list)
+    operators: Dict[str, int] = field(default_factory=dict)
+    plan: List[str] = field(default_factory=list)
+    
+    def add(self, profile: Dict[str, Any], time_ms: float):
+        """Record the plan profile of one run"""
+        operators = list(_operators(profile))
+        # Operator types carry the runtime, e.g. NodeIndexSeek@neo4j
+        names = [operator.get("operatorType", "").split("@")[0] for operator in operators]
+        for name, operator in zip(names, operators):
+            self.operators[name] = self.operators.get(name, 0) + operator.get("dbHits", 0)
+        self.db_hits.append(sum(operator.get("dbHits", 0) for operator in operators))
+        self.page_cache_misses.append(sum(operator.get("pageCacheMisses", 0) for operator in operators))
+        self.rows.append(profile.get("rows", 0))
+        self.time_ms.append(time_ms)
+        if not self.plan:
+            self.plan = names
+    
+    def summary(self) -> dict:
+        """Averages per run, comparable across samples of the same size"""
+        return {
+            "runs": len(self.db_hits),
+            "db_hits": float(np.mean(self.db_hits)) if self.db_hits else 0.0,
+            "rows": float(np.mean(self.rows)) if self.rows else 0.0,
+            "page_cache_misses": float(np.mean(self.page_cache_misses)) if self.page_cache_misses else 0.0,
+            "time_ms_p50": float(np.percentile(self.time_ms, 50)) if self.time_ms else 0.0,
+            "time_ms_p95": float(np.percentile(self.time_ms, 95)) if self.time_ms else 0.0,
+            "top_operators": dict(sorted(self.operators.items(), key=lambda item: -item[1])[:5]),
+            "plan": self.plan,
+        }
+
+@dataclass
+class Finding:
+    """Difference between a profile and its baseline"""
+    query: str
+    metric: str
+    baseline: Any
+    current: Any
+    regression: bool
+
+def _operators(profile: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Operators of a plan profile, depth first"""
+    yield profile
+    for child in profile.get("children", []):
+        yield from _operators(child)
+
+class QueryProfiler:
+    """Runs PROFILE on the retrieval queries for a sample of entities
+
+    The sample mixes the highest-degree entities, which are the expensive
+    neighborhoods, with random ones. Reusing the sample of a baseline keeps
+    runs comparable.
+    """
+    
+    def __init__(self, driver: Driver, database: Optional[str] = None):
+        self.driver = driver
+        self.database = database or settings.neo4j_database
+    
+    def _read(self, work: Callable[[Any], Any]) -> Any:
+        with self.driver.session(database=self.database) as session:
+            return session.execute_read(work)
+    
+    def _data(self, query: str, params: Optional[dict] = None) -> List[dict]:
+        return self._read(lambda tx: tx.run(query, params or {}).data())
+    
+    def sample_entities(self, size: int) -> List[str]:
+        """Half the sample from the highest-degree entities, the rest at random"""
+        top = [row["id"] for row in self._data(TOP_ENTITIES_QUERY, {"limit": size // 2})]
+        sample = list(dict.fromkeys(top))
+        for row in self._data(RANDOM_ENTITIES_QUERY, {"limit": size}):
+            if len(sample) >= size:
+                break
+            if row["id"] not in sample:
+                sample.append(row["id"])
+        return sample
+    
+    def profile(self, query: str, params: dict) -> Dict[str, Any]:
+        """PROFILE one query and return its plan profile and server time in ms"""
+        summary = self._read(lambda tx: tx.run("PROFILE " + query, params).consume())
+        time_ms = (summary.result_available_after or 0) + (summary.result_consumed_after or 0)
+        return {"profile": summary.profile or {}, "time_ms": float(time_ms)}
+    
+    def _neighborhood_params(self, queries: List[str]) -> dict:
+        return {
+            "queries": queries,
+            "fulltext_limit": settings.graph_fulltext_limit,
+            "entity_limit": settings.graph_entity_limit,
+            "limit": settings.graph_context_limit,
+        }
+    
+    def _cases(self, entities: List[str]) -> Dict[str, List[dict]]:
+        """Parameters of every run of every profiled query"""
+        queries = [query for query in (remove_lucene_chars(entity).strip() for entity in entities) if query]
+        cases = {
+            "neighborhood": [self._neighborhood_params([query]) for query in queries],
+            "batch_neighborhood": [self._neighborhood_params(queries)],
+            "top_entities": [{"limit": max(settings.neighborhood_precompute_top_n, 100)}],
+            "graph_version": [{}],
+        }
+        embeddings = [row["embedding"] for row in self._data(SAMPLE_EMBEDDINGS_QUERY, {"limit": len(queries)})]
+        if embeddings:
+            cases["vector_search"] = [
+                {"index": "vector", "keyword_index": "keyword", "k": settings.vector_top_k,
+                 "embedding": embedding, "query": query}
+                for embedding, query in zip(embeddings, queries)
+            ]
+        else:
+            logger.warning("No Document embeddings found, skipping the vector search profile")
+        return cases
+    
+    def run(self, entities: List[str], repeat: int = 1) -> Dict[str, QueryProfile]:
+        """Profile every retrieval query for the sampled entities"""
+        profiles = {}
+        for name, runs in self._cases(entities).items():
+            profile = QueryProfile(name)
+            for params in runs:
+                for _ in range(repeat):
+                    result = self.profile(PROFILED_QUERIES[name], params)
+                    profile.add(result["profile"], result["time_ms"])
+            profiles[name] = profile
+            logger.info(f"Profiled {name} ({len(profile.db_hits)} runs)")
+        return profiles
+
+def save_baseline(path: str, entities: List[str], profiles: Dict[str, QueryProfile]):
+    """Store the sample and the profile summaries as the baseline"""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    baseline = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "entities": entities,
+        "queries": {name: profile.summary() for name, profile in profiles.items()},
+    }
+    Path(path).write_text(json.dumps(baseline, indent=2), encoding="utf-8")
+
+def load_baseline(path: str) -> Optional[dict]:
+    """The stored baseline, or None if there is none yet"""
+    if not Path(path).exists():
+        return None
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+def compare_profiles(
+    current: Dict[str, dict],
+    baseline: Dict[str, dict],
+    tolerance: float = 0.1,
+    time_tolerance: float = 0.5,
+    min_time_ms: float = 2.0
+) -> List[Finding]:
+    """Flag queries whose db hits, rows or time grew beyond the tolerances
+
+    db hits and rows are deterministic for a given graph and sample, so they
+    get a tight tolerance; timings are noisy and small absolute changes are
+    ignored. Plan changes are reported without counting as regressions.
+    """
+    findings = []
+    for name, summary in current.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in ("db_hits", "rows"):
+            if summary[metric] > base[metric] * (1 + tolerance) and summary[metric] - base[metric] >= 1:
+                findings.append(Finding(name, metric, base[metric], summary[metric], True))
+        if (summary["time_ms_p50"] > base["time_ms_p50"] * (1 + time_tolerance)
+                and summary["time_ms_p50"] - base["time_ms_p50"] >= min_time_ms):
+            findings.append(Finding(name, "time_ms_p50", base["time_ms_p50"], summary["time_ms_p50"], True))
+        if summary["plan"] != base.get("plan"):
+            findings.append(Finding(name, "plan", " > ".join(base.get("plan", [])), " > ".join(summary["plan"]), False))
+    return findings
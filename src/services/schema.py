@@ -0,0 +1,154 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class SchemaItem:
+    """An index or constraint the service depends on
+
+    ``named`` items are called by name from Cypher, so an equivalent index
+    under another name does not count. Items without a statement need
+    information only the caller has, e.g. the embedding dimension.
+    """
+    name: str
+    kind: str
+    type: str
+    label: str
+    properties: Tuple[str, ...]
+    statement: Optional[str]
+    purpose: str
+    named: bool = False
+
+@dataclass
+class SchemaStatus:
+    """State of a schema item in the database"""
+    item: SchemaItem
+    state: str
+    name: Optional[str] = None
+    created: bool = False
+    
+    @property
+    def ok(self) -> bool:
+        return self.state == "ONLINE"
+
+# Created with IF NOT EXISTS, so ensuring the schema is idempotent
+SCHEMA: List[SchemaItem] = [
+    SchemaItem(
+        "entity_id", "constraint", "UNIQUENESS", "__Entity__", ("id",),
+        "CREATE CONSTRAINT entity_id IF NOT EXISTS FOR (e:__Entity__) REQUIRE e.id IS UNIQUE",
+        "entity MERGE during ingestion and id lookups"
+    ),
+    SchemaItem(
+        "document_id", "constraint", "UNIQUENESS", "Document", ("id",),
+        "CREATE CONSTRAINT document_id IF NOT EXISTS FOR (d:Document) REQUIRE d.id IS UNIQUE",
+        "chunk MERGE during ingestion"
+    ),
+    SchemaItem(
+        "meta_id", "constraint", "UNIQUENESS", "__Meta__", ("id",),
+        "CREATE CONSTRAINT meta_id IF NOT EXISTS FOR (m:__Meta__) REQUIRE m.id IS UNIQUE",
+        "graph version lookups"
+    ),
+    SchemaItem(
+        "document_content_hash", "index", "RANGE", "Document", ("content_hash",),
+        "CREATE INDEX document_content_hash IF NOT EXISTS FOR (d:Document) ON (d.content_hash)",
+        "incremental ingestion"
+    ),
+    SchemaItem(
+        "fulltext_entity_id", "index", "FULLTEXT", "__Entity__", ("id",),
+        "CREATE FULLTEXT INDEX fulltext_entity_id IF NOT EXISTS FOR (n:__Entity__) ON EACH [n.id]",
+        "entity neighborhood lookups", named=True
+    ),
+    SchemaItem(
+        "keyword", "index", "FULLTEXT", "Document", ("text",),
+        "CREATE FULLTEXT INDEX keyword IF NOT EXISTS FOR (n:Document) ON EACH [n.text]",
+        "keyword half of the hybrid vector search", named=True
+    ),
+    SchemaItem(
+        "vector", "index", "VECTOR", "Document", ("embedding",),
+        None,
+        "vector half of the hybrid vector search", named=True
+    ),
+]
+
+VECTOR_INDEX_STATEMENT = (
+    "CREATE VECTOR INDEX vector IF NOT EXISTS FOR (n:Document) ON (n.embedding) "
+    "OPTIONS {{indexConfig: {{`vector.dimensions`: {dimensions}, `vector.similarity_function`: 'cosine'}}}}"
+)
+
+SHOW_INDEXES_QUERY = """SHOW INDEXES
+YIELD name, type, labelsOrTypes, properties, state, owningConstraint
+RETURN name, type, labelsOrTypes, properties, state, owningConstraint
+"""
+
+SHOW_CONSTRAINTS_QUERY = """SHOW CONSTRAINTS
+YIELD name, type, labelsOrTypes, properties
+RETURN name, type, labelsOrTypes, properties
+"""
+
+def _matches(item: SchemaItem, row: Dict[str, Any]) -> bool:
+    if item.named and row["name"] != item.name:
+        return False
+    # Constraint types are e.g. UNIQUENESS or NODE_PROPERTY_UNIQUENESS
+    # depending on the Neo4j version
+    return (
+        item.type in (row["type"] or "")
+        and (row["labelsOrTypes"] or []) == [item.label]
+        and tuple(row["properties"] or []) == item.properties
+    )
+
+def inspect_schema(graph: Any) -> List[SchemaStatus]:
+    """Look up the state of every schema item in the database"""
+    indexes = graph.query(SHOW_INDEXES_QUERY)
+    constraints = graph.query(SHOW_CONSTRAINTS_QUERY)
+    index_states = {row["name"]: row["state"] for row in indexes}
+    owned_states = {row["owningConstraint"]: row["state"] for row in indexes if row["owningConstraint"]}
+    
+    statuses = []
+    for item in SCHEMA:
+        rows = constraints if item.kind == "constraint" else indexes
+        row = next((row for row in rows if _matches(item, row)), None)
+        if row is None:
+            statuses.append(SchemaStatus(item, "MISSING"))
+        elif item.kind == "constraint":
+            # A constraint is only enforced once its backing index is online
+            statuses.append(SchemaStatus(item, owned_states.get(row["name"], "ONLINE"), row["name"]))
+        else:
+            statuses.append(SchemaStatus(item, index_states[row["name"]], row["name"]))
+    return statuses
+
+def ensure_schema(graph: Any, vector_dimensions: Optional[int] = None, wait: float = 0) -> List[SchemaStatus]:
+    """Create the missing schema items and return the state of all of them
+
+    The vector index is only created when the embedding dimension is given;
+    otherwise the service creates it at startup. With ``wait`` the call
+    blocks up to that many seconds for new indexes to come online.
+    """
+    created = set()
+    for status in inspect_schema(graph):
+        if status.state != "MISSING":
+            continue
+        item = status.item
+        statement = item.statement
+        if item.type == "VECTOR" and vector_dimensions:
+            statement = VECTOR_INDEX_STATEMENT.format(dimensions=int(vector_dimensions))
+        if statement is None:
+            continue
+        try:
+            graph.query(statement)
+            created.add(item.name)
+            logger.info(f"Created {item.kind} {item.name}")
+        except Exception as e:
+            logger.error(f"Could not create {item.kind} {item.name}: {e}")
+    
+    if created and wait > 0:
+        try:
+            graph.query("CALL db.awaitIndexes($timeout)", {"timeout": int(wait)})
+        except Exception as e:
+            logger.warning(f"Indexes are not online yet: {e}")
+    
+    statuses = inspect_schema(graph)
+    for status in statuses:
+        status.created = status.item.name in created
+    return statuses
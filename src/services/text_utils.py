@@ -0,0 +1,14 @@
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """Normalize a question for use as a cache key
+
+    Applies Unicode NFKC folding, lowercases, collapses whitespace and drops
+    trailing punctuation, so trivially different spellings share one key.
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = _WHITESPACE.sub(" ", text).strip()
+    return text.rstrip("?!. ")
@@ -1,6 +1,16 @@
 let conversationId = null;
 let isStreaming = false;
 
+// One WebSocket carries every question; generations are told apart by id
+let socket = null;
+let socketReady = null;
+let nextGenerationId = 1;
+let currentGeneration = null;
+const generations = new Map();
+
+// Aborts the streaming request when the WebSocket is unavailable
+let abortController = null;
+
 function handleKeyPress(event) {
     if (event.key === 'Enter' && !isStreaming) {
         sendMessage();
@@ -20,37 +30,146 @@ async function sendMessage() {
     // Add user message to chat
     addMessage(message, 'user');
     
+    // Create bot message placeholder
+    const botMessageId = addStreamingMessage();
+    
     try {
-        // Create bot message placeholder
-        const botMessageId = addStreamingMessage();
-        
-        // Send message to streaming API
-        const response = await fetch('/api/v1/chat/stream', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                message: message,
-                conversation_id: conversationId
-            })
-        });
-        
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
+        let ws = null;
+        try {
+            ws = await connectSocket();
+        } catch (error) {
+            console.warn('WebSocket unavailable, falling back to streaming HTTP:', error);
         }
         
-        // Handle streaming response
-        await handleStreamingResponse(response, botMessageId);
+        if (ws) {
+            await askOverSocket(ws, message, botMessageId);
+        } else {
+            await askOverHttp(message, botMessageId);
+        }
         
     } catch (error) {
-        console.error('Error sending message:', error);
-        addMessage('Sorry, I encountered an error. Please try again.', 'bot');
+        if (error.name === 'AbortError') {
+            updateStreamingMessage(botMessageId, null, true);
+        } else {
+            console.error('Error sending message:', error);
+            updateStreamingMessage(botMessageId, 'Sorry, I encountered an error. Please try again.', true);
+        }
     } finally {
+        isStreaming = false;
+        currentGeneration = null;
+        abortController = null;
         setLoading(false);
     }
 }
 
+function connectSocket() {
+    if (socketReady) return socketReady;
+    
+    socketReady = new Promise((resolve, reject) => {
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        const ws = new WebSocket(`${protocol}//${window.location.host}/api/v1/ws`);
+        
+        ws.onopen = () => {
+            socket = ws;
+            resolve(ws);
+        };
+        ws.onerror = () => reject(new Error('WebSocket connection failed'));
+        ws.onmessage = (event) => {
+            try {
+                handleFrame(JSON.parse(event.data));
+            } catch (e) {
+                console.error('Error parsing WebSocket frame:', e);
+            }
+        };
+        ws.onclose = () => {
+            // Reconnect on the next question and end the cut-off answers
+            socket = null;
+            socketReady = null;
+            for (const [id, generation] of generations) {
+                finishGeneration(id, generation.content || 'Connection lost. Please try again.');
+            }
+        };
+    });
+    
+    return socketReady;
+}
+
+function askOverSocket(ws, message, messageId) {
+    const id = nextGenerationId++;
+    currentGeneration = id;
+    isStreaming = true;
+    setLoading(true);
+    
+    return new Promise((resolve) => {
+        generations.set(id, { messageId: messageId, content: '', resolve: resolve });
+        ws.send(JSON.stringify({ t: 'ask', id: id, m: message, c: conversationId }));
+    });
+}
+
+function handleFrame(frame) {
+    const generation = generations.get(frame.id);
+    if (!generation) {
+        if (frame.t === 'error') console.error('WebSocket error:', frame.x);
+        return;
+    }
+    
+    if (frame.t === 'start') {
+        conversationId = frame.c;
+        
+    } else if (frame.t === 'delta') {
+        generation.content += frame.x;
+        updateStreamingMessage(generation.messageId, generation.content, false);
+        
+    } else if (frame.t === 'end') {
+        finishGeneration(frame.id, generation.content);
+        
+    } else if (frame.t === 'error') {
+        finishGeneration(frame.id, frame.x);
+    }
+}
+
+function finishGeneration(id, content) {
+    const generation = generations.get(id);
+    if (!generation) return;
+    
+    generations.delete(id);
+    updateStreamingMessage(generation.messageId, content, true);
+    generation.resolve();
+}
+
+function stopGeneration() {
+    if (socket && generations.has(currentGeneration)) {
+        // The server stops generating and answers with an end frame
+        socket.send(JSON.stringify({ t: 'cancel', id: currentGeneration }));
+    } else if (abortController) {
+        abortController.abort();
+    }
+}
+
+async function askOverHttp(message, messageId) {
+    abortController = new AbortController();
+    
+    // Send message to streaming API
+    const response = await fetch('/api/v1/chat/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            message: message,
+            conversation_id: conversationId
+        }),
+        signal: abortController.signal
+    });
+    
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    
+    // Handle streaming response
+    await handleStreamingResponse(response, messageId);
+}
+
 async function handleStreamingResponse(response, messageId) {
     const reader = response.body.getReader();
     const decoder = new TextDecoder();
@@ -140,7 +259,7 @@ function updateStreamingMessage(messageId, content, isComplete) {
     const contentSpan = messageElement.querySelector('.streaming-content');
     const typingIndicator = messageElement.querySelector('.typing-indicator');
     
-    if (contentSpan) {
+    if (contentSpan && content !== null) {
         contentSpan.textContent = content;
     }
     
@@ -176,20 +295,23 @@ function addMessage(content, sender) {
 
 function setLoading(loading) {
     const messageInput = document.getElementById('messageInput');
-    const sendButton = document.querySelector('.chat-input .btn');
+    const sendButton = document.getElementById('sendButton');
     const sendButtonText = document.getElementById('sendButtonText');
     const sendButtonSpinner = document.getElementById('sendButtonSpinner');
+    const stopButton = document.getElementById('stopButton');
     
     if (loading || isStreaming) {
         messageInput.disabled = true;
         sendButton.disabled = true;
         sendButtonText.classList.add('d-none');
         sendButtonSpinner.classList.remove('d-none');
+        stopButton.classList.remove('d-none');
     } else {
         messageInput.disabled = false;
         sendButton.disabled = false;
         sendButtonText.classList.remove('d-none');
         sendButtonSpinner.classList.add('d-none');
+        stopButton.classList.add('d-none');
         messageInput.focus();
     }
 }
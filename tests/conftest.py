@@ -0,0 +1,32 @@
+import pytest
+
+from benchmarks.fake_graph import SyntheticGraph
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings
+from benchmarks.harness import build_service, make_questions
+from src.config import settings
+
+@pytest.fixture
+def embeddings() -> FakeEmbeddings:
+    return FakeEmbeddings(dimension=32, latency=0.0)
+
+@pytest.fixture
+def llm() -> FakeChatModel:
+    return FakeChatModel(first_token_latency=0.0, tokens_per_second=10000, answer_tokens=8, extraction_latency=0.0)
+
+@pytest.fixture
+def graph(embeddings: FakeEmbeddings) -> SyntheticGraph:
+    return SyntheticGraph(entities=100, relationships=300, documents=100, embeddings=embeddings, query_latency=0.0)
+
+@pytest.fixture
+def questions(graph: SyntheticGraph):
+    return make_questions(graph, 5)
+
+@pytest.fixture
+def service(graph, embeddings, llm, tmp_path, monkeypatch):
+    """GraphRAGService on the benchmark stand-ins with in-process caches only"""
+    monkeypatch.setattr(settings, "answer_cache_enabled", True)
+    monkeypatch.setattr(settings, "graph_version_check_interval", 0)
+    service = build_service(graph, embeddings, llm, str(tmp_path))
+    yield service
+    service._executor.shutdown(wait=False)
+    service._rebuild_executor.shutdown(wait=True)
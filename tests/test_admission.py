@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+import pytest
+
+from src.services.admission import Limiter, Overloaded, deadline_var
+
+def test_waiters_are_admitted_by_priority_then_arrival():
+    async def scenario():
+        limiter = Limiter("test", limit=1, max_queue=10, max_wait=5)
+        order = []
+        
+        async def call(name: str, priority: str):
+            async with limiter.slot(priority):
+                order.append(name)
+        
+        await limiter.acquire()
+        tasks = []
+        for name, priority in [("low", "low"), ("normal-1", "normal"), ("high", "high"), ("normal-2", "normal")]:
+            tasks.append(asyncio.create_task(call(name, priority)))
+            await asyncio.sleep(0)
+        assert limiter.queued == 4
+        limiter.release()
+        await asyncio.gather(*tasks)
+        return order, limiter
+    
+    order, limiter = asyncio.run(scenario())
+    assert order == ["high", "normal-1", "normal-2", "low"]
+    assert limiter.in_use == 0 and limiter.queued == 0
+
+def test_full_queue_sheds_with_429():
+    async def scenario():
+        limiter = Limiter("test", limit=1, max_queue=1, max_wait=5)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as shed:
+            limiter.check()
+        with pytest.raises(Overloaded):
+            await limiter.acquire()
+        limiter.release()
+        await waiter
+        limiter.release()
+        return shed.value, limiter
+    
+    error, limiter = asyncio.run(scenario())
+    assert error.reason == "queue_full"
+    assert error.status_code == 429
+    assert error.retry_after >= 1
+    assert limiter.in_use == 0 and limiter.queued == 0
+
+def test_request_deadline_sheds_with_503():
+    async def scenario():
+        limiter = Limiter("test", limit=1, max_queue=10, max_wait=5)
+        await limiter.acquire()
+        deadline_var.set(time.monotonic() + 0.05)
+        started = time.monotonic()
+        with pytest.raises(Overloaded) as shed:
+            await limiter.acquire()
+        waited = time.monotonic() - started
+        
+        # A deadline that has already passed is shed without queueing
+        deadline_var.set(time.monotonic() - 1)
+        with pytest.raises(Overloaded):
+            await limiter.acquire()
+        limiter.release()
+        return shed.value, waited, limiter
+    
+    error, waited, limiter = asyncio.run(scenario())
+    assert error.reason == "deadline"
+    assert error.status_code == 503
+    assert waited < 1
+    assert limiter.in_use == 0 and limiter.queued == 0
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def scenario():
+        limiter = Limiter("test", limit=1, max_queue=10, max_wait=5)
+        await limiter.acquire()
+        cancelled = asyncio.create_task(limiter.acquire("high"))
+        waiting = asyncio.create_task(limiter.acquire("low"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        limiter.release()
+        await waiting
+        return limiter
+    
+    limiter = asyncio.run(scenario())
+    assert limiter.in_use == 1 and limiter.queued == 0
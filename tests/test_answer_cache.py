@@ -0,0 +1,66 @@
+import asyncio
+
+from src.services.answer_cache import SemanticAnswerCache
+from src.services.cache_backend import MemoryCacheBackend
+
+def test_answer_cache_hits_exact_and_similar_questions():
+    cache = SemanticAnswerCache(max_size=10, ttl=0, similarity_threshold=0.9)
+    cache.store("who is ada", [1.0, 0.0], "A mathematician", ["ada.txt"])
+    
+    exact = cache.lookup("who is ada", [0.0, 1.0])
+    similar = cache.lookup("who was ada", [0.99, 0.05])
+    assert (exact.answer, exact.sources) == ("A mathematician", ["ada.txt"])
+    assert similar.answer == "A mathematician"
+    assert cache.lookup("what is rust", [0.0, 1.0]) is None
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+def test_answer_cache_expires_evicts_and_clears():
+    cache = SemanticAnswerCache(max_size=2, ttl=0, similarity_threshold=0.99)
+    cache.store("a", [1.0, 0.0, 0.0], "A")
+    cache.store("b", [0.0, 1.0, 0.0], "B")
+    cache.store("c", [0.0, 0.0, 1.0], "C")
+    assert cache.lookup("a", [1.0, 0.0, 0.0]) is None
+    assert cache.lookup("c", [0.0, 0.0, 1.0]).answer == "C"
+    
+    cache.clear()
+    assert cache.lookup("c", [0.0, 0.0, 1.0]) is None
+    
+    expiring = SemanticAnswerCache(max_size=2, ttl=1e-9, similarity_threshold=0.99)
+    expiring.store("a", [1.0], "A")
+    assert expiring.lookup("a", [1.0]) is None
+
+def test_answer_cache_shares_entries_per_generation():
+    backend = MemoryCacheBackend(max_entries=100)
+    writer = SemanticAnswerCache(max_size=10, ttl=0, similarity_threshold=0.99, backend=backend)
+    reader = SemanticAnswerCache(max_size=10, ttl=0, similarity_threshold=0.99, backend=backend)
+    writer.generation = reader.generation = "1"
+    asyncio.run(writer.astore("q", [1.0, 0.0], "answer", ["doc.txt"]))
+    
+    shared = asyncio.run(reader.alookup("q", [1.0, 0.0]))
+    assert (shared.answer, shared.sources) == ("answer", ["doc.txt"])
+    
+    # A new graph version does not see the answers of the old one
+    other = SemanticAnswerCache(max_size=10, ttl=0, similarity_threshold=0.99, backend=backend)
+    other.generation = "2"
+    assert other.lookup("q", [1.0, 0.0]) is None
+
+def test_graph_version_change_drops_cached_answers(service, graph, questions):
+    first = service.chat_with_sources(questions[0])
+    assert not first.cached
+    again = service.chat_with_sources(questions[0])
+    assert again.cached and again.sources == first.sources
+    
+    graph.version += 1
+    after = service.chat_with_sources(questions[0])
+    assert not after.cached
+    assert service.answer_cache.generation == str(graph.version)
+
+def test_async_service_answers_from_the_cache(service, questions):
+    async def scenario():
+        first = await service.achat_with_sources(questions[1])
+        second = await service.achat_with_sources(questions[1])
+        return first, second
+    
+    first, second = asyncio.run(scenario())
+    assert not first.cached and second.cached
+    assert second.answer == first.answer and second.sources == first.sources
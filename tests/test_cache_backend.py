@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from src.config import settings
+from src.services.cache_backend import CacheBackend, MemoryCacheBackend, RedisCacheBackend, SQLiteCacheBackend
+from src.services.graph_rag import GraphRAGService
+from src.services.memo import MemoStore
+
+def test_incomplete_backends_fail_on_construction():
+    class GetOnly(CacheBackend):
+        def get_many(self, keys):
+            return [None] * len(keys)
+    
+    with pytest.raises(TypeError):
+        GetOnly()
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryCacheBackend(max_entries=2)
+    backend.set_many({"a": b"1", "b": b"2"})
+    assert backend.get("a") == b"1"
+    backend.set("c", b"3")
+    assert backend.get_many(["a", "b", "c"]) == [b"1", None, b"3"]
+
+def test_sqlite_backend_hits_do_not_write(tmp_path):
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.sqlite"), max_entries=10)
+    backend.set("a", b"1")
+    changes = backend._db.total_changes
+    assert backend.get_many(["a", "missing"]) == [b"1", None]
+    assert backend._db.total_changes == changes
+    assert "a" in backend._touched
+    
+    # The next write records the access time of the hits
+    backend.set("b", b"2")
+    assert backend._touched == {}
+    backend.close()
+
+def test_sqlite_backend_is_shared_between_connections(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    writer = SQLiteCacheBackend(path, max_entries=10)
+    reader = SQLiteCacheBackend(path, max_entries=10)
+    asyncio.run(writer.aset("a", b"1"))
+    assert asyncio.run(reader.aget_many(["a", "b"])) == [b"1", None]
+    writer.close()
+    reader.close()
+
+def test_memo_stats_count_stored_entries():
+    memo = MemoStore(MemoryCacheBackend(max_entries=10))
+    memo.set_many({"a": b"1", "b": b"2"})
+    assert memo.get("a") == b"1"
+    assert asyncio.run(memo.aget("c")) is None
+    assert memo.stats() == {"hits": 1, "misses": 1, "size": 2, "hit_rate": 0.5}
+
+def test_service_persists_the_memo_only_with_the_default_backend(tmp_path, monkeypatch):
+    path = tmp_path / "memo.sqlite"
+    monkeypatch.setattr(settings, "memo_cache_path", str(path))
+    monkeypatch.setattr(settings, "cache_backend", "memory")
+    
+    backend = MemoryCacheBackend(max_entries=10)
+    assert GraphRAGService(initialize=False, cache_backend=backend).memo.backend is backend
+    assert not path.exists()
+    
+    memo_backend = MemoryCacheBackend(max_entries=10)
+    service = GraphRAGService(initialize=False, cache_backend=backend, memo_backend=memo_backend)
+    assert service.memo.backend is memo_backend
+    
+    default = GraphRAGService(initialize=False)
+    assert isinstance(default.memo.backend, SQLiteCacheBackend) and path.exists()
+    default.memo.close()
+
+def test_redis_backend_with_fakeredis():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    backend = RedisCacheBackend(
+        client=fakeredis.FakeRedis(server=server),
+        async_client=fakeredis.FakeAsyncRedis(server=server),
+        prefix="test:",
+        ttl=60
+    )
+    
+    async def roundtrip():
+        await backend.aset_many({"memo:a": b"1", "answer:b": b"2"})
+        return await backend.aget_many(["memo:a", "answer:b", "memo:c"])
+    
+    assert asyncio.run(roundtrip()) == [b"1", b"2", None]
+    assert backend.get_many(["memo:a"]) == [b"1"]
+    assert 0 < backend.client.ttl("test:memo:a") <= 60
+    assert backend.count("memo:") == 1
+    backend.clear("memo:")
+    assert backend.get_many(["memo:a", "answer:b"]) == [None, b"2"]
+    backend.delete(["answer:b"])
+    assert backend.count() == 0
+    backend.close()
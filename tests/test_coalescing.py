@@ -0,0 +1,118 @@
+import asyncio
+
+from src.services.coalescing import SingleFlight, StreamFlights
+
+def test_single_flight_shares_one_computation():
+    async def scenario():
+        flights = SingleFlight()
+        calls = []
+        
+        async def compute() -> str:
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "answer"
+        
+        first = asyncio.create_task(flights.do("q", compute))
+        await asyncio.sleep(0)
+        assert flights.joining("q")
+        results = await asyncio.gather(first, flights.do("q", compute))
+        return results, calls, flights
+    
+    results, calls, flights = asyncio.run(scenario())
+    assert results == ["answer", "answer"]
+    assert len(calls) == 1
+    assert len(flights) == 0
+
+def test_single_flight_survives_a_cancelled_caller():
+    async def scenario():
+        flights = SingleFlight()
+        
+        async def compute() -> str:
+            await asyncio.sleep(0.02)
+            return "answer"
+        
+        leaving = asyncio.create_task(flights.do("q", compute))
+        staying = asyncio.create_task(flights.do("q", compute))
+        await asyncio.sleep(0.005)
+        leaving.cancel()
+        return await staying, leaving.cancelled()
+    
+    assert asyncio.run(scenario()) == ("answer", True)
+
+def test_single_flight_shares_errors_and_forgets_the_key():
+    async def scenario():
+        flights = SingleFlight()
+        
+        async def fail():
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+        
+        results = await asyncio.gather(flights.do("q", fail), flights.do("q", fail), return_exceptions=True)
+        return results, flights
+    
+    results, flights = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert not flights.joining("q")
+
+async def _collect(stream) -> list:
+    return [chunk async for chunk in stream]
+
+def test_stream_flights_replay_chunks_to_late_joiners():
+    async def scenario():
+        flights = StreamFlights()
+        started = []
+        
+        async def source():
+            started.append(1)
+            for chunk in ["a", "b", "c"]:
+                await asyncio.sleep(0.01)
+                yield chunk
+        
+        first = asyncio.create_task(_collect(flights.subscribe("q", source)))
+        await asyncio.sleep(0.015)
+        assert flights.joining("q")
+        late = await _collect(flights.subscribe("q", source))
+        return await first, late, started, flights
+    
+    first, late, started, flights = asyncio.run(scenario())
+    assert first == late == ["a", "b", "c"]
+    assert len(started) == 1
+    assert len(flights) == 0
+
+def test_stream_flights_cancel_the_source_with_the_last_subscriber():
+    async def scenario():
+        flights = StreamFlights()
+        stopped = asyncio.Event()
+        
+        async def source():
+            try:
+                while True:
+                    await asyncio.sleep(0.01)
+                    yield "chunk"
+            finally:
+                stopped.set()
+        
+        stream = flights.subscribe("q", source)
+        assert await stream.__anext__() == "chunk"
+        await stream.aclose()
+        await asyncio.wait_for(stopped.wait(), 1)
+        return flights
+    
+    assert len(asyncio.run(scenario())) == 0
+
+def test_stream_flights_raise_the_source_error_for_every_subscriber():
+    async def scenario():
+        flights = StreamFlights()
+        
+        async def source():
+            yield "a"
+            raise RuntimeError("broken")
+        
+        return await asyncio.gather(
+            _collect(flights.subscribe("q", source)),
+            _collect(flights.subscribe("q", source)),
+            return_exceptions=True
+        )
+    
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
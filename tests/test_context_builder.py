@@ -0,0 +1,58 @@
+from langchain_core.documents import Document
+
+from src.services.context_builder import ContextBuilder
+
+def _words(text: str) -> int:
+    return len(text.split())
+
+def _builder(max_tokens: int, **options) -> ContextBuilder:
+    return ContextBuilder(max_tokens=max_tokens, count_tokens=_words, **options)
+
+def test_duplicates_are_dropped():
+    rows = [
+        {"output": "Ada - WROTE -> Notes", "score": 2.0},
+        {"output": "ada - wrote -> notes", "score": 1.0},
+    ]
+    documents = [
+        Document(page_content="Ada Lovelace wrote the first published algorithm for the engine",
+                 metadata={"score": 0.9, "source": "ada.txt"}),
+        Document(page_content="Ada Lovelace wrote the first published algorithm for the engine.",
+                 metadata={"score": 0.8, "source": "copy.txt"}),
+        Document(page_content="Charles Babbage designed the Analytical Engine",
+                 metadata={"score": 0.5, "source": "babbage.txt"}),
+    ]
+    context = _builder(1000).build([], rows, documents)
+    
+    assert [item.text for item in context.items if item.kind == "graph"] == ["Ada - WROTE -> Notes"]
+    assert [item.source for item in context.items if item.kind == "document"] == ["ada.txt", "babbage.txt"]
+    assert context.dropped == 0
+
+def test_budget_keeps_the_best_items():
+    documents = [
+        Document(page_content="one two three four five six", metadata={"score": 1.0, "source": "long.txt"}),
+        Document(page_content="seven eight", metadata={"score": 0.6, "source": "short.txt"}),
+        Document(page_content="nine ten eleven", metadata={"score": 0.3, "source": "low.txt"}),
+    ]
+    # Each item costs its words plus one separator token
+    context = _builder(10).build([], [], documents)
+    
+    assert context.sources == ["long.txt", "short.txt"]
+    assert context.tokens == 10 and context.dropped == 1
+    assert "nine" not in context.text
+
+def test_question_entities_raise_the_rank():
+    rows = [
+        {"output": "Charles - BUILT -> Engine", "score": 1.0},
+        {"output": "Ada - WROTE -> Notes", "score": 0.8},
+    ]
+    context = _builder(6, entity_weight=0.5).build(["Ada"], rows, [])
+    assert [item.text for item in context.items] == ["Ada - WROTE -> Notes"]
+
+def test_documents_without_scores_keep_the_retriever_order():
+    documents = [
+        Document(page_content="first chunk text", metadata={"id": "a"}),
+        Document(page_content="second chunk text here", metadata={"id": "b"}),
+    ]
+    context = _builder(4).build([], [], documents)
+    assert context.sources == ["a"]
+    assert context.text.startswith("Graph data:\n\nVector data:\nfirst chunk text")
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from src.ingestion.loader import iter_chunks, iter_documents, iter_windows
+
+def _text(paragraphs: int = 40, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    words = ["graph", "entity", "Lovelace", "Zürich", "naïve", "東京", "relation", "node", "émigré", "chunk"]
+    return "\n\n".join(
+        " ".join(rng.choice(words) for _ in range(rng.randint(5, 80))) + "." for _ in range(paragraphs)
+    )
+
+def _assert_covers(text: str, chunks):
+    """Every chunk is taken from the text in order and together they leave out only whitespace"""
+    covered = 0
+    start = 0
+    for chunk in chunks:
+        position = text.find(chunk, start)
+        assert position >= 0, f"chunk not in text: {chunk!r}"
+        assert not text[covered:position].strip(), f"text skipped: {text[covered:position]!r}"
+        covered = max(covered, position + len(chunk))
+        start = position + 1
+    assert not text[covered:].strip()
+
+@pytest.mark.parametrize("window", [1, 7, 64, 100000])
+def test_iter_chunks_covers_text_split_in_windows(window):
+    text = _text()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=120, chunk_overlap=16)
+    windows = (text[i:i + window] for i in range(0, len(text), window))
+    chunks = list(iter_chunks(windows, splitter))
+    
+    _assert_covers(text, chunks)
+    assert all(len(chunk) <= 120 for chunk in chunks)
+    if window >= len(text):
+        assert chunks == splitter.split_text(text)
+
+def test_iter_chunks_skips_blank_windows():
+    splitter = RecursiveCharacterTextSplitter(chunk_size=50, chunk_overlap=0)
+    assert list(iter_chunks(iter(["   ", "\n\n", ""]), splitter)) == []
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_iter_windows_keeps_multibyte_characters(tmp_path, use_mmap):
+    text = _text(paragraphs=10)
+    file = tmp_path / "doc.txt"
+    file.write_text(text, encoding="utf-8")
+    
+    # Odd window sizes split the multi-byte characters
+    for window_size in (1, 3, 5, 4096):
+        windows = list(iter_windows(file, window_size, use_mmap))
+        assert "".join(windows) == text
+        assert "�" not in "".join(windows)
+
+def test_iter_windows_reads_empty_files(tmp_path):
+    file = tmp_path / "empty.txt"
+    file.write_bytes(b"")
+    assert list(iter_windows(file, 16, use_mmap=True)) == []
+    assert list(iter_windows(file, 16)) == []
+
+def test_iter_documents_tags_relative_sources(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.txt").write_text(_text(paragraphs=3, seed=1), encoding="utf-8")
+    (tmp_path / "sub" / "b.txt").write_text(_text(paragraphs=3, seed=2), encoding="utf-8")
+    
+    documents = list(iter_documents(str(tmp_path), chunk_size=100, chunk_overlap=10, window_size=64))
+    assert {document.metadata["source"] for document in documents} == {"a.txt", "sub/b.txt"}
+    _assert_covers(
+        (tmp_path / "a.txt").read_text(encoding="utf-8"),
+        [document.page_content for document in documents if document.metadata["source"] == "a.txt"]
+    )
@@ -0,0 +1,68 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from src.services.local_vector import LocalVectorIndex
+
+@pytest.fixture
+def snapshot(graph, tmp_path) -> str:
+    path = str(tmp_path / "vectors")
+    assert LocalVectorIndex.build(graph, path, batch_size=30) == len(graph.documents)
+    return path
+
+def test_search_finds_documents_with_their_sources(graph, embeddings, snapshot):
+    index = LocalVectorIndex(snapshot)
+    document = graph.documents[17]
+    
+    found = index.documents(embeddings.vector(document["text"]), document["text"], k=3)
+    assert found[0].page_content == document["text"]
+    assert found[0].metadata["id"] == document["id"]
+    assert found[0].metadata["score"] == pytest.approx(1.0)
+    assert found[0].metadata["sources"] == document["sources"]
+    assert found[0].metadata["source"] == document["source"]
+
+def test_ivf_search_scans_the_closest_lists(graph, embeddings, tmp_path):
+    path = str(tmp_path / "vectors")
+    LocalVectorIndex.build(graph, path, ivf_lists=4)
+    index = LocalVectorIndex(path, nprobe=4)
+    assert index.centroids.shape == (4, embeddings.dimension)
+    
+    # Probing every list is exact search
+    document = graph.documents[3]
+    assert index.search(embeddings.vector(document["text"]), "", k=1)[0][0] == 3
+
+def test_keyword_scores_rank_matching_texts(snapshot):
+    index = LocalVectorIndex(snapshot)
+    hits, scores = index._keyword_scores("Document 42", k=5)
+    assert index.ids[int(hits[scores.argmax()])] == "doc-00000042"
+
+def test_rebuild_swaps_the_snapshot_version(graph, snapshot):
+    first = LocalVectorIndex(snapshot)
+    assert first.is_current()
+    
+    graph.documents.append({**graph.documents[0], "id": "doc-99999999", "text": "A new chunk"})
+    LocalVectorIndex.build(graph, snapshot)
+    second = LocalVectorIndex(snapshot)
+    assert not first.is_current() and second.is_current()
+    assert len(second) == len(first) + 1
+    # The old index keeps working on its own files
+    assert first.text(0) == second.text(0)
+    
+    LocalVectorIndex.build(graph, snapshot)
+    versions = sorted(path.name for path in Path(snapshot).parent.glob("vectors.v*"))
+    assert len(versions) == 2 and f"vectors.{second.version}" in versions
+
+def test_loads_unversioned_snapshots(graph, embeddings, snapshot, tmp_path):
+    current = LocalVectorIndex(snapshot)
+    legacy = str(tmp_path / "legacy")
+    for file in (tmp_path / f"vectors.{current.version}").iterdir():
+        if not file.name.startswith(("vectors.postings", "vectors.weights", "vectors.posting_offsets", "vectors.terms")):
+            shutil.copy(file, tmp_path / file.name.replace("vectors", "legacy", 1))
+    
+    # Without exported postings the keyword index is built in memory
+    index = LocalVectorIndex(legacy)
+    assert index.version is None and not index.is_current()
+    document = graph.documents[5]
+    query = embeddings.vector(document["text"])
+    assert index.search(query, document["text"], k=4) == current.search(query, document["text"], k=4)
@@ -0,0 +1,34 @@
+import asyncio
+
+import numpy as np
+
+from src.services.cache_backend import MemoryCacheBackend
+from src.services.memo import MemoizedEmbeddings, MemoStore
+
+def test_memoized_embeddings_call_the_model_once(embeddings):
+    calls = []
+    
+    class Counting(type(embeddings)):
+        def embed_query(self, text):
+            calls.append(text)
+            return super().embed_query(text)
+        
+        async def aembed_documents(self, texts):
+            calls.extend(texts)
+            return await super().aembed_documents(texts)
+    
+    memo = MemoStore(MemoryCacheBackend(max_entries=100))
+    memoized = MemoizedEmbeddings(Counting(dimension=8, latency=0.0), memo=memo, model="test")
+    first = memoized.embed_query("Who is  Ada?")
+    # Memo entries are stored as float32
+    assert np.allclose(memoized.embed_query("who is ada?"), first)
+    vectors = asyncio.run(memoized.aembed_queries(["who is ada?", "what is rust?"]))
+    assert np.allclose(vectors[0], first)
+    assert calls == ["Who is  Ada?", "what is rust?"]
+    assert memo.stats()["hits"] == 2
+
+def test_memo_keys_normalize_the_question():
+    key = MemoStore.make_key("embedding", "model", "Who is  Ada?")
+    assert key == MemoStore.make_key("embedding", "model", "who is ada")
+    assert key != MemoStore.make_key("embedding", "other", "who is ada")
+    assert key != MemoStore.make_key("entities", "model", "who is ada")
@@ -0,0 +1,55 @@
+import asyncio
+
+from src.services.cache_backend import MemoryCacheBackend
+from src.services.neighborhood_cache import NeighborhoodCache
+
+def _rows(*triples, entity=None):
+    return [{"output": output, "score": score, "entity": entity} for output, score in triples]
+
+def test_neighborhood_cache_bounds_memory():
+    cache = NeighborhoodCache(max_bytes=2000)
+    for i in range(20):
+        cache.put(f"entity {i}", _rows((f"Entity{i} KNOWS Other", 1.0), entity=f"Entity{i}"))
+    assert cache.bytes <= 2000
+    assert 0 < len(cache) < 20
+    found, missing = cache.get_many(["entity 19", "entity 0"])
+    assert list(found) == ["entity 19"] and missing == ["entity 0"]
+
+def test_neighborhood_cache_invalidates_changed_entities():
+    cache = NeighborhoodCache(max_bytes=1 << 20)
+    cache.put("ada", _rows(("Ada Lovelace WROTE Notes", 1.0), entity="Ada Lovelace"))
+    cache.put("babbage", _rows(("Charles Babbage BUILT Engine", 1.0), entity="Charles Babbage"))
+    cache.put("engine", _rows(("Analytical Engine IS Machine", 1.0), entity="Analytical Engine"))
+    
+    # Babbage's entry involves the entity, the engine query could now match it
+    assert cache.invalidate(["Charles Babbage", "Difference Engine"]) == 2
+    found, missing = cache.get_many(["ada", "babbage", "engine"])
+    assert list(found) == ["ada"] and missing == ["babbage", "engine"]
+    
+    cache.clear()
+    assert len(cache) == 0 and cache.bytes == 0
+
+def test_neighborhood_cache_reads_other_workers_entries():
+    backend = MemoryCacheBackend(max_entries=100)
+    writer = NeighborhoodCache(max_bytes=1 << 20, backend=backend)
+    reader = NeighborhoodCache(max_bytes=1 << 20, backend=backend)
+    asyncio.run(writer.aput_many({"ada": _rows(("Ada Lovelace WROTE Notes", 0.5), entity="Ada Lovelace")}))
+    
+    found, missing = asyncio.run(reader.aget_many(["ada", "babbage"]))
+    assert found == {"ada": [{"output": "Ada Lovelace WROTE Notes", "score": 0.5}]}
+    assert missing == ["babbage"]
+    # Kept locally with its entities, so it can be invalidated
+    assert reader.invalidate(["Ada Lovelace"]) == 1
+
+def test_service_drops_only_changed_neighborhoods(service, questions):
+    for question in questions:
+        service.chat(question)
+    cached = len(service.neighborhood_cache)
+    entity = next(iter(next(iter(service.neighborhood_cache._entries.values())).entities))
+    
+    service.invalidate_caches([entity])
+    assert len(service.neighborhood_cache) < cached
+    assert all(entity not in entry.entities for entry in service.neighborhood_cache._entries.values())
+    
+    service.invalidate_caches()
+    assert len(service.neighborhood_cache) == 0
@@ -0,0 +1,216 @@
+import copy
+from typing import Any, Callable, Dict, List, Optional
+
+import pytest
+from langchain_community.graphs.graph_document import GraphDocument, Node, Relationship
+from langchain_core.documents import Document
+
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings
+from src.ingestion import pipeline as ingestion
+from src.ingestion.pipeline import IngestionPipeline, chunk_id
+
+class _Result:
+    def __init__(self, rows: List[dict]):
+        self.rows = rows
+    
+    def data(self) -> List[dict]:
+        return self.rows
+    
+    def consume(self):
+        pass
+
+class IngestionGraph:
+    """In-memory stand-in for the graph, answering the pipeline's queries
+
+    Write transactions work on a copy that replaces the state only when the
+    whole transaction succeeds. ``fail_on`` makes the next transaction fail
+    when it reaches the given query.
+    """
+    
+    def __init__(self):
+        self.documents: Dict[str, dict] = {}
+        self.relationships: Dict[tuple, List[str]] = {}
+        self.fail_on: Optional[str] = None
+    
+    def query(self, query: str, params: Optional[dict] = None) -> List[dict]:
+        return self._execute(self.__dict__, query, params or {})
+    
+    def write_transaction(self, work: Callable[[Any], Any]) -> Any:
+        state = copy.deepcopy({"documents": self.documents, "relationships": self.relationships})
+        
+        class Transaction:
+            @staticmethod
+            def run(query: str, params: dict) -> _Result:
+                if query == self.fail_on:
+                    self.fail_on = None
+                    raise ConnectionError("connection lost")
+                return _Result(self._execute(state, query, params))
+        
+        result = work(Transaction())
+        self.documents, self.relationships = state["documents"], state["relationships"]
+        return result
+    
+    def _execute(self, state: dict, query: str, params: dict) -> List[dict]:
+        documents, relationships = state["documents"], state["relationships"]
+        if query == ingestion.EXISTING_CHUNKS_QUERY:
+            existing = [row for row in params["rows"] if row["id"] in documents]
+            for row in existing:
+                documents[row["id"]]["sources"].add(row["source"])
+            return [{"id": row["id"]} for row in existing]
+        if query == ingestion.DOCUMENT_WRITE_QUERY:
+            for row in params["rows"]:
+                document = documents.setdefault(row["id"], {"sources": set(), "mentions": set()})
+                document["sources"].add(row["source"])
+                document["mentions"].update(node["id"] for node in row["nodes"])
+            return []
+        if query == ingestion.RELATIONSHIP_WRITE_QUERY:
+            for row in params["rows"]:
+                for rel in row["relationships"]:
+                    chunks = relationships.setdefault((rel["source"], rel["type"], rel["target"]), [])
+                    if row["id"] not in chunks:
+                        chunks.append(row["id"])
+            return []
+        if query == ingestion.SOURCE_CHUNKS_QUERY:
+            ids = sorted(chunk for chunk, document in documents.items()
+                         if params["source"] in document["sources"] and chunk > params["after"])
+            return [{"id": chunk} for chunk in ids[:params["limit"]]]
+        if query == ingestion.KNOWN_SOURCES_QUERY:
+            return [{"source": source} for source in {s for d in documents.values() for s in d["sources"]}]
+        if query == ingestion.UNREGISTER_SOURCE_QUERY:
+            orphans = []
+            for chunk in params["ids"]:
+                documents[chunk]["sources"].discard(params["source"])
+                if not documents[chunk]["sources"]:
+                    orphans.append({"id": chunk})
+            return orphans
+        if query == ingestion.RELEASE_RELATIONSHIPS_QUERY:
+            released = []
+            for key, chunks in list(relationships.items()):
+                chunks[:] = [chunk for chunk in chunks if chunk not in params["ids"]]
+                if not chunks:
+                    del relationships[key]
+                    released.append({"source": key[0], "target": key[2]})
+            return released
+        if query == ingestion.DELETE_CHUNKS_QUERY:
+            mentioned = set()
+            for chunk in params["ids"]:
+                mentioned |= documents.pop(chunk)["mentions"]
+            still = set().union(*(document["mentions"] for document in documents.values()))
+            return [{"id": entity, "neighbors": []} for entity in mentioned - still]
+        raise NotImplementedError(query[:60])
+
+class WordTransformer:
+    """Extracts capitalized words as entities, each related to the next"""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    async def aprocess_response(self, document: Document) -> GraphDocument:
+        self.calls += 1
+        words = list(dict.fromkeys(word.strip(".,") for word in document.page_content.split() if word[0].isupper()))
+        nodes = [Node(id=word, type="Thing") for word in words]
+        return GraphDocument(
+            nodes=nodes,
+            relationships=[Relationship(source=a, target=b, type="NEXT_TO") for a, b in zip(nodes, nodes[1:])],
+            source=document
+        )
+
+class FailingAfter:
+    """Write transaction that fails once it has been called ``calls`` times"""
+    
+    def __init__(self, write_transaction: Callable[[Any], Any], calls: int):
+        self.write_transaction = write_transaction
+        self.calls = calls
+    
+    def __call__(self, work: Callable[[Any], Any]) -> Any:
+        if not self.calls:
+            raise ConnectionError("connection lost")
+        self.calls -= 1
+        return self.write_transaction(work)
+
+def _pipeline(graph: IngestionGraph, **options) -> IngestionPipeline:
+    pipeline = IngestionPipeline(
+        graph=graph, llm=FakeChatModel(), embeddings=FakeEmbeddings(dimension=8, latency=0.0), **options
+    )
+    pipeline.transformer = WordTransformer()
+    return pipeline
+
+def _documents(source: str, *texts: str) -> List[Document]:
+    return [Document(page_content=text, metadata={"source": source}) for text in texts]
+
+def test_rerun_skips_unchanged_chunks():
+    graph = IngestionGraph()
+    documents = _documents("a.txt", "Ada met Charles.", "Charles built Engines.", "Ada wrote Notes.")
+    stats = _pipeline(graph, batch_size=2).run(documents)
+    assert (stats.chunks, stats.skipped, stats.removed) == (3, 0, 0)
+    assert graph.relationships[("Ada", "NEXT_TO", "Charles")] == [chunk_id(documents[0])]
+    
+    pipeline = _pipeline(graph, batch_size=2)
+    stats = pipeline.run(documents)
+    assert (stats.chunks, stats.skipped, stats.removed) == (0, 3, 0)
+    assert pipeline.transformer.calls == 0
+
+def test_changed_chunks_replace_their_old_version():
+    graph = IngestionGraph()
+    _pipeline(graph).run(_documents("a.txt", "Ada met Charles.", "Charles built Engines."))
+    
+    stats = _pipeline(graph).run(_documents("a.txt", "Ada met Charles.", "Charles built Looms."))
+    assert (stats.chunks, stats.skipped, stats.removed) == (1, 1, 1)
+    assert ("Charles", "NEXT_TO", "Engines") not in graph.relationships
+    assert ("Charles", "NEXT_TO", "Looms") in graph.relationships
+    assert {"Engines", "Looms"} <= stats.changed_entities
+
+def test_shared_chunks_stay_while_a_source_has_them():
+    graph = IngestionGraph()
+    _pipeline(graph).run(_documents("a.txt", "Ada met Charles.") + _documents("b.txt", "Ada met Charles."))
+    assert graph.documents[chunk_id(Document(page_content="Ada met Charles."))]["sources"] == {"a.txt", "b.txt"}
+    
+    # a.txt is gone, the chunk stays for b.txt
+    stats = _pipeline(graph).run(_documents("b.txt", "Ada met Charles."), prune_missing=True)
+    assert stats.removed == 1
+    assert graph.documents[chunk_id(Document(page_content="Ada met Charles."))]["sources"] == {"b.txt"}
+    assert ("Ada", "NEXT_TO", "Charles") in graph.relationships
+    
+    stats = _pipeline(graph).run(_documents("c.txt", "Ada wrote Notes."), prune_missing=True)
+    assert stats.removed == 1
+    assert ("Ada", "NEXT_TO", "Charles") not in graph.relationships
+
+def test_failed_write_leaves_the_chunk_to_the_next_run(tmp_path):
+    graph = IngestionGraph()
+    documents = _documents("a.txt", "Ada met Charles.", "Charles built Engines.")
+    checkpoint = str(tmp_path / "checkpoint.sqlite")
+    
+    # The connection drops between the document and the relationship write
+    graph.fail_on = ingestion.RELATIONSHIP_WRITE_QUERY
+    with pytest.raises(ConnectionError):
+        _pipeline(graph, checkpoint_path=checkpoint).run(documents)
+    assert graph.documents == {}
+    
+    stats = _pipeline(graph, checkpoint_path=checkpoint).run(documents)
+    assert (stats.chunks, stats.skipped) == (2, 0)
+    assert ("Charles", "NEXT_TO", "Engines") in graph.relationships
+
+def test_resume_skips_checkpointed_chunks(tmp_path):
+    graph = IngestionGraph()
+    documents = _documents("a.txt", "Ada met Charles.", "Charles built Engines.", "Ada wrote Notes.")
+    checkpoint = str(tmp_path / "checkpoint.sqlite")
+    
+    # The second batch fails after the first one committed
+    graph.write_transaction = FailingAfter(graph.write_transaction, 1)
+    with pytest.raises(ConnectionError):
+        _pipeline(graph, batch_size=2, checkpoint_path=checkpoint).run(documents)
+    del graph.write_transaction
+    assert len(graph.documents) == 2
+    
+    resumed = _pipeline(graph, batch_size=2, checkpoint_path=checkpoint)
+    stats = resumed.run(documents)
+    assert (stats.chunks, stats.skipped) == (1, 2)
+    assert resumed.transformer.calls == 1
+
+def test_changed_entities_stop_being_tracked_past_the_limit(monkeypatch):
+    monkeypatch.setattr(ingestion, "CHANGED_ENTITIES_LIMIT", 2)
+    stats = ingestion.IngestionStats()
+    stats.touch(["a", "b", None])
+    assert stats.changed_entities == {"a", "b"}
+    stats.touch(["c"])
+    assert stats.changed_entities is None
@@ -0,0 +1,55 @@
+from src.services.profiling import QueryProfile, compare_profiles, load_baseline, save_baseline
+
+def _summary(db_hits: float = 100.0, rows: float = 10.0, time_ms: float = 5.0, plan=("NodeIndexSeek", "Expand(All)")):
+    return {"db_hits": db_hits, "rows": rows, "time_ms_p50": time_ms, "plan": list(plan)}
+
+def test_profile_sums_operators_over_the_plan():
+    profile = QueryProfile("neighborhood")
+    plan = {
+        "operatorType": "ProduceResults@neo4j", "dbHits": 0, "rows": 3,
+        "children": [{"operatorType": "Expand(All)@neo4j", "dbHits": 40, "children": [
+            {"operatorType": "NodeIndexSeek@neo4j", "dbHits": 2, "pageCacheMisses": 1}
+        ]}],
+    }
+    profile.add(plan, 4.0)
+    profile.add(plan, 8.0)
+    
+    summary = profile.summary()
+    assert summary["runs"] == 2 and summary["db_hits"] == 42 and summary["rows"] == 3
+    assert summary["plan"] == ["ProduceResults", "Expand(All)", "NodeIndexSeek"]
+    assert list(summary["top_operators"]) == ["Expand(All)", "NodeIndexSeek", "ProduceResults"]
+    assert summary["time_ms_p50"] == 6.0
+
+def test_unchanged_profiles_have_no_findings():
+    assert compare_profiles({"q": _summary()}, {"q": _summary(db_hits=95.0, time_ms=4.0)}) == []
+
+def test_growth_beyond_the_tolerance_is_a_regression():
+    findings = compare_profiles(
+        {"q": _summary(db_hits=200.0, rows=10.5, time_ms=20.0)},
+        {"q": _summary()}
+    )
+    assert [(finding.metric, finding.regression) for finding in findings] == [
+        ("db_hits", True), ("time_ms_p50", True)
+    ]
+
+def test_small_absolute_changes_are_ignored():
+    # Doubling a 1 ms query stays below min_time_ms, one extra row below one
+    current = {"q": _summary(rows=0.6, time_ms=2.0)}
+    assert compare_profiles(current, {"q": _summary(rows=0.2, time_ms=1.0)}) == []
+
+def test_plan_changes_are_reported_without_failing():
+    findings = compare_profiles({"q": _summary(plan=["AllNodesScan"])}, {"q": _summary(), "other": _summary()})
+    assert len(findings) == 1
+    assert findings[0].metric == "plan" and not findings[0].regression
+    assert findings[0].baseline == "NodeIndexSeek > Expand(All)" and findings[0].current == "AllNodesScan"
+
+def test_baseline_round_trip(tmp_path):
+    path = str(tmp_path / "profiles" / "baseline.json")
+    assert load_baseline(path) is None
+    
+    profile = QueryProfile("graph_version")
+    profile.add({"operatorType": "NodeIndexSeek", "dbHits": 3, "rows": 1}, 1.0)
+    save_baseline(path, ["Ada"], {"graph_version": profile})
+    baseline = load_baseline(path)
+    assert baseline["entities"] == ["Ada"]
+    assert baseline["queries"]["graph_version"] == profile.summary()
@@ -0,0 +1,163 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api import chat as chat_api
+from src.api.websocket import router
+from src.config import settings
+from src.services.admission import Overloaded
+
+@pytest.fixture
+def client(service, monkeypatch) -> TestClient:
+    monkeypatch.setattr(chat_api, "graph_rag_service", service)
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v1")
+    return TestClient(app)
+
+def _receive_until_done(socket, stream_id):
+    """Frames of one generation up to its end or error frame"""
+    frames = []
+    while True:
+        frame = socket.receive_json()
+        if frame["id"] != stream_id:
+            continue
+        frames.append(frame)
+        if frame["t"] in ("end", "error"):
+            return frames
+
+def _answer(text):
+    async def stream(question):
+        yield ""
+        yield text
+    return stream
+
+def test_ask_streams_start_deltas_and_end(client, service, questions):
+    with client.websocket_connect("/api/v1/ws") as socket:
+        socket.send_json({"t": "ask", "id": 1, "m": questions[0], "c": "conversation"})
+        frames = _receive_until_done(socket, 1)
+    
+    assert frames[0] == {"t": "start", "id": 1, "q": 0, "c": "conversation"}
+    assert frames[-1] == {"t": "end", "id": 1, "q": len(frames) - 1}
+    assert [frame["q"] for frame in frames] == list(range(len(frames)))
+    deltas = [frame["x"] for frame in frames if frame["t"] == "delta"]
+    assert deltas and "".join(deltas) == service.chat(questions[0])
+
+def test_generations_are_multiplexed(client, questions):
+    with client.websocket_connect("/api/v1/ws") as socket:
+        socket.send_json({"t": "ask", "id": 1, "m": questions[0]})
+        socket.send_json({"t": "ask", "id": 2, "m": questions[1]})
+        ended = set()
+        sequences = {1: [], 2: []}
+        while len(ended) < 2:
+            frame = socket.receive_json()
+            sequences[frame["id"]].append(frame["q"])
+            if frame["t"] == "end":
+                ended.add(frame["id"])
+    
+    assert all(sequence == list(range(len(sequence))) for sequence in sequences.values())
+
+@pytest.mark.parametrize("text, error", [
+    ("not json", "Invalid frame"),
+    ("[1, 2]", "Invalid frame"),
+    ('{"id": 1}', "Invalid frame"),
+    ('{"t": "ask", "m": "hi"}', "Missing or invalid generation id"),
+    ('{"t": "ask", "id": "1", "m": "hi"}', "Missing or invalid generation id"),
+    ('{"t": "ask", "id": true, "m": "hi"}', "Missing or invalid generation id"),
+])
+def test_malformed_frames_get_an_error_frame(client, text, error):
+    with client.websocket_connect("/api/v1/ws") as socket:
+        socket.send_text(text)
+        assert socket.receive_json() == {"t": "error", "id": None, "q": 0, "x": error}
+        
+        # The connection stays usable
+        socket.send_json({"t": "ping", "id": 5})
+        assert socket.receive_json() == {"t": "error", "id": 5, "q": 0, "x": "Unknown frame type"}
+
+@pytest.mark.parametrize("frame", [
+    {"t": "ask", "id": 3},
+    {"t": "ask", "id": 3, "m": "   "},
+    {"t": "ask", "id": 3, "m": "hi", "p": "urgent"},
+    {"t": "ask", "id": 3, "m": "hi", "c": 7},
+])
+def test_invalid_questions_are_rejected(client, frame):
+    with client.websocket_connect("/api/v1/ws") as socket:
+        socket.send_json(frame)
+        assert socket.receive_json() == {"t": "error", "id": 3, "q": 0, "x": "Invalid question"}
+
+def test_cancel_stops_a_generation(client, service, monkeypatch):
+    started = []
+    
+    async def endless(question):
+        yield ""
+        started.append(question)
+        while True:
+            await asyncio.sleep(0.01)
+            yield "token "
+    
+    monkeypatch.setattr(service, "achat_stream", endless)
+    with client.websocket_connect("/api/v1/ws") as socket:
+        socket.send_json({"t": "ask", "id": 1, "m": "question"})
+        assert socket.receive_json()["t"] == "start"
+        
+        # The id is taken while the generation runs
+        socket.send_json({"t": "ask", "id": 1, "m": "question"})
+        frames = []
+        while True:
+            frame = socket.receive_json()
+            if frame["t"] == "error":
+                assert frame == {"t": "error", "id": 1, "q": 0, "x": "Duplicate generation id"}
+                break
+            frames.append(frame)
+        
+        socket.send_json({"t": "cancel", "id": 1})
+        frames += _receive_until_done(socket, 1)
+        assert frames[-1]["t"] == "end" and frames[-1]["cancelled"] is True
+        
+        # The id is free again once the generation ended
+        monkeypatch.setattr(service, "achat_stream", _answer("done"))
+        socket.send_json({"t": "ask", "id": 1, "m": "question"})
+        again = _receive_until_done(socket, 1)
+        assert [frame["t"] for frame in again] == ["start", "delta", "end"]
+
+def test_stream_limit_per_connection(client, service, monkeypatch):
+    monkeypatch.setattr(settings, "ws_max_streams", 1)
+    
+    async def endless(question):
+        yield ""
+        await asyncio.Event().wait()
+    
+    monkeypatch.setattr(service, "achat_stream", endless)
+    with client.websocket_connect("/api/v1/ws") as socket:
+        socket.send_json({"t": "ask", "id": 1, "m": "first"})
+        assert socket.receive_json()["t"] == "start"
+        socket.send_json({"t": "ask", "id": 2, "m": "second"})
+        assert socket.receive_json() == {
+            "t": "error", "id": 2, "q": 0, "x": "At most 1 generations may run at a time"
+        }
+
+def test_shed_generations_report_retry_after(client, service, monkeypatch):
+    def overloaded():
+        raise Overloaded("llm", "queue_full", 7)
+    
+    monkeypatch.setattr(service, "check_admission", overloaded)
+    with client.websocket_connect("/api/v1/ws") as socket:
+        socket.send_json({"t": "ask", "id": 4, "m": "question"})
+        frame = socket.receive_json()
+    
+    assert frame["t"] == "error" and frame["id"] == 4 and frame["q"] == 0
+    assert frame["r"] == 7
+
+def test_service_errors_end_the_generation(client, service, monkeypatch):
+    async def failing(question):
+        yield ""
+        raise RuntimeError("model failed")
+    
+    monkeypatch.setattr(service, "achat_stream", failing)
+    with client.websocket_connect("/api/v1/ws") as socket:
+        socket.send_json({"t": "ask", "id": 9, "m": "question"})
+        frames = _receive_until_done(socket, 9)
+    
+    assert [frame["t"] for frame in frames] == ["start", "error"]
+    assert frames[-1]["q"] == 1 and "model failed" not in frames[-1]["x"]